@@ -59,64 +59,23 @@ from controllers.forgot_password_routes import forgot_password_bp
 from controllers.buyer_connect_routes import buyer_connect_bp
 from controllers.equipment_sharing_routes import equipment_sharing_bp
 from controllers.resources_routes import resources_bp
+from controllers.health_routes import health_bp
 from controllers.market_scheduler import init_scheduler
 from utils.db import init_db
+from utils.warmup import start_warmup, warm_up
 
-# Print startup banner
-print_banner()
+# Warm up the models and market data in a background thread at startup instead of loading them
+# on first use (servers that fork workers after loading the app warm them up before forking)
+BACKGROUND_WARMUP = os.environ.get('BACKGROUND_WARMUP', '0') == '1'
 
-app = Flask(__name__)
-app.secret_key = 'smart_farming_assistant_2024_secret_key'
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0  # Disable caching
-app.config['TEMPLATES_AUTO_RELOAD'] = True  # Auto-reload templates
-
-# Add no-cache headers to all responses
-@app.after_request
 def add_header(response):
+    """Add no-cache headers to all responses"""
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
     return response
 
-log_info(f"Flask application initialized with secret key")
-log_info(f"Upload folder: {app.config['UPLOAD_FOLDER']}")
-
-# Initialize MongoDB connection
-log_info("Initializing database connection...")
-try:
-    init_db(app)
-    log_success("Database initialized successfully!")
-except Exception as e:
-    log_warning(f"Database initialization warning: {e}")
-    log_warning("App will run with limited functionality")
-
-# Initialize market price scheduler for daily auto-updates
-log_info("Initializing market price scheduler...")
-try:
-    scheduler = init_scheduler(app)
-    log_success("Market price scheduler initialized!")
-except Exception as e:
-    log_warning(f"Scheduler initialization failed: {e}")
-
-# Register blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(otp_bp)
-app.register_blueprint(dashboard_bp)
-app.register_blueprint(crop_bp)
-app.register_blueprint(fertilizer_bp)
-app.register_blueprint(growing_bp)
-app.register_blueprint(market_bp)
-app.register_blueprint(chat_bp)
-app.register_blueprint(report_bp)
-app.register_blueprint(forgot_password_bp)
-app.register_blueprint(buyer_connect_bp)
-app.register_blueprint(equipment_sharing_bp)
-app.register_blueprint(resources_bp)
-# app.register_blueprint(community_bp)
-
 # Global context processor for date and user info
-@app.context_processor
 def inject_globals():
     return {
         'current_date': datetime.now().strftime('%Y-%m-%d'),
@@ -131,24 +90,105 @@ def get_db():
     client = MongoClient(os.environ.get('MONGODB_URI'))
     return client.smartfarming
 
-@app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/about')
 def about():
     return render_template('about.html')
 
-@app.route('/features')
 def features():
     return render_template('features.html')
 
-# Create upload directory
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+def init_worker(app):
+    """Start the per-process resources: database connection and market scheduler"""
+    # Initialize MongoDB connection
+    log_info("Initializing database connection...")
+    try:
+        init_db(app)
+        log_success("Database initialized successfully!")
+    except Exception as e:
+        log_warning(f"Database initialization warning: {e}")
+        log_warning("App will run with limited functionality")
+
+    # Initialize market price scheduler for daily auto-updates (jobs run in one process only)
+    log_info("Initializing market price scheduler...")
+    try:
+        app.extensions['scheduler'] = init_scheduler(app)
+        log_success("Market price scheduler initialized!")
+    except Exception as e:
+        log_warning(f"Scheduler initialization failed: {e}")
+
+def create_app(start_worker=True):
+    """
+    Build the Flask application. Servers that fork workers after loading the
+    app pass start_worker=False: the models are then warmed up here, before
+    the fork, and init_worker() runs in each worker (see gunicorn.conf.py).
+    """
+    # Print startup banner
+    print_banner()
+
+    app = Flask(__name__)
+    app.secret_key = 'smart_farming_assistant_2024_secret_key'
+    app.config['UPLOAD_FOLDER'] = 'static/uploads'
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0  # Disable caching
+    app.config['TEMPLATES_AUTO_RELOAD'] = True  # Auto-reload templates
+    app.after_request(add_header)
+    app.context_processor(inject_globals)
+
+    log_info(f"Flask application initialized with secret key")
+    log_info(f"Upload folder: {app.config['UPLOAD_FOLDER']}")
+
+    # Register blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(otp_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(crop_bp)
+    app.register_blueprint(fertilizer_bp)
+    app.register_blueprint(growing_bp)
+    app.register_blueprint(market_bp)
+    app.register_blueprint(chat_bp)
+    app.register_blueprint(report_bp)
+    app.register_blueprint(forgot_password_bp)
+    app.register_blueprint(buyer_connect_bp)
+    app.register_blueprint(equipment_sharing_bp)
+    app.register_blueprint(resources_bp)
+    app.register_blueprint(health_bp)
+    # app.register_blueprint(community_bp)
+
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/about', view_func=about)
+    app.add_url_rule('/features', view_func=features)
+
+    # Create upload directory
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    if not start_worker:
+        # Workers are forked from this process: load and warm up the models they share now
+        warm_up()
+    else:
+        if BACKGROUND_WARMUP:
+            start_warmup()
+        init_worker(app)
+    return app
+
+_app = None
+
+def get_app():
+    """The application of this process, created on first use"""
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+def __getattr__(name):
+    # `from app import app` (Vercel, older imports) creates the app on first access
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Vercel serverless function handler
 def handler(request):
-    return app(request)
+    return get_app()(request)
 
 def print_route_summary():
     """Print a summary of registered routes"""
@@ -156,7 +196,7 @@ def print_route_summary():
     route_count = 0
     endpoints = []
     
-    for rule in app.url_map.iter_rules():
+    for rule in get_app().url_map.iter_rules():
         if rule.endpoint not in ['static']:
             route_count += 1
             endpoints.append(f"  🔗 {rule.rule} [{', '.join(rule.methods - {'HEAD', 'OPTIONS'})}]")
@@ -181,7 +221,7 @@ def print_startup_complete():
     print(f"🎉 SMART FARMING ASSISTANT READY! 🎉")
     print(f"📡 Server running on: http://0.0.0.0:{port}")
     print(f"🌐 Access the application in your browser")
-    print(f"🔧 Debug mode: {'ON' if app.debug else 'OFF'}")
+    print(f"🔧 Debug mode: {'ON' if get_app().debug else 'OFF'}")
     print(f"📅 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("="*50 + f"{ConsoleColors.ENDC}")
     print(f"\n{ConsoleColors.OKCYAN}💡 Tips:{ConsoleColors.ENDC}")
@@ -190,6 +230,8 @@ def print_startup_complete():
     print(f"  • Check /dashboard after login\n")
 
 if __name__ == '__main__':
+    app = get_app()
+
     # Setup complete - show route summary
     print_route_summary()
     
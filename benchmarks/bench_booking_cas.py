@@ -0,0 +1,101 @@
+"""
+Contention benchmark for optimistic (compare-and-swap) equipment booking.
+
+Several renter processes race to book the same small set of equipment listings
+through book_equipment_atomic(). Every listing must end up booked exactly once
+and every other attempt must be refused, on both the JSON file store and the
+SQLite backend.
+
+Usage (from the repository root):
+    python benchmarks/bench_booking_cas.py
+    python benchmarks/bench_booking_cas.py --renters 8 --listings 20
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import db as db_module
+from utils.db import MockDatabase, book_equipment_atomic
+from utils.sqlite_store import SQLiteDatabase
+
+
+def open_backend(backend, directory):
+    db_module.EQUIPMENT_LISTINGS_FILE = os.path.join(directory, 'equipment_listings.json')
+    if backend == 'sqlite':
+        return SQLiteDatabase(os.path.join(directory, 'bench.db'))
+    return MockDatabase()
+
+
+def renter(backend, directory, renter_id, listing_count, results):
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_module.db = open_backend(backend, directory)
+        won = refused = 0
+        # Every renter walks the listings in a different order to maximize collisions
+        for i in range(listing_count):
+            listing_id = f"equipment-{(i + renter_id) % listing_count}"
+            success, _ = book_equipment_atomic(listing_id, {
+                'renter_id': f"renter-{renter_id}", 'renter_name': f"Renter {renter_id}",
+                'renter_phone': '9000000000', 'from_date': '2025-06-01', 'to_date': '2025-06-03',
+                'booked_at': '2025-05-30T10:00:00'
+            })
+            won += success
+            refused += not success
+    results.put((won, refused))
+
+
+def run(backend, renters, listing_count):
+    with tempfile.TemporaryDirectory() as tmp:
+        listings = [{'_id': f"equipment-{i}", 'equipment_name': 'Tractor', 'status': 'available'}
+                    for i in range(listing_count)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = open_backend(backend, tmp)
+            if backend == 'sqlite':
+                store.equipment_listings.insert_many(listings)
+            else:
+                with open(db_module.EQUIPMENT_LISTINGS_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(listings, f, indent=2)
+
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=renter, args=(backend, tmp, r, listing_count, results))
+                 for r in range(renters)]
+        start = time.perf_counter()
+        for proc in procs:
+            proc.start()
+        outcomes = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            final = list(open_backend(backend, tmp).equipment_listings.find({}))
+        booked = [l for l in final if l.get('status') == 'booked']
+        wins = sum(won for won, _ in outcomes)
+        assert len(booked) == listing_count == wins, (len(booked), listing_count, wins)
+        assert all(l.get('_version') == 1 for l in booked), "a listing was booked more than once"
+        return renters * listing_count / elapsed, wins, sum(refused for _, refused in outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renters', type=int, default=8)
+    parser.add_argument('--listings', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{args.renters} renter processes racing for {args.listings} listings")
+    print(f"{'backend':>8} | {'attempts/s':>10} | {'booked':>7} | {'refused':>8}")
+    print('-' * 44)
+    for backend in ('file', 'sqlite'):
+        rate, wins, refused = run(backend, args.renters, args.listings)
+        print(f"{backend:>8} | {rate:>10.0f} | {wins:>7} | {refused:>8}")
+
+
+if __name__ == '__main__':
+    main()
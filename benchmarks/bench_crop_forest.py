@@ -0,0 +1,125 @@
+"""
+Parity and latency of the crop RandomForest: scikit-learn vs the array form.
+
+Exports crop_recommendation_model.joblib and feature_scaler.joblib with
+ml_models.compact_forest.export_forest() and checks that
+CompactForest.predict_proba() gives the same class probabilities and the
+same predicted crop as scaler.transform() + model.predict_proba() on every
+row of datasets/Crop_recommendation.csv (in one batch and row by row) and on
+random rows around its ranges (as typed into the form: raw, and rounded to 1
+and 0 decimals).
+
+Then times what CropPredictor does per request for a single row (the old
+scaler.transform + predict + predict_proba against CompactForest.predict_proba),
+a batch, and loading the model (joblib.load against crop_forest.npz).
+
+Usage (from the repository root):
+    python benchmarks/bench_crop_forest.py
+    python benchmarks/bench_crop_forest.py --random-rows 50000 --iterations 2000 --batch 1000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import joblib
+import numpy as np
+
+from ml_models.compact_forest import MODEL_PATH, SCALER_PATH, export_forest, load_forest, save_forest, source_digest
+
+DATASET = os.path.join(os.path.dirname(MODEL_PATH), '..', 'datasets', 'Crop_recommendation.csv')
+
+
+def dataset_rows():
+    with open(DATASET, newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        return np.array([[float(value) for value in row[:7]] for row in reader])
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def time_calls(call, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--random-rows', type=int, default=20000)
+    parser.add_argument('--iterations', type=int, default=1000, help="single-row predictions timed")
+    parser.add_argument('--batch', type=int, default=500)
+    args = parser.parse_args()
+    # The pickled model may come from another scikit-learn version; parity is what is checked here
+    warnings.filterwarnings('ignore')
+
+    model, scaler = joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)
+    forest = export_forest(model, scaler)
+    print(f"{len(forest.roots)} trees, {len(forest.feature)} nodes, depth {forest.depth}, {len(forest.classes)} classes")
+
+    rows = dataset_rows()
+    rng = np.random.default_rng(0)
+    low, high = rows.min(axis=0), rows.max(axis=0)
+    spread = rng.uniform(low - 0.2 * (high - low), high + 0.2 * (high - low), size=(args.random_rows, rows.shape[1]))
+    print(f"\n{'parity rows':<22} | {'rows':>6} | {'max |p diff|':>12} | {'class mismatches':>16}")
+    print('-' * 66)
+    for name, X in [('dataset', rows), ('random', spread), ('random, 1 decimal', np.round(spread, 1)),
+                    ('random, whole', np.round(spread))]:
+        expected = model.predict_proba(scaler.transform(X))
+        actual = forest.predict_proba(X)
+        mismatches = int((model.predict(scaler.transform(X)) != forest.predict(X)).sum())
+        difference = float(np.abs(expected - actual).max())
+        print(f"{name:<22} | {len(X):>6} | {difference:>12.2e} | {mismatches:>16}")
+        assert difference < 1e-9 and mismatches == 0, f"{name}: the array form differs from scikit-learn"
+    # CropPredictor passes one row at a time, which takes its own path
+    single = np.vstack([forest.predict_proba(features[None, :]) for features in rows])
+    difference = float(np.abs(single - model.predict_proba(scaler.transform(rows))).max())
+    print(f"{'dataset, row by row':<22} | {len(rows):>6} | {difference:>12.2e} | {'-':>16}")
+    assert difference < 1e-9, "single-row predictions differ from scikit-learn"
+
+    row = rows[:1]
+    batch = rows[rng.integers(0, len(rows), args.batch)]
+
+    def sklearn_row():
+        scaled = scaler.transform(row)
+        model.predict(scaled)
+        model.predict_proba(scaled)
+
+    def sklearn_batch():
+        model.predict_proba(scaler.transform(batch))
+
+    old = time_calls(sklearn_row, args.iterations)
+    new = time_calls(lambda: forest.predict_proba(row), args.iterations)
+    old_batch = time_calls(sklearn_batch, 20)
+    new_batch = time_calls(lambda: forest.predict_proba(batch), 20)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'crop_forest.npz')
+        save_forest(forest, path, source_digest(MODEL_PATH, SCALER_PATH))
+        load_joblib = time_calls(lambda: (joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)), 5)
+        load_arrays = time_calls(lambda: load_forest(MODEL_PATH, SCALER_PATH, path), 5)
+
+    print(f"\n{'operation':<30} | {'scikit-learn (ms)':>17} | {'arrays (ms)':>11} | {'speedup':>7}")
+    print('-' * 76)
+    for name, a, b in [('single row p50', percentile(old, 0.5), percentile(new, 0.5)),
+                       ('single row p99', percentile(old, 0.99), percentile(new, 0.99)),
+                       (f'batch of {args.batch} (median)', percentile(old_batch, 0.5), percentile(new_batch, 0.5)),
+                       ('load model (median)', percentile(load_joblib, 0.5), percentile(load_arrays, 0.5))]:
+        print(f"{name:<30} | {a * 1000:>17.3f} | {b * 1000:>11.3f} | {a / b:>6.1f}x")
+    print("(loading with joblib here excludes importing scikit-learn, already imported above)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark MockCollection reads with and without the shared document cache.
+
+Usage (from the repository root):
+    python benchmarks/bench_doc_cache.py
+    python benchmarks/bench_doc_cache.py --sizes 1000 10000 --reads 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import db as db_module
+from utils.db import MockCollection, clear_doc_cache
+
+STATES = ["Tamil Nadu", "Kerala", "Punjab", "Gujarat", "Bihar", "Assam", "Goa", "Odisha"]
+
+
+def build_users_file(directory, count):
+    """Write a users.json shaped like the real one with `count` records"""
+    users = {}
+    for i in range(count):
+        email = f"farmer{i}@example.com"
+        users[email] = {
+            '_id': f"user-{i}",
+            'name': f"Farmer {i}",
+            'email': email,
+            'password': '$2b$12$' + 'x' * 53,
+            'phone': f"9{i:09d}",
+            'state': STATES[i % len(STATES)],
+            'district': f"District {i % 40}",
+            'village': f"Village {i % 500}",
+            'created_at': '2025-01-01T00:00:00',
+            'saved_crops': [],
+            'saved_fertilizers': [],
+            'disease_history': []
+        }
+    path = os.path.join(directory, f"users_{count}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(users, f, indent=2)
+    return path
+
+
+def time_reads(collection, count, reads):
+    """Average seconds per find_one/find call over `reads` iterations"""
+    start = time.perf_counter()
+    for i in range(reads):
+        collection.find_one({'email': f"farmer{(i * 7919) % count}@example.com"})
+    find_one_avg = (time.perf_counter() - start) / reads
+
+    start = time.perf_counter()
+    for i in range(reads):
+        collection.find({'state': STATES[i % len(STATES)]})
+    find_avg = (time.perf_counter() - start) / reads
+    return find_one_avg, find_avg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--reads', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} | {'mode':>8} | {'find_one (ms)':>14} | {'find (ms)':>10}")
+    print('-' * 50)
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sizes:
+            path = build_users_file(tmp, count)
+            collection = MockCollection('users', path, is_dict=True)
+            for enabled in (False, True):
+                db_module.DOC_CACHE_ENABLED = enabled
+                clear_doc_cache()
+                collection.find_one({'email': 'warm-up'})  # populate the cache outside the timed loop
+                # Fewer uncached reads at large sizes keeps the run short
+                reads = args.reads if enabled or count <= 10000 else max(3, args.reads // 5)
+                find_one_avg, find_avg = time_reads(collection, count, reads)
+                mode = 'cached' if enabled else 'uncached'
+                print(f"{count:>8} | {mode:>8} | {find_one_avg * 1000:>14.3f} | {find_avg * 1000:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Contention benchmark for the JSON file store: concurrent writer processes.
+
+Each writer process increments a shared counter document N times through
+MockCollection.update_one() while a reader process keeps parsing the raw file.
+With the fcntl locks and atomic replace no increment may be lost and the
+reader may never see a partial file. The 'unlocked' row repeats the run with
+the old unguarded read-modify-write for comparison.
+
+Usage (from the repository root):
+    python benchmarks/bench_file_lock.py
+    python benchmarks/bench_file_lock.py --writers 8 --increments 200 --journal
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import db as db_module
+from utils.db import MockCollection
+
+
+def build_file(path, filler):
+    docs = [{'_id': 'counter', 'value': 0}]
+    # Padding documents so every write has a realistic size
+    docs += [{'_id': f"doc-{i}", 'name': f"Listing {i}", 'status': 'active', 'price': i} for i in range(filler)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(docs, f, indent=2)
+
+
+def locked_writer(path, increments, journal):
+    db_module.JOURNAL_ENABLED = journal
+    collection = MockCollection('bench', path)
+    for _ in range(increments):
+        collection.update_one({'_id': 'counter'}, {'$inc': {'value': 1}})
+
+
+def unlocked_writer(path, increments, journal):
+    # The pre-lock pattern: read, modify, truncate and rewrite in place
+    for _ in range(increments):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                docs = json.load(f)
+        except ValueError:
+            continue
+        docs[0]['value'] += 1
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(docs, f, indent=2)
+
+
+def reader(path, stop, result):
+    reads = torn = 0
+    while not stop.is_set():
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                json.load(f)
+            except ValueError:
+                torn += 1
+        reads += 1
+    result.put((reads, torn))
+
+
+def run(mode, path, writers, increments, journal):
+    target = locked_writer if mode == 'locked' else unlocked_writer
+    stop = multiprocessing.Event()
+    result = multiprocessing.Queue()
+    watcher = multiprocessing.Process(target=reader, args=(path, stop, result))
+    watcher.start()
+    procs = [multiprocessing.Process(target=target, args=(path, increments, journal)) for _ in range(writers)]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reads, torn = result.get()
+    watcher.join()
+
+    db_module.JOURNAL_ENABLED = journal and mode == 'locked'
+    final = MockCollection('bench', path).find_one({'_id': 'counter'}) or {'value': 0}
+    return elapsed, final['value'], reads, torn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--increments', type=int, default=100)
+    parser.add_argument('--docs', type=int, default=1000, help="padding documents in the file")
+    parser.add_argument('--journal', action='store_true', help="run the locked writers in journal mode")
+    args = parser.parse_args()
+
+    expected = args.writers * args.increments
+    print(f"{args.writers} writer processes x {args.increments} increments, {args.docs} documents"
+          f"{' (journal mode)' if args.journal else ''}")
+    print(f"{'mode':>8} | {'writes/s':>9} | {'counter':>13} | {'lost':>5} | {'reads':>6} | {'torn reads':>10}")
+    print('-' * 68)
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('locked', 'unlocked'):
+            path = os.path.join(tmp, f"{mode}.json")
+            build_file(path, args.docs)
+            elapsed, value, reads, torn = run(mode, path, args.writers, args.increments, args.journal)
+            print(f"{mode:>8} | {expected / elapsed:>9.0f} | {value:>6}/{expected:<6} | {expected - value:>5} | "
+                  f"{reads:>6} | {torn:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Cold start import profile of the app, with a regression threshold.
+
+Runs `python -X importtime -c "import app"` (or another module) in fresh
+interpreters, reports the median cumulative import time of the module and
+the slowest imports under it, and fails (exit status 1) when
+
+  * the median exceeds --max-ms, or
+  * one of the --deferred modules was imported at all: the Gemini client,
+    the ML stack and the PDF engine are meant to load on first use.
+
+Usage (from the repository root):
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --module wsgi --max-ms 3000 --deferred
+    python benchmarks/bench_import_time.py --runs 5 --top 25
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFERRED = ['google.generativeai', 'sklearn', 'pandas', 'joblib', 'xhtml2pdf']
+
+
+def import_profile(module):
+    """[(module, self us, cumulative us)] of one cold `import module`, in importtime order"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help="slowest imports to list")
+    parser.add_argument('--max-ms', type=float, default=1000, help="fail above this median import time")
+    parser.add_argument('--deferred', nargs='*', default=DEFERRED,
+                        help="modules that must not be imported at startup (none to skip the check)")
+    args = parser.parse_args()
+
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    totals = [next(c for name, _, c in profile if name == args.module) / 1000 for profile in profiles]
+    median = statistics.median(totals)
+
+    # Slowest imports of the median run, by cumulative time, top-level packages only once
+    profile = profiles[totals.index(sorted(totals)[len(totals) // 2])]
+    print(f"import {args.module}: median {median:.0f} ms over {args.runs} runs "
+          f"({', '.join(f'{t:.0f}' for t in totals)} ms), threshold {args.max_ms:.0f} ms")
+    print(f"{'module':<48} | {'self (ms)':>9} | {'cumulative (ms)':>15}")
+    print('-' * 78)
+    listed = set()
+    for name, own, cumulative in sorted(profile, key=lambda row: -row[2]):
+        if name == args.module or name.split('.')[0] in listed:
+            continue
+        listed.add(name.split('.')[0])
+        print(f"{name:<48} | {own / 1000:>9.1f} | {cumulative / 1000:>15.1f}")
+        if len(listed) >= args.top:
+            break
+
+    failures = []
+    if median > args.max_ms:
+        failures.append(f"median import time {median:.0f} ms is above {args.max_ms:.0f} ms")
+    imported = {name for name, _, _ in profile}
+    for module in args.deferred:
+        if module in imported:
+            failures.append(f"{module} is imported at startup")
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark buyer marketplace latency: per-listing farmer lookups vs find_users_by_ids.
+
+Builds 500 active crop listings from 200 farmers and times get_available_listings()
+against the JSON file store and the SQLite backend.
+
+Usage (from the repository root):
+    python benchmarks/bench_marketplace.py
+    python benchmarks/bench_marketplace.py --listings 2000 --farmers 500 --runs 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import db as db_module
+from utils.db import MockDatabase, clear_doc_cache, create_file_indexes, find_user_by_id, get_available_listings
+from utils.sqlite_store import SQLiteDatabase
+
+CROPS = ["Rice", "Wheat", "Tomato", "Onion", "Potato", "Cotton", "Maize", "Banana"]
+STATES = ["Tamil Nadu", "Kerala", "Punjab", "Gujarat", "Bihar"]
+
+
+def build_data(directory, listing_count, farmer_count):
+    users = {}
+    for i in range(farmer_count):
+        email = f"farmer{i}@example.com"
+        users[email] = {
+            '_id': f"farmer-{i}", 'name': f"Farmer {i}", 'email': email,
+            'password': '$2b$12$' + 'x' * 53, 'phone': f"9{i:09d}",
+            'state': STATES[i % len(STATES)], 'district': f"District {i % 40}",
+            'created_at': '2025-01-01T00:00:00', 'saved_crops': [], 'disease_history': []
+        }
+    listings = []
+    for i in range(listing_count):
+        listings.append({
+            '_id': f"listing-{i}", 'farmer_id': f"farmer-{i % farmer_count}",
+            'crop': CROPS[i % len(CROPS)], 'quantity': 10 + i % 90, 'unit': 'quintal',
+            'farmer_price': 1500 + (i * 37) % 2000, 'live_market_price': 1800,
+            'state': STATES[i % len(STATES)], 'district': f"District {i % 40}",
+            'status': 'active', 'created_at': f"2025-01-{1 + i % 28:02d}T10:00:00",
+            'description': 'Freshly harvested, stored in a dry warehouse. ' * 4
+        })
+    db_module.USERS_FILE = os.path.join(directory, 'users.json')
+    db_module.LISTINGS_FILE = os.path.join(directory, 'crop_listings.json')
+    with open(db_module.USERS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(users, f, indent=2)
+    with open(db_module.LISTINGS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(listings, f, indent=2)
+    return users, listings
+
+
+def per_listing_marketplace():
+    """The marketplace as it was: one find_user_by_id() call per listing"""
+    listings = list(db_module.db.crop_listings.find({'status': 'active'}).sort([('created_at', -1)]))
+    for listing in listings:
+        farmer = find_user_by_id(listing.get('farmer_id'))
+        if farmer:
+            listing['farmer_name'] = farmer.get('name', 'Unknown')
+            listing['farmer_phone'] = farmer.get('phone', '')
+    return listings
+
+
+def time_call(func, runs):
+    # The marketplace helpers log every lookup; keep that out of the output and the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()  # warm caches outside the timed loop
+        start = time.perf_counter()
+        for _ in range(runs):
+            result = func()
+        elapsed = time.perf_counter() - start
+    return elapsed / runs, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=500)
+    parser.add_argument('--farmers', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        users, listings = build_data(tmp, args.listings, args.farmers)
+        file_db = MockDatabase()
+        create_file_indexes(file_db)
+        sqlite_db = SQLiteDatabase(os.path.join(tmp, 'bench.db'))
+        sqlite_db.users.insert_many(list(users.values()))
+        sqlite_db.crop_listings.insert_many(listings)
+
+        print(f"\n{args.listings} listings from {args.farmers} farmers, {args.runs} runs")
+        print(f"{'backend':>8} | {'per-listing (ms)':>17} | {'bulk (ms)':>10} | {'speedup':>8}")
+        print('-' * 54)
+        for name, backend in (('file', file_db), ('sqlite', sqlite_db)):
+            db_module.db = backend
+            clear_doc_cache()
+            old_avg, old_rows = time_call(per_listing_marketplace, args.runs)
+            new_avg, new_rows = time_call(get_available_listings, args.runs)
+            assert [(r['_id'], r.get('farmer_name')) for r in old_rows] == \
+                   [(r['_id'], r.get('farmer_name')) for r in new_rows], "bulk enrichment changed the result"
+            print(f"{name:>8} | {old_avg * 1000:>17.2f} | {new_avg * 1000:>10.2f} | {old_avg / new_avg:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
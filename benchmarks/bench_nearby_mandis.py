@@ -0,0 +1,113 @@
+"""
+Latency benchmark for nearby-mandi radius queries: per-record scan vs the grid index.
+
+Builds synthetic snapshots with a growing number of located markets (a few
+commodities each, scattered over India) and times radius queries from random
+points with the per-record loop /api/nearby-mandis used to run and with
+MarketGeoIndex.nearest(). Both must return the same nearest records. Reports
+p50 and p99 latency per market count; the grid's p99 should stay flat while
+the scan grows with the data.
+
+Usage (from the repository root):
+    python benchmarks/bench_nearby_mandis.py
+    python benchmarks/bench_nearby_mandis.py --markets 500 5000 50000 --queries 200 --radius 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from math import asin, cos, radians, sin, sqrt
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.market_geo_index import MarketGeoIndex
+from utils.market_snapshot import MarketSnapshot
+
+COMMODITIES = ['Tomato', 'Onion', 'Potato', 'Wheat', 'Banana']
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * asin(sqrt(a))
+
+
+def synthetic_market(markets, seed):
+    """(records, district coordinates) for markets spread over India's bounding box"""
+    rnd = random.Random(seed)
+    coords, records = {}, []
+    for m in range(markets):
+        state, district = f"State {m % 30}", f"District {m}"
+        coords.setdefault(state, {})[district] = {'lat': rnd.uniform(8, 34), 'lon': rnd.uniform(68, 97)}
+        for commodity in COMMODITIES:
+            records.append({'commodity': commodity, 'variety': 'Local', 'market': f"{district} Mandi",
+                            'state': state, 'district': district, 'min_price': 1000, 'max_price': 3000,
+                            'modal_price': rnd.randint(1500, 2500), 'price_date': '2025-06-01',
+                            'arrival': '100 quintals', 'unit': 'Quintal'})
+    return records, coords
+
+
+def scan_nearest(records, coords, lat, lon, radius, limit):
+    """The per-record loop the endpoint used to run"""
+    nearby = []
+    for position, record in enumerate(records):
+        if not record['modal_price']:
+            continue
+        places = coords.get(record['state'], {})
+        place = places.get(record['district'])
+        if place is None:
+            place = next((c for name, c in places.items() if name.lower() in record['market'].lower()), None)
+        if place is None:
+            continue
+        distance = calculate_distance(lat, lon, place['lat'], place['lon'])
+        if distance <= radius:
+            nearby.append((round(distance, 1), position))
+    nearby.sort(key=lambda item: item[0])
+    return [position for _, position in nearby[:limit]], len(nearby)
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--markets', type=int, nargs='+', default=[500, 5000, 20000])
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--radius', type=float, default=50)
+    parser.add_argument('--limit', type=int, default=15)
+    parser.add_argument('--scan-queries', type=int, default=10, help="queries timed for the slow scan")
+    args = parser.parse_args()
+
+    print(f"Nearest {args.limit} mandis within {args.radius:g} km, {len(COMMODITIES)} records per market")
+    print(f"{'markets':>8} | {'records':>8} | {'build (ms)':>10} | {'grid p50':>9} | {'grid p99':>9} | "
+          f"{'scan p50':>9} | {'scan p99':>9}")
+    print('-' * 82)
+    for markets in args.markets:
+        records, coords = synthetic_market(markets, seed=markets)
+        snapshot = MarketSnapshot.from_records(records, f"bench-{markets}", None)
+        start = time.perf_counter()
+        geo = MarketGeoIndex(snapshot, coords)
+        build = time.perf_counter() - start
+
+        rnd = random.Random(0)
+        points = [(rnd.uniform(8, 34), rnd.uniform(68, 97)) for _ in range(args.queries)]
+        grid, scan = [], []
+        for i, (lat, lon) in enumerate(points):
+            start = time.perf_counter()
+            nearest, total = geo.nearest(lat, lon, args.radius, args.limit)
+            grid.append(time.perf_counter() - start)
+            if i < args.scan_queries:
+                start = time.perf_counter()
+                expected = scan_nearest(records, coords, lat, lon, args.radius, args.limit)
+                scan.append(time.perf_counter() - start)
+                assert ([p for p, _ in nearest], total) == expected, f"results differ at ({lat}, {lon})"
+        print(f"{markets:>8} | {len(records):>8} | {build * 1000:>10.1f} | {percentile(grid, 0.5) * 1000:>9.3f} | "
+              f"{percentile(grid, 0.99) * 1000:>9.3f} | {percentile(scan, 0.5) * 1000:>9.1f} | "
+              f"{percentile(scan, 0.99) * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark the daily market price generator: per-record random loop vs numpy columns.
+
+Times generate_price_columns() (and turning its columns into the JSON records)
+against the pure-Python loop it replaced, and reports the peak memory traced
+by tracemalloc for each. Also checks that the output is deterministic per date
+and that the global random module is left untouched.
+
+Usage (from the repository root):
+    python benchmarks/bench_price_generator.py
+    python benchmarks/bench_price_generator.py --runs 5 --date 2025-06-01
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+with contextlib.redirect_stderr(io.StringIO()):
+    from controllers.market_scheduler import BASE_PRICES, generate_price_columns, load_states_districts
+from utils.market_snapshot import MarketSnapshot
+
+
+def loop_generator(date_today):
+    """The generator as it was: random.uniform() per field per record, reseeding the global RNG"""
+    states_districts = load_states_districts()
+    market_data = []
+    day = datetime.strptime(date_today, '%Y-%m-%d')
+    random.seed(int(hashlib.md5(date_today.encode()).hexdigest()[:8], 16))
+    for state, districts in states_districts.items():
+        for district in districts:
+            for commodity, (min_base, max_base, varieties) in BASE_PRICES.items():
+                regional_factor = random.uniform(0.8, 1.2)
+                min_price = int(min_base * regional_factor * random.uniform(0.9, 1.0))
+                max_price = int(max_base * regional_factor * random.uniform(1.0, 1.1))
+                modal_price = int((min_price + max_price) / 2 * random.uniform(0.95, 1.05))
+                days_ago = random.randint(0, 6)
+                market_data.append({
+                    "commodity": commodity,
+                    "variety": random.choice(varieties),
+                    "market": f"{district} Mandi",
+                    "state": state,
+                    "district": district,
+                    "min_price": min_price,
+                    "max_price": max_price,
+                    "modal_price": modal_price,
+                    "price_date": (day - timedelta(days=days_ago)).strftime("%Y-%m-%d"),
+                    "arrival": f"{random.randint(50, 1000)} quintals",
+                    "unit": "Quintal"
+                })
+    random.seed()
+    return market_data
+
+
+def columns_only(date_today):
+    return generate_price_columns(date_today)
+
+
+def columns_and_records(date_today):
+    return MarketSnapshot(None, None, *generate_price_columns(date_today)).records()
+
+
+def measure(func, date_today, runs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(date_today)  # warm up imports and the states file
+        start = time.perf_counter()
+        for _ in range(runs):
+            func(date_today)
+        elapsed = (time.perf_counter() - start) / runs
+        tracemalloc.start()
+        result = func(date_today)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def check_determinism(date_today):
+    state = random.getstate()
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = generate_price_columns(date_today)
+        second = generate_price_columns(date_today)
+        other_day = generate_price_columns('2000-01-01')
+    assert random.getstate() == state, "generate_price_columns() touched the global random state"
+    for a, b in zip(first[:2], second[:2]):
+        assert all((a[field] == b[field]).all() for field in a), "same date gave different prices"
+    assert (first[0]['modal_price'] != other_day[0]['modal_price']).any(), "different dates gave the same prices"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--date', default=datetime.now().strftime('%Y-%m-%d'))
+    args = parser.parse_args()
+
+    check_determinism(args.date)
+    print(f"Market price generation for {args.date}, {args.runs} runs (deterministic, global RNG untouched)")
+    print(f"{'generator':>18} | {'records':>8} | {'time (ms)':>10} | {'peak (MB)':>10}")
+    print('-' * 56)
+    for name, func in (('python loop', loop_generator), ('numpy columns', columns_only),
+                       ('columns + records', columns_and_records)):
+        elapsed, peak, result = measure(func, args.date, args.runs)
+        count = len(result) if isinstance(result, list) else len(result[0]['modal_price'])
+        print(f"{name:>18} | {count:>8} | {elapsed * 1000:>10.1f} | {peak / 2 ** 20:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
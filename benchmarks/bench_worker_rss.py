@@ -0,0 +1,125 @@
+"""
+Memory per gunicorn worker with and without preloading the app before fork.
+
+Starts gunicorn with gunicorn.conf.py (GUNICORN_PRELOAD=1 and =0), waits
+until every worker has loaded the app and its memory settled, sends a few
+requests, and reads /proc/<pid>/smaps_rollup of each worker:
+
+    RSS      resident pages, shared ones included (what `ps` and most dashboards show)
+    PSS      resident pages with each shared page split between the processes mapping it
+    private  pages only this worker has (what a worker really costs)
+
+With preloading the workers' RSS stays about the same, but PSS and private
+memory drop because the models, indexes and imported modules are shared with
+the master copy-on-write. Linux only.
+
+Usage (from the repository root):
+    python benchmarks/bench_worker_rss.py
+    python benchmarks/bench_worker_rss.py --workers 4 --requests 50
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PATHS = ['/', '/about', '/features']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    """Pids of the direct children of pid"""
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; the parent pid follows its closing parenthesis
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+
+def memory_kb(pid):
+    """{'rss', 'pss', 'private'} of pid in kB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {'rss': fields.get('Rss', 0), 'pss': fields.get('Pss', 0),
+            'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def measure(preload, workers, requests, timeout):
+    port = free_port()
+    env = {**os.environ, 'GUNICORN_PRELOAD': '1' if preload else '0', 'PORT': str(port),
+           'WEB_CONCURRENCY': str(workers)}
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + timeout
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5).read()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.5)
+        for i in range(requests):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}{PATHS[i % len(PATHS)]}', timeout=10).read()
+
+        # Workers load (or finish starting) on their own schedule; wait for their memory to settle
+        previous = None
+        while time.time() < deadline:
+            pids = children(server.pid)
+            sizes = [memory_kb(pid)['rss'] for pid in pids]
+            if len(pids) == workers and previous == sizes:
+                break
+            previous = sizes
+            time.sleep(2)
+        return memory_kb(server.pid), [memory_kb(pid) for pid in children(server.pid)]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=180, help="seconds to wait for the workers")
+    args = parser.parse_args()
+
+    print(f"gunicorn, {args.workers} workers, {args.requests} requests (memory in MB)")
+    print(f"{'preload':>8} | {'master RSS':>10} | {'worker RSS':>10} | {'worker PSS':>10} | "
+          f"{'private':>8} | {'total PSS':>9}")
+    print('-' * 70)
+    for preload in (False, True):
+        master, workers = measure(preload, args.workers, args.requests, args.timeout)
+
+        def mean(key):
+            return sum(w[key] for w in workers) / len(workers) / 1024
+
+        total = (master['pss'] + sum(w['pss'] for w in workers)) / 1024
+        print(f"{'on' if preload else 'off':>8} | {master['rss'] / 1024:>10.1f} | {mean('rss'):>10.1f} | "
+              f"{mean('pss'):>10.1f} | {mean('private'):>8.1f} | {total:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
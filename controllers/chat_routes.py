@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, session
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from utils.gemini import generative_model
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,18 +12,9 @@ chat_bp = Blueprint('chat', __name__, url_prefix='/chat')
 # Configure Gemini API from environment variable
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
-# Global model variable
-model = None
-
+# The Gemini client is loaded on the first chat request (see utils/gemini.py)
 if not GEMINI_API_KEY:
     print("WARNING: GEMINI_API_KEY not set. Chatbot features will be disabled.")
-else:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        # Initialize the model - use gemma-3-4b-it
-        model = genai.GenerativeModel('gemma-3-4b-it')
-    except Exception as e:
-        print(f"Error configuring Gemini API: {e}")
 
 # System context for the chatbot
 SYSTEM_CONTEXT = """You are 'Smart Farming Assistant', an expert agricultural AI companion designed to help farmers.
@@ -82,7 +73,7 @@ def chat_message():
         print(f"User message: {user_message}")
         
         # Create a new model instance for each request
-        chat_model = genai.GenerativeModel('gemma-3-4b-it')
+        chat_model = generative_model()
         
         # Generate response with system context
         prompt = f"{SYSTEM_CONTEXT}\n\nUSER INFO:\nName: {user_name}\n\nUSER QUESTION:\n{user_message}\n\nProvide a warm, logical, and helpful response:"
@@ -120,7 +111,7 @@ def test_api():
             }), 500
         
         # Simple test
-        model = genai.GenerativeModel('gemma-3-4b-it')
+        model = generative_model()
         response = model.generate_content("Say 'Hello, Smart Farming!' in one sentence.")
         
         return jsonify({
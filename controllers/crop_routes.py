@@ -1,21 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from utils.auth import login_required
 from utils.db import save_crop_recommendation, delete_crop, get_user_crops
-from ml_models.model_integration import crop_predictor
+from ml_models.model_integration import get_crop_predictor
 from datetime import datetime
-import os
-import google.generativeai as genai
 
 crop_bp = Blueprint('crop', __name__)
 
-# Configure Gemini API
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-if GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-    except Exception as e:
-        print(f"Error configuring Gemini API in crop routes: {e}")
-
 # Helper function for crop categorization
 def get_crop_category(crop_name):
     crop_name = crop_name.lower().strip()
@@ -71,7 +61,7 @@ def crop_suggestion():
             
             # Get ML model predictions
             print("🔍 Getting crop predictions...")
-            prediction_result = crop_predictor.predict_crop_recommendation(
+            prediction_result = get_crop_predictor().predict_crop_recommendation(
                 nitrogen, phosphorous, potassium, temperature, humidity, ph, rainfall
             )
             
@@ -299,7 +289,7 @@ def api_predict_crop():
     try:
         data = request.get_json()
         
-        prediction_result = crop_predictor.predict_crop_recommendation(
+        prediction_result = get_crop_predictor().predict_crop_recommendation(
             data['nitrogen'], data['phosphorus'], data['potassium'],
             data['temperature'], data['humidity'], data['ph'], data['rainfall']
         )
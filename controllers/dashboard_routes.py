@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, session, redirect, url_for, jsonify
 from utils.auth import login_required
 from utils.db import get_user_crops, get_user_fertilizers, find_user_by_id, get_dashboard_notifications, get_user_growing_activities, mark_user_notifications_read
+from utils.market_price_index import get_price_index
 from datetime import datetime, timedelta
 import json
 import os
@@ -51,19 +52,12 @@ def get_price_predictions(user_district, user_state):
         if (current_time - cache_time).total_seconds() < CACHE_DURATION:
             return cached_data
     
-    # Load market data
-    market_file = 'data/market_prices.json'
-    if not os.path.exists(market_file):
+    price_index = get_price_index()
+    if price_index is None or not user_state or not user_district:
         return []
     
-    with open(market_file, 'r', encoding='utf-8') as f:
-        market_data = json.load(f)
-    
-    # Get commodities for user's district
-    district_data = [item for item in market_data['data'] 
-                     if item['state'] == user_state and item['district'] == user_district]
-    
-    if not district_data:
+    # Check the user's district has market data
+    if not price_index.count(state=user_state, district=user_district):
         return []
     
     # Generate predictions for top commodities
@@ -71,7 +65,7 @@ def get_price_predictions(user_district, user_state):
     top_commodities = ['Tomato', 'Onion', 'Potato', 'Cabbage', 'Carrot', 'Cauliflower', 'Brinjal', 'Capsicum', 'Beans', 'Peas', 'Banana', 'Mango', 'Apple', 'Orange']
     
     for commodity in top_commodities[:12]:  # Top 12 predictions
-        commodity_data = [item for item in district_data if item['commodity'] == commodity]
+        commodity_data = price_index.records(state=user_state, district=user_district, commodity=commodity, limit=1)
         if commodity_data:
             item = commodity_data[0]
             current_price = item['modal_price']
@@ -458,44 +452,50 @@ def dashboard():
     # Get market prices for dashboard
     market_prices = []
     try:
-        market_file = 'data/market_prices.json'
-        if os.path.exists(market_file):
-            with open(market_file, 'r', encoding='utf-8') as f:
-                market_data = json.load(f)
-                all_market_data = market_data.get('data', [])
-                
-                # Get district and state for matching
-                u_dist = user.get('district', session.get('user_district'))
-                u_state = user.get('state', session.get('user_state'))
-                
-                # Filter for local or relevant data
-                relevant = [i for i in all_market_data if i.get('district') == u_dist]
-                if not relevant:
-                    relevant = [i for i in all_market_data if i.get('state') == u_state]
-                if not relevant:
-                    relevant = all_market_data
-                
-                # Ensure mix including fruits
-                f_list = ['Apple', 'Banana', 'Mango', 'Orange', 'Grapes', 'Papaya', 'Pineapple', 
-                         'Guava', 'Watermelon', 'Muskmelon', 'Pomegranate', 'Strawberry', 
-                         'Cherry', 'Kiwi', 'Lemon', 'Pear', 'Peach', 'Plum', 'Coconut']
-                
-                veggies = [i for i in relevant if not any(f.lower() in i.get('commodity', '').lower() for f in f_list)]
-                fruit_items = [i for i in relevant if any(f.lower() in i.get('commodity', '').lower() for f in f_list)]
-                
-                # If local fruits missing, get from state
-                if not fruit_items and u_state:
-                     fruit_items = [i for i in all_market_data if i.get('state') == u_state and any(f.lower() in i.get('commodity', '').lower() for f in f_list)]
-                
-                display_items = veggies[:6] + fruit_items[:4]
-                
-                for item in display_items:
-                    market_prices.append({
-                        'commodity': item.get('commodity', ''),
-                        'district': item.get('district', ''),
-                        'price': round(item.get('modal_price', 0) / 100, 2),  # Convert to per kg
-                        'change': round(random.uniform(-5, 5), 1)
-                    })
+        # Get district and state for matching
+        u_dist = user.get('district', session.get('user_district'))
+        u_state = user.get('state', session.get('user_state'))
+        
+        # Ensure mix including fruits
+        f_list = ['Apple', 'Banana', 'Mango', 'Orange', 'Grapes', 'Papaya', 'Pineapple', 
+                 'Guava', 'Watermelon', 'Muskmelon', 'Pomegranate', 'Strawberry', 
+                 'Cherry', 'Kiwi', 'Lemon', 'Pear', 'Peach', 'Plum', 'Coconut']
+        
+        # Filter for local or relevant data: the district, else the state, else all India
+        price_index = get_price_index()
+        veggies = fruit_items = []
+        if price_index is not None:
+            names = price_index.commodity_names()
+            fruit_names = [n for n in names if any(f.lower() in n.lower() for f in f_list)]
+            veggie_names = [n for n in names if n not in fruit_names]
+            if u_dist and price_index.count(district=u_dist):
+                region = {'district': u_dist}
+            elif u_state and price_index.count(state=u_state):
+                region = {'state': u_state}
+            else:
+                region = {}
+            
+            def first_records(commodities, limit, **where):
+                # Only the records shown are turned into dicts
+                positions = price_index.ordered_positions(commodities=commodities, **where)[:limit]
+                return price_index.snapshot.records(positions)
+            
+            veggies = first_records(veggie_names, 6, **region)
+            fruit_items = first_records(fruit_names, 4, **region)
+            
+            # If local fruits missing, get from state
+            if not fruit_items and u_state:
+                fruit_items = first_records(fruit_names, 4, state=u_state)
+        
+        display_items = veggies[:6] + fruit_items[:4]
+        
+        for item in display_items:
+            market_prices.append({
+                'commodity': item.get('commodity', ''),
+                'district': item.get('district', ''),
+                'price': round(item.get('modal_price', 0) / 100, 2),  # Convert to per kg
+                'change': round(random.uniform(-5, 5), 1)
+            })
     except Exception as e:
         print(f"Error loading market prices: {e}")
     
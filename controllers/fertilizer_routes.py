@@ -1,8 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from utils.auth import login_required
+from utils.warmup import register
 from datetime import datetime
 import sys
 import os
+import threading
 
 # Add path for ML model
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_models'))
@@ -14,14 +16,35 @@ except Exception:
     save_fertilizer_recommendation = None
     delete_fertilizer_recommendation = None
 
-# Import ML predictor
-try:
-    from predict import FertilizerPredictor
-    ml_predictor = FertilizerPredictor()
-    print("✅ [SUCCESS] ML Fertilizer Predictor loaded successfully")
-except Exception as e:
-    print(f"⚠️  [WARNING] Could not load ML predictor: {e}")
-    ml_predictor = None
+# ML predictor, loaded on first use (pandas and joblib are slow to import)
+_ml_predictor = None
+_ml_predictor_loaded = False
+_ml_predictor_lock = threading.Lock()
+
+def get_ml_predictor():
+    """The FertilizerPredictor, or None if it could not be loaded"""
+    global _ml_predictor, _ml_predictor_loaded
+    if not _ml_predictor_loaded:
+        with _ml_predictor_lock:
+            if not _ml_predictor_loaded:
+                try:
+                    from predict import FertilizerPredictor
+                    _ml_predictor = FertilizerPredictor()
+                    print("✅ [SUCCESS] ML Fertilizer Predictor loaded successfully")
+                except Exception as e:
+                    print(f"⚠️  [WARNING] Could not load ML predictor: {e}")
+                _ml_predictor_loaded = True
+    return _ml_predictor
+
+def _probe_ml_predictor(predictor):
+    # One synthetic prediction; also loads the fertilizer reference data it reads
+    result = predictor.predict(temperature=26, moisture=50, rainfall=100, ph=6.5, nitrogen=50,
+                               phosphorous=40, potassium=40, carbon=1.0,
+                               soil=predictor.get_available_soils()[0], crop=predictor.get_available_crops()[0])
+    if not result.get('success'):
+        raise RuntimeError(result.get('error'))
+
+register('fertilizer_model', get_ml_predictor, probe=_probe_ml_predictor)
 
 fertilizer_bp = Blueprint('fertilizer', __name__, url_prefix='/fertilizer')
 
@@ -184,6 +207,7 @@ def get_fertilizer_category(fetilizer_name):
 @fertilizer_bp.route('/recommend', methods=['GET', 'POST'])
 @login_required
 def fertilizer_recommend():
+    ml_predictor = get_ml_predictor()
     if request.method == 'GET':
         # Get available options from ML model
         available_soils = []
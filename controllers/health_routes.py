@@ -0,0 +1,35 @@
+from flask import Blueprint, jsonify
+import os
+import time
+
+from utils.warmup import start_warmup, warmup_status
+
+health_bp = Blueprint('health', __name__)
+
+STARTED_AT = time.time()
+
+
+@health_bp.route('/healthz')
+def healthz():
+    """Liveness: the process serves requests; includes the warm-up state of each model"""
+    ready, models = warmup_status()
+    return jsonify({
+        'status': 'ok',
+        'ready': ready,
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - STARTED_AT, 1),
+        'models': models
+    })
+
+
+@health_bp.route('/readyz')
+def readyz():
+    """Readiness: 200 once the models are warmed up, 503 while they are pending or loading"""
+    ready, models = warmup_status()
+    if not ready:
+        # Models load on first use unless the app warmed them up at startup; the first probe starts it
+        start_warmup()
+    return jsonify({
+        'status': 'ready' if ready else 'warming up',
+        'models': models
+    }), 200 if ready else 503
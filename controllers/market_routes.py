@@ -1,11 +1,18 @@
 from flask import Blueprint, render_template, session, request, jsonify
 from utils.auth import login_required
+from utils.commodity_catalog import CATEGORY_KEYS, CATEGORY_OF, COMMODITY_CATEGORIES, category_commodities, category_key
+from utils.market_geo_index import get_geo_index
+from utils.market_history import get_history
+from utils.market_price_index import SORT_KEYS, get_price_index
+from utils.market_trends import TREND_WINDOWS, recommendation, region_trends, trend_statistics
+from utils.market_snapshot import DISPLAY_FIELDS
+import base64
+import binascii
 import requests
-import random
+import hashlib
 import json
 import os
 from datetime import datetime, timedelta
-from math import radians, cos, sin, asin, sqrt
 
 market_bp = Blueprint('market', __name__)
 
@@ -13,15 +20,52 @@ market_bp = Blueprint('market', __name__)
 API_KEY = "579b464db66ec23bdd000001cdd3946e44ce4aad7209ff7b23ac571b"
 API_BASE_URL = "https://api.data.gov.in/resource/35985678-0d79-46b4-9ed6-6f13308a1d24"
 
-# Market data file path
-MARKET_DATA_FILE = 'data/market_prices.json'
-
-# District coordinates file path
-DISTRICT_COORDS_FILE = 'data/district_coordinates.json'
-
 # States and districts file path
 STATES_DISTRICTS_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'states_districts.json')
 
+# Market watch pagination
+MARKET_PAGE_SIZE = 12
+MARKET_API_MAX_LIMIT = 200
+
+# Nearest mandis returned by /api/nearby-mandis
+NEARBY_MANDIS_LIMIT = 15
+
+def matching_commodities(price_index, names=None, query=None):
+    """Commodity names in names (all when None) containing query; None when nothing restricts them"""
+    if names is None and not query:
+        return None
+    candidates = price_index.commodity_names() if names is None else names
+    if query:
+        candidates = [name for name in candidates if query.lower() in name.lower()]
+    return candidates
+
+def encode_cursor(version, offset):
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode()
+
+def decode_cursor(cursor):
+    """(version, offset) of a page cursor, (None, 0) for the first page; ValueError if malformed"""
+    if not cursor:
+        return None, 0
+    try:
+        version, offset = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(':', 1)
+    except (UnicodeError, binascii.Error) as e:
+        raise ValueError(str(e))
+    offset = int(offset)
+    if offset < 0:
+        raise ValueError("negative offset")
+    return version, offset
+
+def market_price_page(price_index, state=None, district=None, commodities=None, sort=None, fields=None,
+                      limit=MARKET_PAGE_SIZE, offset=0):
+    """One page of display rows: (rows, total matching, cursor of the next page or None)"""
+    positions = price_index.ordered_positions(state, district, commodities, sort)
+    page = positions[offset:offset + limit]
+    next_offset = offset + len(page)
+    # Pages of one state stay valid while the other states are refreshed
+    version = price_index.region_version(state)
+    next_cursor = encode_cursor(version, next_offset) if next_offset < len(positions) else None
+    return price_index.snapshot.display_rows(page, fields), len(positions), next_cursor
+
 def load_states_districts():
     """Load all Indian states and districts from JSON file"""
     try:
@@ -33,99 +77,28 @@ def load_states_districts():
         print(f"Error loading states_districts.json: {str(e)}")
         return {}
 
-def load_district_coordinates():
-    """Load district coordinates mapping"""
+def load_daily_market_data(state=None, district=None, commodity=None):
+    """Load market data from daily scheduled updates through the market price index"""
     try:
-        if os.path.exists(DISTRICT_COORDS_FILE):
-            with open(DISTRICT_COORDS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
-    except Exception as e:
-        print(f"Error loading district coordinates: {str(e)}")
-        return {}
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two coordinates in km using Haversine formula"""
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    km = 6371 * c
-    return km
-
-def load_daily_market_data():
-    """Load market data from daily scheduled updates"""
-    try:
-        if os.path.exists(MARKET_DATA_FILE):
-            with open(MARKET_DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('data', []), data.get('last_updated')
-        return [], None
+        price_index = get_price_index()
+        if price_index is None:
+            return [], None
+        return price_index.records(state=state, district=district, commodity=commodity), price_index.last_updated
     except Exception as e:
         print(f"Error loading market data: {str(e)}")
         return [], None
 
-def format_scheduled_data_for_display(scheduled_data):
-    """Format the scheduled AI-generated data for display"""
-    market_data = []
-    for record in scheduled_data:
-        try:
-            current_price = record.get('modal_price', 0)
-            min_price = record.get('min_price', current_price)
-            max_price = record.get('max_price', current_price)
-            
-            # Calculate change and prediction
-            # Calculate change and prediction (Stable/Deterministic)
-            import hashlib
-            seed_key = f"{record.get('commodity', '')}_{record.get('market', '')}_{datetime.now().strftime('%Y-%m-%d')}"
-            hash_val = int(hashlib.md5(seed_key.encode()).hexdigest(), 16)
-            change_percent = (hash_val % 1500) / 100.0 - 5.0  # -5% to +10%
-            pred_factor = 0.05 + ((hash_val % 1000) / 10000.0) # 0.05 to 0.15
-            prediction_7d = current_price * (1 + pred_factor)
-            trend = 'Bullish' if change_percent > 0 else 'Bearish'
-            
-            # Calculate kg prices (1 quintal = 100 kg)
-            current_price_kg = current_price / 100
-            min_price_kg = min_price / 100
-            max_price_kg = max_price / 100
-            prediction_7d_kg = prediction_7d / 100
-            
-            market_data.append({
-                'commodity': record.get('commodity', 'Unknown'),
-                'mandi': record.get('market', 'Unknown Market'),
-                'state': record.get('state', 'Tamil Nadu'),
-                'district': record.get('district', ''),
-                'current_price': int(current_price),
-                'current_price_kg': round(current_price_kg, 2),
-                'unit': record.get('unit', 'Quintal'),
-                'change': f"{'+' if change_percent > 0 else ''}{change_percent:.1f}%",
-                'trend': trend,
-                'prediction_7d': int(prediction_7d),
-                'prediction_7d_kg': round(prediction_7d_kg, 2),
-                'confidence': random.randint(80, 95),
-                'min_price': int(min_price),
-                'max_price': int(max_price),
-                'min_price_kg': round(min_price_kg, 2),
-                'max_price_kg': round(max_price_kg, 2),
-                'arrival': record.get('arrival', 'N/A'),
-                'arrival_date': record.get('price_date', datetime.now().strftime('%Y-%m-%d'))
-            })
-        except Exception as e:
-            print(f"Error formatting record: {e}")
-            continue
-    
-    return market_data
-
-def fetch_mandi_prices(state=None, limit=None):
+def fetch_mandi_prices(state=None, limit=None, district=None):
     """Fetch mandi prices - first try scheduled data, then fallback to API"""
     try:
-        # First, try to load from scheduled daily updates
-        scheduled_data, last_updated = load_daily_market_data()
+        # First, try the display rows precomputed with the scheduled daily update
+        price_index = get_price_index()
         
-        if scheduled_data:
-            print(f"[INFO] Using scheduled market data from: {last_updated}")
-            formatted_data = format_scheduled_data_for_display(scheduled_data)
+        if price_index is not None:
+            print(f"[INFO] Using scheduled market data from: {price_index.last_updated}")
+            formatted_data = price_index.display_rows(
+                state=state if state != 'All States' else None,
+                district=district if district != 'All Districts' else None)
             
             # Filter by state if requested
             if state and state != 'All States':
@@ -184,7 +157,6 @@ def fetch_mandi_prices_from_api(state=None, limit=20):
                     
                     # Simulate price change and prediction for demo
                     # Simulate price change (Stable/Deterministic)
-                    import hashlib
                     comm = record.get('Commodity') or record.get('commodity', '')
                     mkt = record.get('Market_Name') or record.get('market', '')
                     seed_key = f"{comm}_{mkt}_{datetime.now().strftime('%Y-%m-%d')}"
@@ -215,7 +187,7 @@ def fetch_mandi_prices_from_api(state=None, limit=20):
                         'trend': trend,
                         'prediction_7d': int(prediction_7d),
                         'prediction_7d_kg': round(prediction_7d_kg, 2),
-                        'confidence': random.randint(75, 95),
+                        'confidence': 80 + hash_val // 1500 % 16,
                         'min_price': int(float(min_price_val)) if min_price_val else int(current_price),
                         'max_price': int(float(max_price_val)) if max_price_val else int(current_price),
                         'min_price_kg': round(min_price_kg, 2),
@@ -264,161 +236,63 @@ def market_watch():
     
     print(f"Fetching market data for state: {selected_state}, district: {selected_district}, commodity: {selected_commodity}")
     
-    # Fetch real-time market data (no limit to show all commodities)
-    market_data = fetch_mandi_prices(state=selected_state if selected_state != 'All States' else None, limit=None)
+    state_filter = selected_state if selected_state and selected_state != 'All States' else None
+    district_filter = selected_district if selected_district and selected_district != 'All Districts' else None
+    # The commodity filter is either a category name from the dropdown or free text (partial match)
+    selected_category = category_key(selected_commodity)
+    query = selected_commodity if selected_commodity and selected_commodity != 'All' and not selected_category else None
     
-    # Ensure market_data is always a list, never None
-    if market_data is None:
-        market_data = []
+    price_index = get_price_index()
     
     # Get districts for the selected state
-    if selected_state != 'All States' and selected_state in states_districts:
-        districts = sorted(states_districts[selected_state])
+    if state_filter and state_filter in states_districts:
+        districts = sorted(states_districts[state_filter])
     else:
-        # Get unique districts from market data
-        districts = set()
-        for item in market_data:
-            if item.get('district'):
-                districts.add(item['district'])
-        districts = sorted(list(districts))
-    
-    # Filter by district if selected
-    if selected_district != 'All Districts' and selected_district:
-        market_data = [item for item in market_data if item.get('district') == selected_district]
-    
-    # Filter by commodity if selected (supports partial matching for search)
-    if selected_commodity and selected_commodity != 'All':
-        if selected_commodity == 'Vegetables':
-            # Filter to show only vegetables
-            market_data = [item for item in market_data if item.get('commodity') in vegetables_list]
-        elif selected_commodity == 'Fruits':
-            # Filter to show only fruits  
-            market_data = [item for item in market_data if item.get('commodity') in fruits_list]
-        elif selected_commodity == 'Grains':
-            # Filter to show only cereals/grains
-            market_data = [item for item in market_data if item.get('commodity') in cereals_list]
-        elif selected_commodity == 'Pulses':
-            # Filter to show only pulses
-            market_data = [item for item in market_data if item.get('commodity') in pulses_list]
-        elif selected_commodity == 'Oilseeds':
-            # Filter to show only oilseeds
-            market_data = [item for item in market_data if item.get('commodity') in oilseeds_list]
-        elif selected_commodity == 'Spices':
-            # Filter to show only spices
-            market_data = [item for item in market_data if item.get('commodity') in spices_list]
-        elif selected_commodity == 'Commercial Crops':
-            # Filter to show only commercial crops
-            market_data = [item for item in market_data if item.get('commodity') in commercial_list]
-        elif selected_commodity == 'Dry Fruits':
-            # Filter to show only dry fruits
-            market_data = [item for item in market_data if item.get('commodity') in dry_fruits_list]
-        elif selected_commodity == 'Animal Products':
-            # Filter to show only animal products
-            market_data = [item for item in market_data if item.get('commodity') in animal_list]
-        else:
-            # Case-insensitive partial match for search functionality (for specific commodities)
-            market_data = [item for item in market_data if selected_commodity.lower() in item.get('commodity', '').lower()]
-    
-    # Categorize into vegetables and fruits - MUST match generate_market_data.py exactly
-    vegetables_list = [
-        "Tomato", "Onion", "Potato", "Brinjal", "Cabbage", "Cauliflower",
-        "Carrot", "Beetroot", "Green Chilli", "Capsicum (Green)", "Capsicum (Red)",
-        "Capsicum (Yellow)", "Beans", "Cluster Beans", "Lady Finger", "Drumstick",
-        "Bottle Gourd", "Ridge Gourd", "Snake Gourd", "Bitter Gourd", "Pumpkin",
-        "Ash Gourd", "Radish", "Turnip", "Sweet Corn", "Peas", "Garlic",
-        "Ginger", "Coriander Leaves", "Spinach"
-    ]
+        # Get unique districts from the market data
+        districts = [d for d in price_index.districts() if d] if price_index else []
     
-    fruits_list = [
-        "Apple", "Banana", "Orange", "Mosambi", "Grapes", "Pomegranate",
-        "Papaya", "Pineapple", "Watermelon", "Muskmelon", "Mango", "Guava",
-        "Lemon", "Custard Apple", "Sapota", "Strawberry", "Kiwi", "Pear",
-        "Plum", "Peach"
-    ]
-    cereals_list = [
-        "Paddy (Rice – Common)", "Paddy (Basmati)", "Wheat", "Maize (Corn)", "Barley",
-        "Jowar (Sorghum)", "Bajra (Pearl Millet)", "Ragi (Finger Millet)"
-    ]
-    pulses_list = [
-        "Red Gram (Tur/Arhar)", "Green Gram (Moong)", "Black Gram (Urad)", "Bengal Gram (Chana)",
-        "Lentil (Masur)", "Horse Gram", "Field Pea"
-    ]
-    oilseeds_list = [
-        "Groundnut", "Mustard Seed", "Soybean", "Sunflower Seed", "Sesame (Gingelly)",
-        "Castor Seed", "Linseed"
-    ]
-    spices_list = [
-        "Dry Chilli", "Turmeric", "Coriander Seed", "Cumin Seed (Jeera)", "Pepper (Black)",
-        "Cardamom", "Clove"
-    ]
-    commercial_list = [
-        "Sugarcane", "Cotton", "Jute", "Copra (Dry Coconut)", "Tobacco", "Tea Leaves", "Coffee Beans"
-    ]
-    dry_fruits_list = [
-        "Coconut", "Cashew Nut", "Groundnut Kernel", "Almond", "Walnut", "Raisins"
-    ]
-
-    animal_list = [
-        "Milk", "Cow Ghee", "Buffalo Ghee", "Egg", "Poultry Chicken", "Fish (Common Varieties)"
-    ]
-
-    vegetables = [item for item in market_data if item.get('commodity') in vegetables_list]
-    fruits = [item for item in market_data if item.get('commodity') in fruits_list]
-    cereals = [item for item in market_data if item.get('commodity') in cereals_list]
-    pulses = [item for item in market_data if item.get('commodity') in pulses_list]
-    oilseeds = [item for item in market_data if item.get('commodity') in oilseeds_list]
-    spices = [item for item in market_data if item.get('commodity') in spices_list]
-    commercial = [item for item in market_data if item.get('commodity') in commercial_list]
-    dry_fruits = [item for item in market_data if item.get('commodity') in dry_fruits_list]
-
-    animal = [item for item in market_data if item.get('commodity') in animal_list]
+    # Only the first page of every category is rendered; the page fetches the rest from /api/market/prices
+    buckets = {key: [] for key in CATEGORY_KEYS}
+    category_totals = {key: 0 for key in CATEGORY_KEYS}
+    next_cursors = {}
+    total_records = bullish_count = 0
+    if price_index is not None:
+        # Counts and trends of every category: precomputed per state/district unless a text filter applies
+        summary = price_index.category_summary(state_filter, district_filter,
+                                               matching_commodities(price_index, None, query))
+        for key, (count, bullish) in summary.items():
+            if (selected_category and selected_category != key) or not count:
+                continue
+            buckets[key], category_totals[key], next_cursors[key] = market_price_page(
+                price_index, state_filter, district_filter,
+                matching_commodities(price_index, category_commodities(key), query))
+            total_records += count
+            bullish_count += bullish
+    else:
+        # Data.gov.in fallback: a small result, bucketed here in one pass
+        market_data = fetch_mandi_prices(state=state_filter, district=district_filter) or []
+        for item in market_data:
+            key = CATEGORY_OF.get(item.get('commodity'))
+            if key is None or (selected_category and selected_category != key):
+                continue
+            if district_filter and item.get('district') != district_filter:
+                continue
+            if query and query.lower() not in item.get('commodity', '').lower():
+                continue
+            buckets[key].append(item)
+            category_totals[key] += 1
+            total_records += 1
+            bullish_count += not str(item.get('change', '0')).startswith('-')
+    bearish_count = total_records - bullish_count
     
     # Format current date
     current_date = datetime.now().strftime('%B %d, %Y')
     
     # Calculate statistics for the new UI
-    total_records = len(market_data) if market_data else 28400
     total_states = len(all_states)
     
-    # Count bullish and bearish trends
-    bullish_count = 0
-    bearish_count = 0
-    for item in market_data:
-        change_val = item.get('change', 0)
-        if isinstance(change_val, str):
-            change_val = float(change_val.replace('%', '').replace('+', ''))
-        if change_val >= 0:
-            bullish_count += 1
-        else:
-            bearish_count += 1
-    
-    # Format market data for new template (add 'change' as number and price fields)
-    for item in market_data:
-        change_val = item.get('change', 0)
-        if isinstance(change_val, str):
-            item['change'] = float(change_val.replace('%', '').replace('+', ''))
-        # Ensure price fields exist for template (convert to kg prices)
-        if 'modal_price' not in item and 'current_price_kg' in item:
-            item['modal_price'] = item['current_price_kg']
-        if 'min_price' not in item and 'current_price_kg' in item:
-            item['min_price'] = item['min_price_kg']
-        if 'max_price' not in item and 'current_price_kg' in item:
-            item['max_price'] = item['max_price_kg']
-    
-    
     return render_template('market_watch.html', 
                          user_name=user_name,
-                         market_data=market_data,
-                         vegetables=vegetables,
-                         fruits=fruits,
-                         cereals=cereals,
-                         pulses=pulses,
-                         oilseeds=oilseeds,
-                         spices=spices,
-                         commercial=commercial,
-                         dry_fruits=dry_fruits,
-
-                         animal=animal,
                          states=all_states,
                          states_districts=states_districts,
                          selected_state=selected_state,
@@ -430,15 +304,83 @@ def market_watch():
                          total_states=total_states,
                          bullish_count=bullish_count,
                          bearish_count=bearish_count,
-                         vegetable_count=len(vegetables_list),
-                         fruit_count=len(fruits_list),
-                         cereals_count=len(cereals_list),
-                         pulses_count=len(pulses_list),
-                         oilseeds_count=len(oilseeds_list),
-                         spices_count=len(spices_list),
-                         commercial_count=len(commercial_list),
-                         dry_fruits_count=len(dry_fruits_list),
-                         animal_count=len(animal_list))
+                         category_totals=category_totals,
+                         next_cursors=next_cursors,
+                         commodity_query=query,
+                         page_size=MARKET_PAGE_SIZE,
+                         vegetable_count=len(COMMODITY_CATEGORIES['vegetables'][1]),
+                         fruit_count=len(COMMODITY_CATEGORIES['fruits'][1]),
+                         cereals_count=len(COMMODITY_CATEGORIES['cereals'][1]),
+                         pulses_count=len(COMMODITY_CATEGORIES['pulses'][1]),
+                         oilseeds_count=len(COMMODITY_CATEGORIES['oilseeds'][1]),
+                         spices_count=len(COMMODITY_CATEGORIES['spices'][1]),
+                         commercial_count=len(COMMODITY_CATEGORIES['commercial'][1]),
+                         dry_fruits_count=len(COMMODITY_CATEGORIES['dry_fruits'][1]),
+                         animal_count=len(COMMODITY_CATEGORIES['animal'][1]),
+                         **buckets)
+
+@market_bp.route('/api/market/prices')
+@login_required
+def market_prices_api():
+    """
+    Paginated market watch rows. Query parameters: state, district, category
+    (e.g. vegetables or Vegetables), q (commodity text), sort (price, change or
+    commodity, '-' prefix for descending), fields (comma separated), limit and
+    cursor (the next_cursor of the previous page).
+    """
+    price_index = get_price_index()
+    if price_index is None:
+        return jsonify({
+            'success': False,
+            'error': 'No market data available'
+        }), 400
+    
+    state = request.args.get('state') or None
+    district = request.args.get('district') or None
+    state = None if state == 'All States' else state
+    district = None if district == 'All Districts' else district
+    query = request.args.get('q', '').strip() or None
+    
+    category = request.args.get('category') or None
+    if category in ('All', None):
+        names = None
+    elif category_key(category):
+        names = category_commodities(category_key(category))
+    else:
+        return jsonify({'success': False, 'error': f'Unknown category: {category}'}), 400
+    
+    sort = request.args.get('sort') or None
+    if sort and sort.lstrip('-') not in SORT_KEYS:
+        return jsonify({'success': False, 'error': f"sort must be one of {', '.join(SORT_KEYS)}"}), 400
+    
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or None
+    unknown_fields = sorted(set(fields or []) - set(DISPLAY_FIELDS))
+    if unknown_fields:
+        return jsonify({'success': False, 'error': f"Unknown fields: {', '.join(unknown_fields)}"}), 400
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', MARKET_PAGE_SIZE)), MARKET_API_MAX_LIMIT))
+        version, offset = decode_cursor(request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid limit or cursor'}), 400
+    if version is not None and version != price_index.region_version(state):
+        return jsonify({
+            'success': False,
+            'error': 'Market data was refreshed, start again from the first page'
+        }), 409
+    
+    rows, total, next_cursor = market_price_page(
+        price_index, state, district, matching_commodities(price_index, names, query),
+        sort=sort, fields=fields, limit=limit, offset=offset)
+    
+    return jsonify({
+        'success': True,
+        'data': rows,
+        'count': len(rows),
+        'total': total,
+        'next_cursor': next_cursor,
+        'last_updated': price_index.last_updated
+    })
 
 @market_bp.route('/api/refresh-prices')
 @login_required
@@ -465,76 +407,31 @@ def nearby_mandis():
         user_lon = float(request.args.get('lon'))
         radius = float(request.args.get('radius', 50))  # Default 50km radius
         
-        # Use scheduled data instead of making API call to avoid rate limiting
-        scheduled_data, last_updated = load_daily_market_data()
+        # Markets are resolved to coordinates and gridded once per data version
+        geo_index = get_geo_index()
         
-        if not scheduled_data:
+        if geo_index is None:
             return jsonify({
                 'success': False,
                 'error': 'No market data available'
             }), 400
         
-        # Load district coordinates
-        district_coords = load_district_coordinates()
+        nearest, total = geo_index.nearest(user_lat, user_lon, radius, limit=NEARBY_MANDIS_LIMIT)
         
         nearby_markets = []
-        
-        # Calculate actual distances based on district/city locations
-        for record in scheduled_data:
-            try:
-                current_price = record.get('modal_price', 0)
-                
-                if current_price == 0:
-                    continue
-                
-                # Get district and state
-                district = record.get('district', '')
-                state = record.get('state', '')
-                market = record.get('market', '')
-                
-                # Try to find coordinates for the district or extract city from market name
-                coords = None
-                
-                # First try: match district in coordinates
-                if state in district_coords and district in district_coords[state]:
-                    coords = district_coords[state][district]
-                # Second try: check if market name contains a known city
-                elif state in district_coords:
-                    for city_name in district_coords[state].keys():
-                        if city_name.lower() in market.lower():
-                            coords = district_coords[state][city_name]
-                            break
-                
-                # If no coordinates found, skip this market
-                if not coords:
-                    continue
-                
-                # Calculate actual distance
-                distance = calculate_distance(user_lat, user_lon, coords['lat'], coords['lon'])
-                
-                # Only include markets within the radius
-                if distance > radius:
-                    continue
-                
-                # Calculate kg price
-                current_price_kg = current_price / 100
-                
-                nearby_markets.append({
-                    'commodity': record.get('commodity', 'Unknown'),
-                    'mandi': record.get('market', 'Unknown Mandi'),
-                    'state': state,
-                    'district': district,
-                    'current_price': int(current_price),
-                    'current_price_kg': round(current_price_kg, 2),
-                    'distance': round(distance, 1),
-                    'arrival_date': record.get('price_date', 'N/A')
-                })
-            except (ValueError, TypeError) as e:
-                print(f"Error processing record: {e}")
-                continue
-        
-        # Sort by distance
-        nearby_markets.sort(key=lambda x: x['distance'])
+        for position, distance in nearest:
+            record = geo_index.snapshot.record(position)
+            current_price = record.get('modal_price', 0)
+            nearby_markets.append({
+                'commodity': record.get('commodity', 'Unknown'),
+                'mandi': record.get('market', 'Unknown Mandi'),
+                'state': record.get('state', ''),
+                'district': record.get('district', ''),
+                'current_price': int(current_price),
+                'current_price_kg': round(current_price / 100, 2),
+                'distance': round(distance, 1),
+                'arrival_date': record.get('price_date', 'N/A')
+            })
         
         # If no nearby markets found within radius, show a helpful message
         if len(nearby_markets) == 0:
@@ -547,8 +444,8 @@ def nearby_mandis():
         
         return jsonify({
             'success': True,
-            'data': nearby_markets[:15],  # Return top 15 nearest
-            'count': len(nearby_markets)
+            'data': nearby_markets,
+            'count': total
         })
     
     except Exception as e:
@@ -565,21 +462,23 @@ def price_trend(commodity):
     """API endpoint to get price trend data for a commodity"""
     state = request.args.get('state', None)
     district = request.args.get('district', None)
-    days = int(request.args.get('days', 7))
+    days = request.args.get('days', 7, type=int)
+    if days not in TREND_WINDOWS:
+        return jsonify({
+            'success': False,
+            'error': f"days must be one of {', '.join(map(str, TREND_WINDOWS))}"
+        }), 400
     
     # Load scheduled data
-    scheduled_data, _ = load_daily_market_data()
+    price_index = get_price_index()
     
-    if not scheduled_data:
+    if price_index is None:
         return jsonify({
             'success': False,
             'error': 'No market data available'
         }), 400
     
-    # Filter data for the commodity
-    commodity_data = [item for item in scheduled_data if item.get('commodity') == commodity]
-    
-    if not commodity_data:
+    if not price_index.count(commodity=commodity):
         return jsonify({
             'success': False,
             'error': f'No trend data found for {commodity}'
@@ -587,61 +486,41 @@ def price_trend(commodity):
 
     # Keep track of what level of data we're using
     data_level = 'national'
+    filters = {'commodity': commodity}
     
     # Try to filter by district first
-    if district and district != 'All Districts':
-        district_data = [item for item in commodity_data if item.get('district') == district]
-        if district_data:
-            commodity_data = district_data
-            data_level = 'district'
-        else:
-            # Fallback to state if district not found
-            if state and state != 'All States':
-                state_data = [item for item in commodity_data if item.get('state') == state]
-                if state_data:
-                    commodity_data = state_data
-                    data_level = 'state'
-    elif state and state != 'All States':
-        state_data = [item for item in commodity_data if item.get('state') == state]
-        if state_data:
-            commodity_data = state_data
-            data_level = 'state'
-        
-    # Group by date and calculate average modal price
-    # In a real app, this would query a historical database
-    # Here, we simulate some historical data based on the current variations if not enough dates exist
+    if district and district != 'All Districts' and price_index.count(district=district, commodity=commodity):
+        filters['district'] = district
+        data_level = 'district'
+    elif state and state != 'All States' and price_index.count(state=state, commodity=commodity):
+        # Fallback to state if district not found
+        filters['state'] = state
+        data_level = 'state'
     
-    # Get unique dates from the data
-    dates_found = sorted(list(set([item.get('price_date') for item in commodity_data if item.get('price_date')])))
+    # Price history across scheduler runs, or the price dates of the current
+    # snapshot, whichever covers more of the window
+    region = {field: value for field, value in filters.items() if field != 'commodity'}
+    trend_data = get_history().trend(commodity, days=days, **region)
+    data_source = 'history'
+    current_dates = price_index.date_trend(**filters)[-days:]
+    if len(current_dates) > len(trend_data):
+        trend_data, data_source = current_dates, 'snapshot'
     
-    trend_data = []
-    
-    # If we have multiple dates, use them
-    if len(dates_found) > 1:
-        for date_str in dates_found[-days:]:
-            date_items = [item for item in commodity_data if item.get('price_date') == date_str]
-            if date_items:
-                avg_modal = sum([item.get('modal_price', 0) for item in date_items]) / len(date_items)
-                avg_min = sum([item.get('min_price', 0) for item in date_items]) / len(date_items)
-                avg_max = sum([item.get('max_price', 0) for item in date_items]) / len(date_items)
-                
-                trend_data.append({
-                    'date': date_str,
-                    'modal_price': int(avg_modal),
-                    'min_price': int(avg_min),
-                    'max_price': int(avg_max)
-                })
-    else:
+    if len(trend_data) < 2:
         # Simulate 7 days of historical data if only one date or no dated data exists
         # This is for demo purposes to show a nice chart
-        base_item = commodity_data[0]
+        data_source = 'simulated'
+        trend_data = []
+        base_item = price_index.records(limit=1, **filters)[0]
         base_price = base_item.get('modal_price', 2500)
         base_date = datetime.now()
         
         for i in range(days-1, -1, -1):
             date_obj = base_date - timedelta(days=i)
-            # Add some random variation (-3% to +5%)
-            variation = 1 + (random.uniform(-0.03, 0.05) * (days - i) / days)
+            # Add some variation (-3% to +5%), stable for the commodity and the day
+            seed_key = f"{commodity}_{date_obj.strftime('%Y-%m-%d')}"
+            step = int(hashlib.md5(seed_key.encode()).hexdigest(), 16) % 800 / 10000.0 - 0.03
+            variation = 1 + (step * (days - i) / days)
             sim_price = int(base_price * variation)
             
             trend_data.append({
@@ -652,22 +531,65 @@ def price_trend(commodity):
             })
             
     # Calculate trend analysis
-    first_price = trend_data[0]['modal_price']
-    last_price = trend_data[-1]['modal_price']
-    change_percent = ((last_price - first_price) / first_price) * 100
-    
-    direction = 'Rising' if change_percent > 2 else 'Falling' if change_percent < -2 else 'Stable'
-    recommendation = 'Wait' if direction == 'Rising' else 'Sell Now' if direction == 'Falling' else 'Sell Now'
+    stats = trend_statistics([[point['modal_price'] for point in trend_data]])
+    direction = str(stats['direction'][0])
     
     return jsonify({
         'success': True,
         'commodity': commodity,
         'data_level': data_level,
+        'data_source': data_source,
         'trend_data': trend_data,
         'analysis': {
             'direction': direction,
-            'change_percent': round(change_percent, 1),
-            'recommendation': recommendation,
-            'confidence': random.randint(75, 92)
+            'change_percent': round(float(stats['change_percent'][0]), 1),
+            'recommendation': recommendation(direction),
+            'moving_average': round(float(stats['moving_average'][0]), 2),
+            'volatility': round(float(stats['volatility'][0]), 2),
+            'confidence': int(stats['confidence'][0])
         }
     })
+
+@market_bp.route('/api/price-trends', methods=['GET', 'POST'])
+@login_required
+def price_trends():
+    """
+    Trend statistics of many commodities in one region. Parameters, as query
+    string or JSON body: commodities (list or comma separated, every commodity
+    when omitted), state, district and days (7, 30, 90 or 365).
+    """
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    state = params.get('state') or None
+    district = params.get('district') or None
+    state = None if state == 'All States' else state
+    district = None if district == 'All Districts' else district
+    try:
+        days = int(params.get('days', 7))
+    except (TypeError, ValueError):
+        days = None
+    if days not in TREND_WINDOWS:
+        return jsonify({
+            'success': False,
+            'error': f"days must be one of {', '.join(map(str, TREND_WINDOWS))}"
+        }), 400
+    
+    commodities = params.get('commodities') or []
+    if isinstance(commodities, str):
+        commodities = [name.strip() for name in commodities.split(',') if name.strip()]
+    
+    trends = region_trends(state, district, days)
+    if trends is None:
+        return jsonify({
+            'success': False,
+            'error': 'No market data available'
+        }), 400
+    
+    names = commodities or sorted(trends)
+    return jsonify({
+        'success': True,
+        'state': state,
+        'district': district,
+        'days': days,
+        'trends': [trends[name] for name in names if name in trends],
+        'missing': [name for name in names if name not in trends]
+    })
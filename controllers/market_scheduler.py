@@ -1,21 +1,26 @@
 from flask import Blueprint
-import google.generativeai as genai
-from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import os
-import random
 import hashlib
+import numpy as np
+from utils.commodity_catalog import BASE_PRICES
+from utils.market_history import append_history, has_partition
+from utils.file_lock import hold_lease
+from utils.gemini import generative_model
+from utils.market_price_index import get_price_index
+from utils.market_snapshot import (SNAPSHOT_DIR, MarketSnapshot, concat_columns, encode_columns, load_snapshot,
+                                   read_partitions, save_columns)
 
 scheduler_bp = Blueprint('scheduler', __name__)
 
-# Configure Gemini API
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', 'YOUR_GEMINI_API_KEY_HERE')
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemma-3-4b-it')
+# Staggered daily refresh: one state every MARKET_REFRESH_STAGGER_MINUTES from MARKET_REFRESH_START
+MARKET_REFRESH_START = os.environ.get('MARKET_REFRESH_START', '09:00')
+MARKET_REFRESH_STAGGER_MINUTES = int(os.environ.get('MARKET_REFRESH_STAGGER_MINUTES', '2'))
 
-# Market price data file
-MARKET_DATA_FILE = 'data/market_prices.json'
+# Held by the one process that runs the market jobs; the others check on it every MARKET_FOLLOW_SECONDS
+SCHEDULER_LEASE = os.path.join(SNAPSHOT_DIR, 'SCHEDULER')
+MARKET_FOLLOW_SECONDS = int(os.environ.get('MARKET_FOLLOW_SECONDS', '30'))
 
 # All Indian states
 INDIAN_STATES = [
@@ -106,7 +111,7 @@ Format as JSON array. Generate at least 50 records covering all major states. Ex
 
 Keep prices realistic for December 2025."""
 
-        response = model.generate_content(prompt)
+        response = generative_model().generate_content(prompt)
         response_text = response.text
         
         # Extract JSON from response
@@ -136,212 +141,150 @@ def load_states_districts():
         print(f"Error loading states_districts.json: {str(e)}")
         return {}
 
-def generate_fallback_prices():
-    """Fallback realistic prices - ALL vegetables and fruits for EACH district (28,400 entries)"""
-    
-    # Load all states and districts from JSON file
+def generate_price_columns(date_today=None, states=None):
+    """
+    Generate every commodity for every district (of the given states, default
+    all) in one shot as columns: (prices, codes, vocab) in the layout of
+    utils.market_snapshot. Prices are drawn from numpy Generators seeded with
+    the date and the state, so the same date gives the same prices in every
+    worker whether a state is generated alone or with the others, and the
+    global random state is left alone.
+    """
     states_districts = load_states_districts()
-    
-    # Base prices (in ₹/quintal) - 30 Vegetables + 20 Fruits = 50 commodities
-    base_prices = {
-        # 🥕 Vegetables (30 types)
-        "Tomato": (1000, 4000, ["Local", "Hybrid", "Cherry"]),
-        "Onion": (1200, 3500, ["Red", "White", "Pink"]),
-        "Potato": (800, 2000, ["Local", "Hybrid", "Imported"]),
-        "Brinjal": (1200, 3000, ["Long", "Round", "Green"]),
-        "Cabbage": (800, 2000, ["Green", "Red", "Grade A"]),
-        "Cauliflower": (1000, 2500, ["Local", "Grade A", "Premium"]),
-        "Carrot": (1500, 3000, ["Local", "Hybrid", "Ooty"]),
-        "Beetroot": (1200, 2800, ["Local", "Organic", "Grade A"]),
-        "Green Chilli": (2500, 6000, ["Local", "Hybrid", "Long"]),
-        "Capsicum (Green)": (2000, 5000, ["Local", "Hybrid", "Premium"]),
-        "Capsicum (Red)": (3000, 7000, ["Local", "Hybrid", "Premium"]),
-        "Capsicum (Yellow)": (3000, 7000, ["Local", "Hybrid", "Premium"]),
-        "Beans": (2000, 4500, ["French", "Cluster", "Local"]),
-        "Cluster Beans": (1800, 4000, ["Local", "Hybrid", "Premium"]),
-        "Lady Finger": (1500, 3500, ["Local", "Hybrid", "Premium"]),
-        "Drumstick": (2000, 5000, ["Local", "Hybrid", "Long"]),
-        "Bottle Gourd": (800, 2000, ["Local", "Long", "Round"]),
-        "Ridge Gourd": (1200, 2800, ["Local", "Long", "Short"]),
-        "Snake Gourd": (1000, 2500, ["Local", "Long", "Green"]),
-        "Bitter Gourd": (1500, 3500, ["Local", "Green", "White"]),
-        "Pumpkin": (600, 1500, ["Local", "Sweet", "Yellow"]),
-        "Ash Gourd": (700, 1800, ["Local", "Large", "Medium"]),
-        "Radish": (800, 2000, ["White", "Red", "Local"]),
-        "Turnip": (900, 2200, ["White", "Purple", "Local"]),
-        "Sweet Corn": (1800, 4000, ["Yellow", "White", "Hybrid"]),
-        "Peas": (3000, 6000, ["Local", "Frozen", "Premium"]),
-        "Garlic": (4000, 10000, ["Local", "Kashmiri", "Chinese"]),
-        "Ginger": (3000, 8000, ["Local", "Organic", "Premium"]),
-        "Coriander Leaves": (2000, 5000, ["Local", "Organic", "Fresh"]),
-        "Spinach": (1000, 2500, ["Local", "Organic", "Premium"]),
-        
-        # 🍎 Fruits (20 types)
-        "Apple": (5000, 12000, ["Shimla", "Kashmiri", "Imported"]),
-        "Banana": (1500, 3500, ["Robusta", "Yelakki", "Nendran"]),
-        "Orange": (2500, 5000, ["Nagpur", "Kinnow", "Mandarin"]),
-        "Mosambi": (2000, 4500, ["Local", "Hybrid", "Premium"]),
-        "Grapes": (4000, 10000, ["Green", "Black", "Red"]),
-        "Pomegranate": (5000, 12000, ["Bhagwa", "Arakta", "Ganesh"]),
-        "Papaya": (1500, 3500, ["Local", "Taiwan", "Hybrid"]),
-        "Pineapple": (2000, 4500, ["Queen", "Giant Kew", "Mauritius"]),
-        "Watermelon": (800, 2000, ["Striped", "Black", "Seedless"]),
-        "Muskmelon": (1500, 3500, ["Local", "Netted", "Honeydew"]),
-        "Mango": (3000, 10000, ["Alphonso", "Kesar", "Langra"]),
-        "Guava": (2000, 4000, ["Allahabad", "Pink", "White"]),
-        "Lemon": (2000, 5000, ["Kagzi", "Galgal", "Sweet"]),
-        "Custard Apple": (3000, 7000, ["Local", "Balanagar", "Arka Sahan"]),
-        "Sapota": (2500, 5500, ["Cricket Ball", "Oval", "Local"]),
-        "Strawberry": (10000, 25000, ["Camarosa", "Chandler", "Local"]),
-        "Kiwi": (12000, 25000, ["Green", "Golden", "Imported"]),
-        "Pear": (4000, 8000, ["Kashmir", "Chinese", "Bartlett"]),
-        "Plum": (4000, 9000, ["Black", "Red", "Yellow"]),
-        "Peach": (5000, 10000, ["Local", "Imported", "Yellow"]),
-        # 🌾 Cereals
-        "Paddy (Rice – Common)": (2000, 2500, ["Common", "Grade A"]),
-        "Paddy (Basmati)": (3500, 6000, ["Pusa", "1121", "Traditional"]),
-        "Wheat": (2200, 3000, ["Sharbati", "Lokwan", "Dara"]),
-        "Maize (Corn)": (1800, 2600, ["Yellow", "White", "Hybrid"]),
-        "Barley": (1600, 2200, ["Malt", "Feed"]),
-        "Jowar (Sorghum)": (2500, 4000, ["White", "Yellow", "Hybrid"]),
-        "Bajra (Pearl Millet)": (2000, 3000, ["Hybrid", "Desi"]),
-        "Ragi (Finger Millet)": (3000, 4500, ["Local", "Hybrid"]),
-
-        # 🌱 Pulses
-        "Red Gram (Tur/Arhar)": (6000, 11000, ["Desi", "Hybrid", "Lemon"]),
-        "Green Gram (Moong)": (7000, 10000, ["Shiny", "Medium", "Bold"]),
-        "Black Gram (Urad)": (6500, 9500, ["FAQ", "SQ", "Bold"]),
-        "Bengal Gram (Chana)": (5000, 7000, ["Desi", "Kabuli", "Kantola"]),
-        "Lentil (Masur)": (6000, 8500, ["Small", "Bold", "Canadian"]),
-        "Horse Gram": (4000, 6500, ["Red", "Brown"]),
-        "Field Pea": (3500, 5500, ["Green", "Yellow", "White"]),
-
-        # 🌰 Oilseeds
-        "Groundnut": (5500, 8000, ["Java", "Bold", "Runner"]),
-        "Mustard Seed": (4500, 6500, ["Black", "Yellow", "Mustard"]),
-        "Soybean": (4000, 6000, ["Yellow", "Black", "Mixed"]),
-        "Sunflower Seed": (4500, 6500, ["Hybrid", "Local"]),
-        "Sesame (Gingelly)": (10000, 16000, ["White", "Black", "Red"]),
-        "Castor Seed": (5000, 7000, ["Small", "Bold"]),
-        "Linseed": (5500, 7500, ["Brown", "Yellow"]),
-
-        # 🧂 Spices
-        "Dry Chilli": (12000, 25000, ["Teja", "Byadgi", "Guntur"]),
-        "Turmeric": (6000, 12000, ["Finger", "Bulb", "Powder"]),
-        "Coriander Seed": (7000, 11000, ["Eagle", "Scooter", "Badami"]),
-        "Cumin Seed (Jeera)": (25000, 55000, ["Ordinary", "Best", "Singapore"]),
-        "Pepper (Black)": (30000, 50000, ["Garbled", "Ungarbled", "Tellicherry"]),
-        "Cardamom": (100000, 250000, ["Small", "Bold", "Green"]),
-        "Clove": (60000, 90000, ["Zanzibar", "Madagascar"]),
-
-        # 🍬 Commercial
-        "Sugarcane": (300, 500, ["Co 0238", "Co 86032"]),
-        "Cotton": (5500, 9000, ["H-4", "Shanker-6", "Bunny"]),
-        "Jute": (4000, 6500, ["TD-5", "W-5", "Mesta"]),
-        "Copra (Dry Coconut)": (9000, 14000, ["Milling", "Edible"]),
-        "Tobacco": (4000, 15000, ["Flue Cured", "Burley"]),
-        "Tea Leaves": (15000, 40000, ["Darjeeling", "Assam", "Nilgiri"]),
-        "Coffee Beans": (20000, 45000, ["Arabica", "Robusta"]),
-
-        # 🥜 Dry Fruits
-        "Coconut": (1500, 3000, ["Large", "Medium", "Small"]),
-        "Cashew Nut": (80000, 120000, ["W320", "W240", "Splits"]),
-        "Groundnut Kernel": (8000, 12000, ["Bold", "Java"]),
-        "Almond": (60000, 90000, ["California", "Gurbandi", "Mamra"]),
-        "Walnut": (30000, 60000, ["Inshell", "Kernels"]),
-        "Raisins": (15000, 30000, ["Indian", "Afghan", "Black"]),
-
-        # 🐄 Animal
-        "Milk": (4000, 6500, ["Cow", "Buffalo", "Mixed"]),
-        "Cow Ghee": (45000, 70000, ["Desi", "Pure", "A2"]),
-        "Buffalo Ghee": (40000, 60000, ["Pure", "Mixed"]),
-        "Egg": (400, 700, ["White", "Brown"]),
-        "Poultry Chicken": (8000, 14000, ["Broiler", "Layer", "Cockerel"]),
-        "Fish (Common Varieties)": (10000, 25000, ["Rohu", "Catla", "Mrigal"])
+    if states is not None:
+        states_districts = {state: states_districts[state] for state in states if state in states_districts}
+    day = datetime.strptime(date_today, '%Y-%m-%d') if date_today else datetime.now()
+    date_today = day.strftime('%Y-%m-%d')
+
+    # Records run district by district, all commodities for each
+    places = [(state, district) for state, districts in states_districts.items() for district in districts]
+    commodities = list(BASE_PRICES)
+    n_commodities = len(commodities)
+    count = len(places) * n_commodities
+    commodity_idx = np.tile(np.arange(n_commodities), len(places))
+    place_idx = np.repeat(np.arange(len(places)), n_commodities)
+
+    rngs = [np.random.default_rng(int(hashlib.md5(f"{date_today}:{state}".encode()).hexdigest()[:8], 16))
+            for state in states_districts]
+    block_sizes = [len(districts) * n_commodities for districts in states_districts.values()]
+
+    def draw(method, *args):
+        # One block of values per state, each from that state's Generator
+        return np.concatenate([getattr(rng, method)(*args, size) for rng, size in zip(rngs, block_sizes)]
+                              + [np.zeros(0)])
+
+    min_base = np.array([BASE_PRICES[c][0] for c in commodities], dtype=np.float64)[commodity_idx]
+    max_base = np.array([BASE_PRICES[c][1] for c in commodities], dtype=np.float64)[commodity_idx]
+
+    # Regional price variation (±20%), deterministic for the date
+    regional_factor = draw('uniform', 0.8, 1.2)
+    min_price = (min_base * regional_factor * draw('uniform', 0.9, 1.0)).astype(np.int32)
+    max_price = (max_base * regional_factor * draw('uniform', 1.0, 1.1)).astype(np.int32)
+    modal_price = ((min_price + max_price) / 2 * draw('uniform', 0.95, 1.05)).astype(np.int32)
+
+    vocab = {}
+
+    def encode(field, values):
+        # Dictionary-encode a small list of values; returns the code of each
+        index = {}
+        codes = np.array([index.setdefault(v, len(index)) for v in values], dtype=np.int64)
+        vocab[field] = list(index)
+        return codes
+
+    state_codes = encode('state', [state for state, _ in places])
+    district_codes = encode('district', [district for _, district in places])
+    market_codes = encode('market', [f"{district} Mandi" for _, district in places])
+
+    # Variety: pick one of each commodity's varieties via a (commodity, choice) table
+    variety_table = np.zeros((n_commodities, max(len(BASE_PRICES[c][2]) for c in commodities)), dtype=np.int64)
+    variety_index = {}
+    for i, commodity in enumerate(commodities):
+        for j, variety in enumerate(BASE_PRICES[commodity][2]):
+            variety_table[i, j] = variety_index.setdefault(variety, len(variety_index))
+    vocab['variety'] = list(variety_index)
+    n_varieties = np.array([len(BASE_PRICES[c][2]) for c in commodities])[commodity_idx]
+    variety_choice = (draw('random') * n_varieties).astype(np.int64)
+
+    # Random date within last 7 days, arrivals of 50-1000 quintals
+    vocab['price_date'] = [(day - timedelta(days=k)).strftime('%Y-%m-%d') for k in range(7)]
+    vocab['arrival'] = [f"{q} quintals" for q in range(50, 1001)]
+    vocab['commodity'] = commodities
+    vocab['unit'] = ['Quintal']
+
+    columns = {
+        'commodity': commodity_idx,
+        'variety': variety_table[commodity_idx, variety_choice],
+        'market': market_codes[place_idx],
+        'state': state_codes[place_idx],
+        'district': district_codes[place_idx],
+        'price_date': draw('integers', 0, 7).astype(np.int64),
+        'arrival': draw('integers', 0, 951).astype(np.int64),
+        'unit': np.zeros(count, dtype=np.int64),
     }
-    
-    market_data = []
-    date_today = datetime.now().strftime('%Y-%m-%d')
-    
-    # Use date-based seed for deterministic random values (same date = same prices everywhere)
-    date_seed = int(hashlib.md5(date_today.encode()).hexdigest()[:8], 16)
-    random.seed(date_seed)
-    
-    # Generate data for ALL states and ALL districts from states_districts.json
-    for state, districts in states_districts.items():
-        for district in districts:
-            # Generate ALL 40 commodities for this district
-            for commodity, (min_base, max_base, varieties) in base_prices.items():
-                # Add regional price variation (±20%) - now deterministic based on date
-                regional_factor = random.uniform(0.8, 1.2)
-                min_price = int(min_base * regional_factor * random.uniform(0.9, 1.0))
-                max_price = int(max_base * regional_factor * random.uniform(1.0, 1.1))
-                modal_price = int((min_price + max_price) / 2 * random.uniform(0.95, 1.05))
-                
-                # Random date within last 7 days
-                days_ago = random.randint(0, 6)
-                from datetime import timedelta
-                price_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
-                
-                market_data.append({
-                    "commodity": commodity,
-                    "variety": random.choice(varieties),
-                    "market": f"{district} Mandi",
-                    "state": state,
-                    "district": district,
-                    "min_price": min_price,
-                    "max_price": max_price,
-                    "modal_price": modal_price,
-                    "price_date": price_date,
-                    "arrival": f"{random.randint(50, 1000)} quintals",
-                    "unit": "Quintal"
-                })
-    
-    # Reset random seed to avoid affecting other random operations
-    random.seed()
-    
-    print(f"[SUCCESS] Generated {len(market_data)} records covering 50 commodities for {len(states_districts)} states and all districts")
-    return market_data
+    codes = {field: column.astype(np.uint16 if len(vocab[field]) <= np.iinfo(np.uint16).max else np.int32)
+             for field, column in columns.items()}
+    prices = {'min_price': min_price, 'max_price': max_price, 'modal_price': modal_price}
+
+    print(f"[SUCCESS] Generated {count} records covering {n_commodities} commodities for {len(states_districts)} states and all districts")
+    return prices, codes, vocab
 
-def save_market_data(data):
-    """Save market data to JSON file"""
+def generate_fallback_prices():
+    """Fallback realistic prices - ALL commodities for EACH district, as a list of records"""
+    prices, codes, vocab = generate_price_columns()
+    return MarketSnapshot(None, None, prices, codes, vocab).records()
+
+def save_market_data(data, columns=None):
+    """Save market data as columnar snapshot partitions (columns: data already encoded as (prices, codes, vocab))"""
+    last_updated = datetime.now().isoformat()
+    columns = columns if columns is not None else encode_columns(data)
     try:
-        os.makedirs('data', exist_ok=True)
-        with open(MARKET_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump({
-                'last_updated': datetime.now().isoformat(),
-                'data': data
-            }, f, indent=2, ensure_ascii=False)
-        print(f"[SUCCESS] Market data saved: {len(data)} records")
-        return True
+        save_columns(*columns, last_updated=last_updated)
+        print(f"[SUCCESS] Market data saved: {len(columns[0]['modal_price'])} records")
     except Exception as e:
         print(f"Error saving market data: {str(e)}")
         return False
+    record_history(columns, last_updated)
+    return True
 
-def load_market_data():
-    """Load market data from JSON file"""
+def record_history(columns, last_updated):
+    """Append the day's prices (encoded columns) to the market price history"""
     try:
-        if os.path.exists(MARKET_DATA_FILE):
-            with open(MARKET_DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('data', []), data.get('last_updated')
-        return [], None
+        append_history(*columns, day=datetime.fromisoformat(last_updated).date())
     except Exception as e:
-        print(f"Error loading market data: {str(e)}")
-        return [], None
+        print(f"[WARNING] Could not record market price history: {str(e)}")
+
+def record_history_job():
+    """Record today's prices in the price history once the states were refreshed"""
+    snapshot = load_snapshot()
+    if snapshot is not None:
+        record_history(concat_columns(snapshot.parts), datetime.now().isoformat())
 
 def update_market_prices_job():
-    """Background job to update market prices daily"""
-    print(f"🔄 Running daily market price update for ALL INDIA at {datetime.now()}")
+    """Update the market prices of every state at once (first start)"""
+    print(f"🔄 Running market price update for ALL INDIA at {datetime.now()}")
     try:
         # Use fallback method for reliable all-India coverage
-        new_prices = generate_fallback_prices()
-        if new_prices:
-            save_market_data(new_prices)
-            print(f"[SUCCESS] All India prices updated! Total: {len(new_prices)} records for {len(INDIAN_STATES)} states")
+        columns = generate_price_columns()
+        if len(columns[0]['modal_price']):
+            save_market_data(None, columns)
+            print(f"[SUCCESS] All India prices updated! Total: {len(columns[0]['modal_price'])} records for {len(columns[2]['state'])} states")
     except Exception as e:
         print(f"[ERROR] Error in update job: {str(e)}")
 
+def update_state_prices_job(state):
+    """Update one state's market prices; only a changed state is written"""
+    try:
+        written = save_columns(*generate_price_columns(states=[state]))
+        print(f"[INFO] Market prices of {state} {'updated' if written else 'unchanged'}")
+    except Exception as e:
+        print(f"[ERROR] Error updating market prices of {state}: {str(e)}")
+
+def catch_up_job(states):
+    """Refresh stale states one at a time after a start, then record the day"""
+    for state in states:
+        update_state_prices_job(state)
+    record_history_job()
+
 def is_data_stale(last_updated):
     """Check if market data is stale (older than today)"""
     if not last_updated:
@@ -353,31 +296,81 @@ def is_data_stale(last_updated):
     except Exception:
         return True
 
-def init_scheduler(app):
-    """Initialize scheduler for daily updates at 9:00 AM"""
-    scheduler = BackgroundScheduler()
-    
+def add_market_jobs(scheduler):
+    """Add the staggered daily updates, one state every few minutes from 9:00 AM, and catch up on stale data"""
+    states = list(load_states_districts())
+    start = datetime.strptime(MARKET_REFRESH_START, '%H:%M')
+    for i, state in enumerate(states):
+        at = start + timedelta(minutes=i * MARKET_REFRESH_STAGGER_MINUTES)
+        scheduler.add_job(
+            func=update_state_prices_job,
+            args=[state],
+            trigger='cron',
+            hour=at.hour,
+            minute=at.minute,
+            id=f'market_update_{state}',
+            name=f'Update {state} Market Prices',
+            replace_existing=True
+        )
+    at = start + timedelta(minutes=len(states) * MARKET_REFRESH_STAGGER_MINUTES)
     scheduler.add_job(
-        func=update_market_prices_job,
+        func=record_history_job,
         trigger='cron',
-        hour=9,
-        minute=0,
-        id='daily_market_update',
-        name='Update All India Market Prices',
+        hour=at.hour,
+        minute=at.minute,
+        id='market_history',
+        name='Record Market Price History',
         replace_existing=True
     )
     
-    # Run at startup if no data OR if data is stale (from a previous day)
-    data, last_updated = load_market_data()
-    if not data:
-        print("[INFO] Generating initial market data for all India...")
-        update_market_prices_job()
-    elif is_data_stale(last_updated):
-        print(f"[INFO] Market data is stale (last updated: {last_updated}). Updating now...")
-        update_market_prices_job()
+    # Bring stale states up to date in the background instead of regenerating before startup
+    partitions = read_partitions()
+    if not partitions:
+        print("[INFO] No market data yet. Generating it for all India in the background...")
+        scheduler.add_job(func=update_market_prices_job, id='market_initial', replace_existing=True)
     else:
-        print(f"[INFO] Loaded {len(data)} records for all India, updated: {last_updated}")
-    
+        stale = [state for state in states if is_data_stale(partitions.get(state, {}).get('last_updated'))]
+        if stale:
+            print(f"[INFO] Market data of {len(stale)} state(s) is stale. Updating in the background...")
+            scheduler.add_job(func=catch_up_job, args=[stale], id='market_catch_up', replace_existing=True)
+        else:
+            print(f"[INFO] Market data of {len(partitions)} states is up to date")
+            if not has_partition(datetime.now().date()):
+                scheduler.add_job(func=record_history_job, id='market_history_catch_up', replace_existing=True)
+
+def follow_leader_job(scheduler):
+    """Take over the market jobs if the leader exited, else pick up the snapshot version it published"""
+    if hold_lease(SCHEDULER_LEASE):
+        print(f"[INFO] Process {os.getpid()} took over the market scheduler")
+        scheduler.remove_job('market_follow')
+        add_market_jobs(scheduler)
+    else:
+        # Starts the index rebuild when PARTITIONS moved, before a request asks for it
+        get_price_index()
+
+def init_scheduler(app):
+    """
+    Initialize the scheduler. Only the process holding the scheduler lease runs
+    the market jobs; the others follow the PARTITIONS manifest it writes (its
+    write generation is the version marker) and take over if it exits.
+    """
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    scheduler = BackgroundScheduler()
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    if hold_lease(SCHEDULER_LEASE):
+        add_market_jobs(scheduler)
+        print(f"[INFO] Scheduler started - Updates one state every {MARKET_REFRESH_STAGGER_MINUTES} min from {MARKET_REFRESH_START} daily")
+    else:
+        scheduler.add_job(
+            func=follow_leader_job,
+            args=[scheduler],
+            trigger='interval',
+            seconds=MARKET_FOLLOW_SECONDS,
+            id='market_follow',
+            name='Follow Market Scheduler Leader',
+            replace_existing=True
+        )
+        print(f"[INFO] Scheduler started - Market data updated by another process, checked every {MARKET_FOLLOW_SECONDS}s")
     scheduler.start()
-    print("[INFO] Scheduler started - Updates ALL INDIA prices daily at 9:00 AM")
     return scheduler
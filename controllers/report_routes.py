@@ -10,18 +10,17 @@ from utils.db import (
     get_user_expenses
 )
 from controllers.dashboard_routes import weather_cache, price_predictions_cache, get_weather_notifications, get_price_predictions
+from utils.market_price_index import get_price_index
+import importlib.util
 import json
 import os
 
 from datetime import datetime, timedelta
 from bson import ObjectId
 
-# Check if xhtml2pdf is available (optional dependency)
-try:
-    from xhtml2pdf import pisa
-    XHTML2PDF_AVAILABLE = True
-except ImportError:
-    XHTML2PDF_AVAILABLE = False
+# Check if xhtml2pdf is available (optional dependency, imported by the PDF routes on first use)
+XHTML2PDF_AVAILABLE = importlib.util.find_spec('xhtml2pdf') is not None
+if not XHTML2PDF_AVAILABLE:
     print("[INFO] xhtml2pdf not available - PDF generation will use client-side")
 
 report_bp = Blueprint('report', __name__)
@@ -315,21 +314,16 @@ def get_market_report_data():
                 'data': None
             })
         
-        # Load market data
-        market_file = 'data/market_prices.json'
-        if not os.path.exists(market_file):
+        price_index = get_price_index()
+        if price_index is None:
             return jsonify({'success': False, 'message': 'Market data file missing'})
-            
-        with open(market_file, 'r', encoding='utf-8') as f:
-            market_data = json.load(f)
-            
-        # Filter for user's district
-        all_data = market_data.get('data', [])
-        district_prices = [item for item in all_data if item.get('district') == district]
         
+        # Filter for user's district
+        district_prices = price_index.records(district=district)
+        state_prices = price_index.records(state=state) if state else []
         if not district_prices:
             # Fallback to state data if district is empty
-            district_prices = [item for item in all_data if item.get('state') == state][:100]
+            district_prices = state_prices[:100]
         
         # Smart selection: ensure fruits are included
         fruits_list = ['Apple', 'Banana', 'Mango', 'Orange', 'Grapes', 'Papaya', 'Pineapple', 
@@ -349,9 +343,8 @@ def get_market_report_data():
                 
         # If district has no fruits, try to get some from the state
         if not fruits and state:
-            state_fruits = [item for item in all_data 
-                           if item.get('state') == state and 
-                           any(f.lower() in item.get('commodity', '').lower() for f in fruits_list)]
+            state_fruits = [item for item in state_prices
+                           if any(f.lower() in item.get('commodity', '').lower() for f in fruits_list)]
             fruits = state_fruits[:25]
             
         # Combine: 10 vegetables + up to 10 fruits
@@ -465,27 +458,19 @@ def download_market_prices_pdf():
     try:
         from flask import make_response, render_template
         from io import BytesIO
+        from xhtml2pdf import pisa
         
         user_id = session.get('user_id')
         user = find_user_by_id(user_id)
         
-        # Get market prices from data file
-        market_file = os.path.join('data', 'market_prices.json')
-        with open(market_file, 'r', encoding='utf-8') as f:
-            market_data = json.load(f)
-        
         # Filter by user's district if available
         user_district = user.get('district', '') if user else session.get('user_district', '')
-        prices = market_data.get('data', [])
-        
-        if user_district:
-            filtered_prices = [p for p in prices if p.get('district') == user_district]
-            if filtered_prices:
-                prices = filtered_prices[:50]
-            else:
-                prices = prices[:50]
-        else:
-            prices = prices[:50]
+        price_index = get_price_index()
+        prices = []
+        if price_index is not None:
+            prices = price_index.records(district=user_district, limit=50) if user_district else []
+            if not prices:
+                prices = price_index.records(limit=50)
         
         # Render HTML template
         html = render_template('pdf/market_prices.html',
@@ -521,6 +506,7 @@ def download_weather_pdf():
     try:
         from flask import make_response, render_template
         from io import BytesIO
+        from xhtml2pdf import pisa
         
         user_id = session.get('user_id')
         user = find_user_by_id(user_id)
@@ -579,6 +565,7 @@ def download_expense_pdf():
     try:
         from flask import make_response, render_template
         from io import BytesIO
+        from xhtml2pdf import pisa
         
         user_id = session.get('user_id')
         user = find_user_by_id(user_id)
@@ -641,6 +628,7 @@ def download_crop_progress_pdf():
     try:
         from flask import make_response, render_template
         from io import BytesIO
+        from xhtml2pdf import pisa
         
         user_id = session.get('user_id')
         user = find_user_by_id(user_id)
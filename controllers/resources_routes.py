@@ -1,22 +1,17 @@
 from flask import Blueprint, render_template, request, jsonify, session
 from utils.auth import login_required
-import google.generativeai as genai
 import os
 import json
 from datetime import datetime
 from dotenv import load_dotenv
+from utils.gemini import generative_model
 
 load_dotenv()
 
 resources_bp = Blueprint('resources', __name__, url_prefix='/resources')
 
-# Configure Gemini API
+# Gemini API key (the client itself is loaded on first use, see utils/gemini.py)
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-if GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-    except Exception as e:
-        print(f"Error configuring Gemini API in resources: {e}")
 
 @resources_bp.route('/calendar', methods=['GET', 'POST'])
 @login_required
@@ -81,7 +76,7 @@ def regional_calendar():
         if GEMINI_API_KEY:
             try:
                 # Using gemma-3-4b-it as requested for compatibility with the current API key
-                model = genai.GenerativeModel('gemma-3-4b-it')
+                model = generative_model()
                 response = model.generate_content(prompt)
                 
                 # Clean response text to ensure it's valid JSON
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for production:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+(started from the repository root, gunicorn reads this file by itself).
+The app is loaded once in the master with its read-only assets (ML models,
+market indexes, reference data), then forked, so the workers share those
+pages copy-on-write. Each worker opens its own database connection in
+post_fork, and the market scheduler jobs run in whichever worker takes the
+scheduler lease. GUNICORN_PRELOAD=0 loads the app in every worker instead.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+timeout = 120
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    # Keep the collector from writing to (and so copying) the preloaded objects in every worker
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import init_worker
+    init_worker(worker.app.wsgi())
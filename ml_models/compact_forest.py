@@ -0,0 +1,164 @@
+"""
+Array form of the crop RandomForest for single-row and batch inference.
+
+CropPredictor used to call scaler.transform(), model.predict() and
+model.predict_proba() for one row per request: three scikit-learn calls with
+their input validation, and each prediction walks the 100 tree objects one
+after the other. export_forest() flattens the trained forest into contiguous
+arrays with one entry per node of all trees:
+
+    feature     feature tested at the node (0 at leaves)
+    threshold   go left if x[feature] <= threshold (inf at leaves)
+    children    left and right child of each node; a leaf points at itself
+    leaf        row in values of each leaf (0 for inner nodes)
+    values      class distribution of each leaf
+    roots       first node of each tree
+    depth       levels of the deepest tree
+
+plus the StandardScaler's mean and scale. CompactForest.predict_proba()
+scales the input and rounds it to float32 exactly as scaler.transform() and
+the trees do, so every split goes the same way as in scikit-learn, then moves
+every row down every tree at once, one numpy step per tree level:
+
+    forest = load_forest(MODEL_PATH, SCALER_PATH)
+    probabilities = forest.predict_proba([[90, 42, 43, 20.9, 82.0, 6.5, 202.9]])
+
+The arrays are saved to crop_forest.npz with the md5 of the joblib files they
+came from; load_forest() reads that file (no scikit-learn import needed)
+while the digests match. Otherwise it exports the forest in memory from the
+joblib files, which needs scikit-learn, and never writes at runtime (the app
+may be deployed read-only). Export it after retraining with:
+
+    python -m ml_models.compact_forest
+"""
+import hashlib
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'crop_recommendation_model.joblib')
+SCALER_PATH = os.path.join(BASE_DIR, 'feature_scaler.joblib')
+FOREST_PATH = os.path.join(BASE_DIR, 'crop_forest.npz')
+
+ARRAYS = ('feature', 'threshold', 'children', 'leaf', 'values', 'roots', 'classes', 'depth', 'mean', 'scale')
+
+
+class CompactForest:
+    """A RandomForestClassifier (and its feature scaler) as flat node arrays"""
+
+    def __init__(self, feature, threshold, children, leaf, values, roots, classes, depth, mean, scale):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.children = np.ascontiguousarray(children, dtype=np.intp).reshape(-1)
+        self.leaf = np.ascontiguousarray(leaf, dtype=np.intp)
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.classes = np.asarray(classes)
+        self.depth = int(depth)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+    def predict_proba(self, X):
+        """Class probabilities (rows x classes) of one row or a batch, as RandomForestClassifier.predict_proba"""
+        # scaler.transform() in float64, then the trees' own cast of their input to float32
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        X = ((X - self.mean) / self.scale).astype(np.float32).astype(np.float64)
+        if len(X) == 1:
+            # One request's row: plain 1-d indexing has the least per-level overhead
+            x, node = X[0], self.roots
+            for _ in range(self.depth):
+                node = self.children[2 * node + (x[self.feature[node]] > self.threshold[node])]
+            return (self.values[self.leaf[node]].sum(axis=0) / len(self.roots))[None, :]
+        # Offset of each row in the flattened input
+        flat = X.ravel()
+        base = (np.arange(len(X)) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            # children holds (left, right) pairs: index 2 * node + (go right)
+            right = np.take(flat, base + np.take(self.feature, node)) > np.take(self.threshold, node)
+            node = np.take(self.children, 2 * node + right)
+        return np.take(self.values, np.take(self.leaf, node), axis=0).sum(axis=1) / len(self.roots)
+
+    def predict(self, X):
+        """Most probable class of each row (the first one on ties, as scikit-learn)"""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def arrays(self):
+        return {'feature': self.feature.astype(np.int32), 'threshold': self.threshold,
+                'children': self.children.reshape(-1, 2).astype(np.int32), 'leaf': self.leaf.astype(np.int32),
+                'values': self.values, 'roots': self.roots.astype(np.int32), 'classes': self.classes.astype(str),
+                'depth': np.array(self.depth), 'mean': self.mean, 'scale': self.scale}
+
+
+def export_forest(model, scaler=None):
+    """CompactForest of a fitted RandomForestClassifier whose inputs go through scaler (a StandardScaler) first"""
+    n_features = model.n_features_in_
+    mean = np.zeros(n_features) if scaler is None or getattr(scaler, 'mean_', None) is None else scaler.mean_
+    scale = np.ones(n_features) if scaler is None or getattr(scaler, 'scale_', None) is None else scaler.scale_
+
+    features, thresholds, children, leaves, values, roots = [], [], [], [], [], []
+    offset = leaf_offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        count = tree.node_count
+        is_leaf = tree.children_left < 0
+        node = np.arange(count)
+        feature = np.where(is_leaf, 0, tree.feature)
+        features.append(feature)
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        left = np.where(is_leaf, node, tree.children_left) + offset
+        right = np.where(is_leaf, node, tree.children_right) + offset
+        children.append(np.stack([left, right], axis=1))
+        leaf_rows = np.zeros(count, dtype=np.int64)
+        leaf_rows[is_leaf] = np.arange(is_leaf.sum()) + leaf_offset
+        leaves.append(leaf_rows)
+        distribution = tree.value[is_leaf, 0, :]
+        values.append(distribution / distribution.sum(axis=1, keepdims=True))
+        roots.append(offset)
+        offset += count
+        leaf_offset += int(is_leaf.sum())
+    return CompactForest(np.concatenate(features), np.concatenate(thresholds), np.concatenate(children),
+                         np.concatenate(leaves), np.concatenate(values), np.array(roots), model.classes_,
+                         max(estimator.tree_.max_depth for estimator in model.estimators_), mean, scale)
+
+
+def source_digest(*paths):
+    """md5 of the files a forest is exported from"""
+    digest = hashlib.md5()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def save_forest(forest, path, digest):
+    tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez_compressed(tmp_path, digest=np.array(digest), **forest.arrays())
+    os.replace(tmp_path, path)
+
+
+def load_forest(model_path=MODEL_PATH, scaler_path=SCALER_PATH, forest_path=FOREST_PATH):
+    """CompactForest of the joblib model and scaler, from forest_path while it matches them"""
+    digest = source_digest(model_path, scaler_path)
+    try:
+        with np.load(forest_path, allow_pickle=False) as saved:
+            if str(saved['digest']) == digest:
+                return CompactForest(*(saved[name] for name in ARRAYS))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARNING] Could not read {forest_path}: {e}")
+
+    # Missing or out of date: export from the joblib files in memory (needs scikit-learn)
+    print(f"[WARNING] {forest_path} does not match the joblib model; run `python -m ml_models.compact_forest`")
+    import joblib
+    return export_forest(joblib.load(model_path), joblib.load(scaler_path))
+
+
+if __name__ == '__main__':
+    import joblib
+    forest = export_forest(joblib.load(MODEL_PATH), joblib.load(SCALER_PATH))
+    save_forest(forest, FOREST_PATH, source_digest(MODEL_PATH, SCALER_PATH))
+    print(f"[SUCCESS] Exported {len(forest.roots)} trees, {len(forest.feature)} nodes, depth {forest.depth} "
+          f"to {FOREST_PATH} ({os.path.getsize(FOREST_PATH) / 1024:.0f} KB)")
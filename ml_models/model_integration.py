@@ -1,4 +1,7 @@
 import os
+import threading
+
+from utils.warmup import register
 
 # Console colors for consistent logging
 class Colors:
@@ -15,27 +18,21 @@ def log_info(msg): print(f"{Colors.BLUE}ℹ️  [INFO]{Colors.ENDC} {msg}")
 
 class CropPredictor:
     def __init__(self, model_dir="ml_models"):
-        self.model = None
-        self.scaler = None
+        self.forest = None
         self.use_sklearn = False
         self.load_model()
     
     def load_model(self):
         """Load the trained model or fallback to simple model"""
         try:
-            # Try to load sklearn model first
-            import joblib
-            # Use absolute path relative to this script
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            model_path = os.path.join(base_dir, 'crop_recommendation_model.joblib')
-            scaler_path = os.path.join(base_dir, 'feature_scaler.joblib')
+            # Try to load the trained sklearn model first, as flat arrays (see compact_forest.py)
+            from ml_models.compact_forest import MODEL_PATH, SCALER_PATH, load_forest
             
-            if os.path.exists(model_path) and os.path.exists(scaler_path):
-                self.model = joblib.load(model_path)
-                self.scaler = joblib.load(scaler_path)
+            if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
+                self.forest = load_forest(MODEL_PATH, SCALER_PATH)
                 self.use_sklearn = True
                 log_success("Scikit-learn crop model loaded successfully!")
-                log_info(f"Model classes: {len(self.model.classes_)} crops available")
+                log_info(f"Model classes: {len(self.forest.classes)} crops available")
                 return True
         except ImportError:
             log_info("Scikit-learn not available, falling back to simple model")
@@ -60,16 +57,14 @@ class CropPredictor:
     def predict_crop_recommendation(self, nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall):
         """Predict crop recommendation using available model"""
         try:
-            if self.use_sklearn and self.model and self.scaler:
-                # Use sklearn model
+            if self.use_sklearn and self.forest is not None:
+                # Use sklearn model (the forest applies the feature scaler itself)
                 import numpy as np
-                features = np.array([[nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]])
-                features_scaled = self.scaler.transform(features)
-                
-                prediction = self.model.predict(features_scaled)[0]
-                probabilities = self.model.predict_proba(features_scaled)[0]
+                features = [[nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]]
+                probabilities = self.forest.predict_proba(features)[0]
                 
-                class_names = self.model.classes_
+                class_names = self.forest.classes
+                prediction = class_names[np.argmax(probabilities)]
                 crop_probabilities = []
                 
                 for crop, prob in zip(class_names, probabilities):
@@ -154,5 +149,18 @@ class CropPredictor:
                 
         return BasicFallback()
 
-# Global predictor instance
-crop_predictor = CropPredictor()
+# Global predictor instance, loaded on first use (joblib and scikit-learn take over a second to import)
+_crop_predictor = None
+_crop_predictor_lock = threading.Lock()
+
+def get_crop_predictor():
+    """Get or create the CropPredictor instance"""
+    global _crop_predictor
+    if _crop_predictor is None:
+        with _crop_predictor_lock:
+            if _crop_predictor is None:
+                _crop_predictor = CropPredictor()
+    return _crop_predictor
+
+register('crop_model', get_crop_predictor,
+         probe=lambda predictor: predictor.predict_crop_recommendation(90, 42, 43, 20.9, 82.0, 6.5, 202.9))
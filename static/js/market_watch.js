@@ -120,3 +120,108 @@ document.addEventListener('DOMContentLoaded', function () {
     window.toggleSidebar = toggleSidebar;
     window.updateDistricts = updateDistricts;
 });
+
+// Incremental loading: each category grid is rendered with its first page and
+// fetches the next one from /api/market/prices as it is scrolled to the end
+const CARD_FIELDS = 'commodity,state,district,current_price_kg,max_price_kg';
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+// Prices print like the server-rendered cards (28.0, not 28)
+function formatPrice(value) {
+    return Number.isInteger(value) ? value.toFixed(1) : String(value);
+}
+
+function renderMarketCard(item, grid, cardImages) {
+    let cleanName = item.commodity.split('(')[0];
+    if (grid.dataset.strip) cleanName = cleanName.split(grid.dataset.strip)[0];
+    cleanName = cleanName.trim();
+    const image = cardImages[cleanName] || grid.dataset.defaultImage;
+    const card = document.createElement('div');
+    card.className = 'product-card';
+    card.innerHTML = `
+        <div class="product-image-container">
+            <img src="${escapeHtml(image)}" alt="${escapeHtml(cleanName)}" class="product-image" loading="lazy">
+            <div class="product-indicator"></div>
+            <div class="category-badge">${escapeHtml(grid.dataset.badge)}</div>
+        </div>
+        <div class="product-content">
+            <h3 class="product-name">${escapeHtml(cleanName)}</h3>
+            <div class="product-location">
+                <i class="fas fa-map-marker-alt location-icon"></i>
+                <span>${escapeHtml(item.district)}, ${escapeHtml(item.state)}</span>
+            </div>
+            <div class="price-section">
+                <div class="price-info">
+                    <div class="main-price">₹${item.current_price_kg.toFixed(1)} <span class="price-unit">per kg</span></div>
+                    <div class="price-details">
+                        <div class="price-detail">
+                            <span class="price-label">Central Price:</span>
+                            <span class="price-value">₹${formatPrice(item.current_price_kg)}</span>
+                        </div>
+                        <div class="price-detail">
+                            <span class="price-label">Quoted Price:</span>
+                            <span class="price-value">₹${formatPrice(item.max_price_kg || item.current_price_kg)}</span>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        </div>`;
+    return card;
+}
+
+async function loadMoreCards(grid, container, cardImages) {
+    const cursor = grid.dataset.nextCursor;
+    if (!cursor || grid.dataset.loading === 'true') return;
+    grid.dataset.loading = 'true';
+
+    const params = new URLSearchParams({
+        category: grid.dataset.category,
+        cursor: cursor,
+        limit: container.dataset.pageSize,
+        fields: CARD_FIELDS,
+        state: container.dataset.state,
+        district: container.dataset.district
+    });
+    if (container.dataset.query) params.set('q', container.dataset.query);
+
+    try {
+        const response = await fetch(`/api/market/prices?${params}`);
+        const result = await response.json();
+        if (!response.ok || !result.success) {
+            // 409: prices were refreshed since the page was rendered
+            grid.dataset.nextCursor = '';
+            return;
+        }
+        const fragment = document.createDocumentFragment();
+        result.data.forEach(item => fragment.appendChild(renderMarketCard(item, grid, cardImages)));
+        grid.appendChild(fragment);
+        grid.dataset.nextCursor = result.next_cursor || '';
+        if (typeof updateScrollButtons === 'function') updateScrollButtons(grid.dataset.category);
+    } catch (error) {
+        console.error('Error loading market prices:', error);
+    } finally {
+        grid.dataset.loading = 'false';
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+    const container = document.querySelector('.market-categories-container');
+    const imagesData = document.getElementById('card-images');
+    if (!container || !imagesData) return;
+    const cardImages = JSON.parse(imagesData.textContent);
+
+    container.querySelectorAll('.products-grid-horizontal[data-category]').forEach(grid => {
+        const scroller = grid.parentElement;
+        scroller.addEventListener('scroll', () => {
+            // Start fetching about two cards before the end
+            if (scroller.scrollLeft + scroller.clientWidth >= scroller.scrollWidth - 600) {
+                loadMoreCards(grid, container, cardImages);
+            }
+        });
+    });
+});
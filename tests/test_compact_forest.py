@@ -0,0 +1,102 @@
+"""CompactForest against the scikit-learn RandomForestClassifier it is exported from"""
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from ml_models.compact_forest import (FOREST_PATH, MODEL_PATH, SCALER_PATH, export_forest, load_forest, save_forest,
+                                      source_digest)
+
+joblib = pytest.importorskip('joblib')
+ensemble = pytest.importorskip('sklearn.ensemble')
+preprocessing = pytest.importorskip('sklearn.preprocessing')
+
+DATASET = os.path.join(os.path.dirname(MODEL_PATH), '..', 'datasets', 'Crop_recommendation.csv')
+
+# The pickles may come from another scikit-learn version, and the scaler was fitted with feature names
+pytestmark = pytest.mark.filterwarnings('ignore::UserWarning')
+
+
+@pytest.fixture(scope='module')
+def crop_model():
+    return joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)
+
+
+@pytest.fixture(scope='module')
+def training_rows():
+    with open(DATASET, newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        return np.array([[float(value) for value in row[:7]] for row in reader])
+
+
+def assert_same(model, scaler, forest, X):
+    scaled = X if scaler is None else scaler.transform(X)
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(scaled), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(forest.predict(X), model.predict(scaled))
+
+
+def test_crop_model_matches_on_training_data(crop_model, training_rows):
+    model, scaler = crop_model
+    forest = export_forest(model, scaler)
+    assert_same(model, scaler, forest, training_rows)
+    # One row at a time goes through the single-row path
+    single = np.vstack([forest.predict_proba(row) for row in training_rows[::7]])
+    np.testing.assert_allclose(single, model.predict_proba(scaler.transform(training_rows[::7])), rtol=0, atol=1e-12)
+
+
+def test_crop_model_matches_at_split_thresholds(crop_model, training_rows):
+    model, scaler = crop_model
+    forest = export_forest(model, scaler)
+    rows = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.children_left >= 0):
+            feature, threshold = tree.feature[node], tree.threshold[node]
+            t32 = np.float32(threshold)
+            # Raw inputs that scale to the threshold and to the float32 values around it, and their neighbours
+            scaled = [threshold, t32, np.nextafter(t32, np.float32(-np.inf)), np.nextafter(t32, np.float32(np.inf))]
+            raw = [float(s) * scaler.scale_[feature] + scaler.mean_[feature] for s in scaled]
+            for value in raw:
+                for edge in (value, np.nextafter(value, -np.inf), np.nextafter(value, np.inf)):
+                    row = training_rows[len(rows) % len(training_rows)].copy()
+                    row[feature] = edge
+                    rows.append(row)
+    assert_same(model, scaler, forest, np.array(rows))
+
+
+def test_ties_go_to_the_first_class():
+    rng = np.random.default_rng(0)
+    # Identical inputs with different labels leave mixed leaves, so class probabilities tie
+    X = np.repeat(rng.integers(0, 4, size=(12, 3)).astype(float), 2, axis=0)
+    y = np.tile(['b', 'a'], 12)
+    scaler = preprocessing.StandardScaler().fit(X)
+    model = ensemble.RandomForestClassifier(n_estimators=4, bootstrap=False, random_state=0).fit(scaler.transform(X), y)
+    expected = model.predict_proba(scaler.transform(X))
+    assert (np.sort(expected, axis=1)[:, -1] == np.sort(expected, axis=1)[:, -2]).any()
+    assert_same(model, scaler, export_forest(model, scaler), X)
+
+
+def test_without_scaler():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(300, 4)).round(1)
+    y = (X[:, 0] + X[:, 1] > 0).astype(int) + (X[:, 2] > 0.5)
+    model = ensemble.RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    assert_same(model, None, export_forest(model), np.vstack([X, rng.normal(size=(300, 4))]))
+
+
+def test_shipped_forest_matches_joblib_files():
+    # Re-export with `python -m ml_models.compact_forest` after retraining
+    with np.load(FOREST_PATH, allow_pickle=False) as saved:
+        assert str(saved['digest']) == source_digest(MODEL_PATH, SCALER_PATH)
+
+
+def test_load_forest_round_trip_and_no_runtime_write(crop_model, training_rows, tmp_path):
+    model, scaler = crop_model
+    path = tmp_path / 'crop_forest.npz'
+    # Out of date or missing: exported in memory, nothing written
+    forest = load_forest(MODEL_PATH, SCALER_PATH, str(path))
+    assert not path.exists()
+    save_forest(forest, str(path), source_digest(MODEL_PATH, SCALER_PATH))
+    assert_same(model, scaler, load_forest(MODEL_PATH, SCALER_PATH, str(path)), training_rows)
@@ -0,0 +1,78 @@
+"""Versioned updates (compare_and_swap, transition_document) on the file store and MongoDB"""
+import json
+import threading
+from unittest import mock
+
+import pytest
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from utils.db import MockCollection, clear_doc_cache, compare_and_swap, transition_document
+
+LISTINGS = [
+    {'_id': 'l1', 'status': 'active', '_version': 2},
+    {'_id': 'legacy', 'status': 'active'},
+]
+
+
+@pytest.fixture
+def listings(tmp_path):
+    path = tmp_path / 'listings.json'
+    path.write_text(json.dumps(LISTINGS))
+    clear_doc_cache()
+    yield MockCollection('crop_listings', str(path))
+    clear_doc_cache()
+
+
+def test_stale_version_is_rejected(listings):
+    assert compare_and_swap(listings, {'_id': 'l1'}, {'$set': {'status': 'sold'}}, 1).modified_count == 0
+    assert listings.find_one({'_id': 'l1'}) == LISTINGS[0]
+
+    assert compare_and_swap(listings, {'_id': 'l1'}, {'$set': {'status': 'sold'}}, 2).modified_count == 1
+    assert listings.find_one({'_id': 'l1'}) == {'_id': 'l1', 'status': 'sold', '_version': 3}
+
+
+def test_document_without_version_matches_version_zero(listings):
+    assert compare_and_swap(listings, {'_id': 'legacy'}, {'$set': {'status': 'sold'}}, 1).modified_count == 0
+    assert compare_and_swap(listings, {'_id': 'legacy'}, {'$set': {'status': 'sold'}}, 0).modified_count == 1
+    assert listings.find_one({'_id': 'legacy'})['_version'] == 1
+
+
+def test_racing_transitions_apply_once(listings):
+    # Both buyers read version 2 before either writes
+    ready = threading.Barrier(2, timeout=5)
+    results = {}
+
+    def buy(buyer):
+        decided = []
+
+        def sell(listing):
+            if listing['status'] != 'active':
+                return "This listing is no longer available"
+            if not decided:
+                decided.append(True)
+                ready.wait()
+            return {'$set': {'status': 'sold', 'buyer_id': buyer}}
+
+        results[buyer] = transition_document(listings, {'_id': 'l1'}, sell)
+
+    threads = [threading.Thread(target=buy, args=(buyer,)) for buyer in ('b1', 'b2')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winner = listings.find_one({'_id': 'l1'})
+    assert winner['_version'] == 3
+    assert results[winner['buyer_id']] == (True, None)
+    loser = 'b2' if winner['buyer_id'] == 'b1' else 'b1'
+    assert results[loser] == (False, "This listing is no longer available")
+
+
+def test_mongo_rewrites_the_filter():
+    collection = MongoClient('mongodb://localhost:27017', connect=False)['test']['crop_listings']
+    with mock.patch.object(Collection, 'update_one') as update_one:
+        compare_and_swap(collection, {'_id': 'l1'}, {'$set': {'status': 'sold'}}, 0)
+
+    update_one.assert_called_once_with({'_id': 'l1', '_version': {'$in': [0, None]}},
+                                       {'$set': {'status': 'sold'}, '$inc': {'_version': 1}})
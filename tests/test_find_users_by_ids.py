@@ -0,0 +1,104 @@
+"""find_users_by_ids() against MongoDB (a real pymongo Database, mocked queries) and the file store"""
+import json
+from unittest import mock
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from utils import db as db_module
+from utils.db import MockDatabase, clear_doc_cache, find_users_by_ids
+
+OBJECT_ID = ObjectId()
+MONGO_USERS = [
+    {'_id': OBJECT_ID, 'name': 'Native', 'phone': '1', 'password': 'x'},
+    {'_id': 'uuid-1', 'name': 'Uuid', 'phone': '2', 'password': 'x'},
+    {'_id': 'other', 'user_id': 'legacy-1', 'name': 'Legacy', 'phone': '3', 'password': 'x'},
+]
+FILE_USERS = {
+    'file@example.com': {'_id': 'file-1', 'name': 'File', 'phone': '4', 'email': 'file@example.com', 'password': 'x'},
+    'uuid@example.com': {'_id': 'uuid-1', 'name': 'Uuid (file)', 'phone': '5', 'email': 'uuid@example.com',
+                         'password': 'x'},
+}
+
+
+def fake_find(users, calls):
+    """Collection.find over an in-memory list, for {field: {'$in': [...]}} filters"""
+    def find(self, query, projection=None):
+        calls.append(query)
+        (field, condition), = query.items()
+        docs = [doc for doc in users if field in doc and doc[field] in condition['$in']]
+        if projection and any(projection.values()):
+            keep = {key for key, value in projection.items() if value} | {'_id'}
+            docs = [{key: value for key, value in doc.items() if key in keep} for doc in docs]
+        elif projection:
+            docs = [{key: value for key, value in doc.items() if key not in projection} for doc in docs]
+        return iter(docs)
+    return find
+
+
+@pytest.fixture
+def users_file(tmp_path, monkeypatch):
+    path = tmp_path / 'users.json'
+    path.write_text(json.dumps(FILE_USERS))
+    monkeypatch.setattr(db_module, 'USERS_FILE', str(path))
+    clear_doc_cache()
+    yield path
+    clear_doc_cache()
+
+
+@pytest.fixture
+def mongo(users_file, monkeypatch):
+    # A real pymongo Database: truth testing it raises NotImplementedError
+    database = MongoClient('mongodb://localhost:27017', connect=False)['test']
+    monkeypatch.setattr(db_module, 'db', database)
+    calls = []
+    with mock.patch.object(Collection, 'find', fake_find(MONGO_USERS, calls)):
+        yield calls
+
+
+def test_mongo_uses_one_in_query(mongo):
+    found = find_users_by_ids([str(OBJECT_ID), 'uuid-1', 'uuid-1'], fields=['name', 'phone'])
+
+    assert {user_id: user['name'] for user_id, user in found.items()} == {str(OBJECT_ID): 'Native',
+                                                                         'uuid-1': 'Uuid'}
+    assert 'password' not in found['uuid-1']
+    assert len(mongo) == 1
+    assert set(mongo[0]['_id']['$in']) == {str(OBJECT_ID), OBJECT_ID, 'uuid-1'}
+
+
+def test_mongo_falls_back_to_user_id_field_and_file(mongo):
+    found = find_users_by_ids(['legacy-1', 'file-1', 'nobody'])
+
+    assert found['legacy-1']['name'] == 'Legacy'
+    assert found['file-1']['name'] == 'File'
+    assert 'nobody' not in found
+    assert all('password' not in user for user in found.values())
+    assert [list(query) for query in mongo] == [['_id'], ['user_id']]
+
+
+def test_file_store_uses_id_index(users_file, monkeypatch):
+    monkeypatch.setattr(db_module, 'db', MockDatabase())
+    db_module._index_specs.pop(str(users_file), None)
+
+    found = find_users_by_ids(['file-1', 'uuid-1', 'nobody'], fields=['name'])
+
+    assert {user_id: user['name'] for user_id, user in found.items()} == {'file-1': 'File', 'uuid-1': 'Uuid (file)'}
+    assert set(found['file-1']) <= {'_id', 'name', 'user_id'}
+
+
+def test_no_database_reads_users_file_through_index(users_file, monkeypatch):
+    monkeypatch.setattr(db_module, 'db', None)
+    db_module._index_specs.pop(str(users_file), None)
+
+    found = find_users_by_ids(['file-1'])
+
+    assert found['file-1']['name'] == 'File'
+    assert 'password' not in found['file-1']
+    assert '_id' in db_module._index_specs[str(users_file)]
+
+
+def test_empty_ids_skip_the_query(mongo):
+    assert find_users_by_ids([None, '']) == {}
+    assert mongo == []
@@ -0,0 +1,56 @@
+"""Journal mode of the file store: replay after a crash and compaction"""
+import json
+
+import pytest
+
+from utils import db as db_module
+from utils import journal
+from utils.db import MockCollection, clear_doc_cache
+
+
+@pytest.fixture
+def otps(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, 'JOURNAL_ENABLED', True)
+    path = tmp_path / 'otps.json'
+    path.write_text('[]')
+    clear_doc_cache()
+    collection = MockCollection('otps', str(path))
+    for code in ('111', '222', '333'):
+        collection.insert_one({'_id': code, 'code': code, 'used': False})
+    collection.update_one({'_id': '222'}, {'$set': {'used': True}})
+    collection.delete_one({'_id': '111'})
+    yield collection
+    clear_doc_cache()
+
+
+def stored(collection):
+    clear_doc_cache()
+    return list(collection.find({}, sort=[('_id', 1)]))
+
+
+def test_truncated_last_line_reloads(otps):
+    expected = stored(otps)
+    with open(journal.journal_path(otps.file_path), 'ab') as f:
+        # A crash in the middle of an append
+        f.write(b'{"op": "set", "key": 2, "doc": {"_id": "4')
+
+    assert stored(otps) == expected
+    otps.insert_one({'_id': '444', 'code': '444', 'used': False})
+    assert stored(otps) == expected + [{'_id': '444', 'code': '444', 'used': False}]
+
+
+def test_compaction_keeps_pending_ops(otps):
+    otps.find_one({'_id': '222'})
+    # Appended by another worker after this process last replayed the journal
+    journal.append_ops(otps.file_path, [{'op': 'set', 'key': 2, 'doc': {'_id': '555', 'code': '555', 'used': False}}])
+    expected = [{'_id': '222', 'code': '222', 'used': True},
+                {'_id': '333', 'code': '333', 'used': False},
+                {'_id': '555', 'code': '555', 'used': False}]
+
+    otps.compact()
+
+    with open(otps.file_path) as f:
+        assert sorted(json.load(f), key=lambda doc: doc['_id']) == expected
+    with open(journal.journal_path(otps.file_path), 'rb') as f:
+        assert len(f.read().splitlines()) == 1
+    assert stored(otps) == expected
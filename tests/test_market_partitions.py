@@ -0,0 +1,103 @@
+"""Market queries served from the state partitions against one index over the joined columns"""
+import numpy as np
+import pytest
+
+from controllers.market_scheduler import generate_price_columns
+from utils import market_geo_index, market_price_index, market_snapshot
+from utils.market_geo_index import MarketGeoIndex, load_district_coordinates
+from utils.market_price_index import MarketPriceIndex
+from utils.market_snapshot import MarketSnapshot, concat_columns, save_columns
+
+STATES = ['Maharashtra', 'Bihar', 'Kerala', 'Goa']
+# (lat, lon, radius in km) of nearby-mandi queries
+NEARBY_QUERIES = [(19.9, 75.3, 80), (25.6, 85.1, 150), (10.0, 76.3, 400), (15.4, 73.9, 2000)]
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(market_snapshot, 'SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(market_snapshot, 'STATES_DIR', str(tmp_path / 'states'))
+    monkeypatch.setattr(market_snapshot, 'PARTITIONS_FILE', str(tmp_path / 'PARTITIONS'))
+    for module, names in ((market_snapshot, ('_snapshot', '_snapshot_signature')),
+                          (market_price_index, ('_index', '_building')),
+                          (market_geo_index, ('_geo_index', '_geo_key'))):
+        for name in names:
+            monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(market_snapshot, '_parts', {})
+    monkeypatch.setattr(market_snapshot, '_state_paths', {})
+    monkeypatch.setattr(market_price_index, '_part_indexes', {})
+    monkeypatch.setattr(market_geo_index, '_part_geo_indexes', {})
+    save_columns(*generate_price_columns('2026-03-02', STATES), last_updated='2026-03-02T09:00:00')
+    return tmp_path
+
+
+def joined(price_index):
+    # The whole market as one snapshot, rows in partition order
+    snapshot = price_index.snapshot
+    return MarketPriceIndex(MarketSnapshot('joined', snapshot.last_updated, *concat_columns(snapshot.parts)))
+
+
+def assert_same_answers(index, reference):
+    assert len(index) == len(reference)
+    assert index.districts() == reference.districts()
+    assert index.commodity_names() == sorted(reference.snapshot.vocab['commodity'])
+    for state in [None, 'Kerala', 'kerala', 'Nowhere']:
+        for district in [None, 'Aurangabad', 'Idukki']:
+            for commodity in [None, 'Tomato', 'tomato']:
+                ignore_case = state == 'kerala' or commodity == 'tomato'
+                np.testing.assert_array_equal(index.positions(state, district, commodity, ignore_case),
+                                              reference.positions(state, district, commodity, ignore_case))
+                assert index.records(state, district, commodity, ignore_case, limit=7) == \
+                    reference.records(state, district, commodity, ignore_case, limit=7)
+            if state != 'kerala':
+                assert index.category_summary(state, district) == reference.category_summary(state, district)
+                assert index.date_trend(state, district, 'Onion') == reference.date_trend(state, district, 'Onion')
+                for sort in [None, 'price', '-change', 'commodity', '-commodity']:
+                    np.testing.assert_array_equal(index.ordered_positions(state, district, ['Onion', 'Rice'], sort),
+                                                  reference.ordered_positions(state, district, ['Onion', 'Rice'], sort))
+    assert index.commodity_stats('Tomato') == reference.commodity_stats('Tomato')
+    assert index.commodity_stats('Tomato', 'Goa') == reference.commodity_stats('Tomato', 'Goa')
+    positions = index.ordered_positions(sort='-price')[::97]
+    assert index.snapshot.display_rows(positions) == reference.snapshot.display_rows(positions)
+
+    dates, names, sums, counts = index.date_matrix()
+    ref_dates, ref_names, ref_sums, ref_counts = reference.date_matrix()
+    order = [ref_names.index(name) for name in names]
+    assert dates == ref_dates
+    np.testing.assert_array_equal(sums, ref_sums[order])
+    np.testing.assert_array_equal(counts, ref_counts[order])
+
+
+def test_partitions_answer_like_the_joined_columns(snapshot_dir):
+    index = market_price_index.get_price_index()
+    # Served from the maps of the partition files, not from a copy
+    assert all(isinstance(part.prices['modal_price'], np.memmap) for part in index.snapshot.parts)
+    reference = joined(index)
+    assert_same_answers(index, reference)
+
+    geo = market_geo_index.get_geo_index()
+    reference_geo = MarketGeoIndex(reference.snapshot, load_district_coordinates())
+    for lat, lon, radius in NEARBY_QUERIES:
+        assert geo.nearest(lat, lon, radius) == reference_geo.nearest(lat, lon, radius)
+
+
+def test_refreshing_one_state_reindexes_only_that_state(snapshot_dir):
+    index = market_price_index.get_price_index()
+    geo = market_geo_index.get_geo_index()
+    kerala_version = index.region_version('Kerala')
+
+    save_columns(*generate_price_columns('2026-03-03', ['Bihar']), last_updated='2026-03-03T09:00:00')
+    market_price_index._build_in_background(market_snapshot.load_snapshot())
+    refreshed = market_price_index.get_price_index()
+    assert refreshed.version != index.version
+    kept = [new is old for new, old in zip(refreshed.indexes, index.indexes)]
+    assert kept == [state != 'Bihar' for state in refreshed.snapshot.states]
+    assert refreshed.region_version('Kerala') == kerala_version
+    assert refreshed.region_version('Bihar') != index.region_version('Bihar')
+    assert_same_answers(refreshed, joined(refreshed))
+
+    refreshed_geo = market_geo_index.get_geo_index()
+    assert [new is old for new, old in zip(refreshed_geo.indexes, geo.indexes)] == kept
+    reference = MarketGeoIndex(joined(refreshed).snapshot, load_district_coordinates())
+    for lat, lon, radius in NEARBY_QUERIES:
+        assert refreshed_geo.nearest(lat, lon, radius) == reference.nearest(lat, lon, radius)
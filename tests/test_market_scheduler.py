@@ -0,0 +1,24 @@
+"""Market jobs added by the process holding the scheduler lease"""
+from controllers import market_scheduler
+
+
+class RecordingScheduler:
+    def __init__(self):
+        self.jobs = {}
+
+    def add_job(self, func, id, **kwargs):
+        self.jobs[id] = func
+
+
+def test_first_start_generates_in_the_background(monkeypatch):
+    monkeypatch.setattr(market_scheduler, 'read_partitions', dict)
+
+    def generate():
+        raise AssertionError("generated before the scheduler started")
+
+    monkeypatch.setattr(market_scheduler, 'update_market_prices_job', generate)
+    scheduler = RecordingScheduler()
+    market_scheduler.add_market_jobs(scheduler)
+    assert scheduler.jobs['market_initial'] is generate
+    assert len([job for job in scheduler.jobs if job.startswith('market_update_')]) == \
+        len(market_scheduler.load_states_districts())
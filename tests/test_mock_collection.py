@@ -0,0 +1,73 @@
+"""Documents handed out by MockCollection are copies of the shared document cache"""
+import json
+
+import pytest
+
+from utils.db import MockCollection, clear_doc_cache
+
+DOCS = [
+    {'_id': 'a', 'tags': ['x'], 'meta': {'owner': {'name': 'asha'}, 'seen': [1]}},
+    {'_id': 'b', 'tags': ['y'], 'meta': {'owner': {'name': 'ravi'}, 'seen': [2]}},
+]
+
+
+@pytest.fixture
+def collection(tmp_path):
+    path = tmp_path / 'docs.json'
+    path.write_text(json.dumps(DOCS))
+    clear_doc_cache()
+    yield MockCollection('docs', str(path))
+    clear_doc_cache()
+
+
+@pytest.mark.parametrize('projection', [None, {'tags': 1, 'meta': 1}, {'tags': 1, 'meta.owner': 1},
+                                        {'meta.seen': 0}])
+def test_nested_mutation_does_not_reach_the_cache(collection, projection):
+    doc = collection.find_one({'_id': 'a'}, projection)
+    doc['tags'].append('X')
+    doc['meta']['owner']['name'] = 'changed'
+    for doc in collection.find({}, projection):
+        doc['tags'].append('X')
+        doc['meta']['owner']['name'] = 'changed'
+
+    assert collection.find_one({'_id': 'a'})['tags'] == ['x']
+    assert [doc['meta']['owner']['name'] for doc in collection.find()] == ['asha', 'ravi']
+    assert collection.find_one({'_id': 'b'}, {'meta.seen': 0})['meta'] == {'owner': {'name': 'ravi'}}
+
+
+@pytest.fixture
+def users(tmp_path):
+    path = tmp_path / 'users.json'
+    path.write_text(json.dumps({f'u{i}@x.in': {'_id': f'u{i}', 'email': f'u{i}@x.in', 'age': i % 7}
+                                for i in range(50)}))
+    clear_doc_cache()
+    yield MockCollection('users', str(path), is_dict=True)
+    clear_doc_cache()
+
+
+def test_limit_stops_the_walk_early(users, monkeypatch):
+    visited = []
+    documents = users._documents
+
+    def counting(*args):
+        for doc in documents(*args):
+            visited.append(doc['_id'])
+            yield doc
+
+    monkeypatch.setattr(users, '_documents', counting)
+    assert [doc['_id'] for doc in users.find({'age': 3}).skip(1).limit(2)] == ['u10', 'u17']
+    assert visited == [f'u{i}' for i in range(18)]
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_writes_between_steps_do_not_break_the_walk(users, indexed):
+    if indexed:
+        users.create_index([('age', 1)])
+    cursor = iter(users.find({}, sort=[('age', 1)] if indexed else None))
+    first = [next(cursor)['_id'] for _ in range(5)]
+    # Grows the dict the walk was iterating over
+    users.insert_one({'_id': 'late', 'email': 'late@x.in', 'age': 99})
+    rest = [doc['_id'] for doc in cursor]
+    assert len(set(first + rest)) == len(first + rest) == 51
+    if indexed:
+        assert rest[-1] == 'late'
@@ -0,0 +1,34 @@
+"""mark_user_notifications_read() on the notifications.json fallback"""
+import json
+
+import pytest
+
+from utils import db as db_module
+from utils.db import MockDatabase, clear_doc_cache, get_persistent_notifications, mark_user_notifications_read
+
+NOTIFICATIONS = [
+    {'_id': 'n1', 'user_id': 'u1', 'message': 'flagged unread', 'read': False, 'created_at': '2026-01-01'},
+    {'_id': 'n2', 'user_id': 'u1', 'message': 'no read flag', 'created_at': '2026-01-02'},
+    {'_id': 'n3', 'user_id': 'u1', 'message': 'already read', 'read': True, 'created_at': '2026-01-03'},
+    {'_id': 'n4', 'user_id': 'u2', 'message': 'someone else', 'created_at': '2026-01-04'},
+]
+
+
+@pytest.fixture
+def notifications_file(tmp_path, monkeypatch):
+    path = tmp_path / 'notifications.json'
+    path.write_text(json.dumps(NOTIFICATIONS))
+    monkeypatch.setattr(db_module, 'NOTIFICATIONS_FILE', str(path))
+    monkeypatch.setattr(db_module, 'db', MockDatabase())
+    clear_doc_cache()
+    yield path
+    clear_doc_cache()
+
+
+def test_marks_notifications_without_read_flag(notifications_file):
+    assert mark_user_notifications_read('u1')
+
+    assert all(n.get('read') for n in get_persistent_notifications('u1'))
+    stored = {n['_id']: n for n in json.loads(notifications_file.read_text())}
+    assert stored['n2']['read'] is True
+    assert 'read' not in stored['n4']
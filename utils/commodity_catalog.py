@@ -0,0 +1,155 @@
+"""
+Commodity registry: the market watch categories and the base price range and
+varieties of every commodity the scheduler generates prices for.
+
+market_scheduler and market_routes used to keep their own copies of these
+lists; both now read them from here.
+
+    COMMODITY_CATEGORIES['fruits']   # ('Fruits', {'Apple': (5000, 12000, [...]), ...})
+    CATEGORY_OF['Apple']             # 'fruits'
+"""
+
+# Category key -> (name in the market watch dropdown, {commodity: (min ₹/quintal, max ₹/quintal, varieties)})
+COMMODITY_CATEGORIES = {
+    'vegetables': ('Vegetables', {
+        "Tomato": (1000, 4000, ["Local", "Hybrid", "Cherry"]),
+        "Onion": (1200, 3500, ["Red", "White", "Pink"]),
+        "Potato": (800, 2000, ["Local", "Hybrid", "Imported"]),
+        "Brinjal": (1200, 3000, ["Long", "Round", "Green"]),
+        "Cabbage": (800, 2000, ["Green", "Red", "Grade A"]),
+        "Cauliflower": (1000, 2500, ["Local", "Grade A", "Premium"]),
+        "Carrot": (1500, 3000, ["Local", "Hybrid", "Ooty"]),
+        "Beetroot": (1200, 2800, ["Local", "Organic", "Grade A"]),
+        "Green Chilli": (2500, 6000, ["Local", "Hybrid", "Long"]),
+        "Capsicum (Green)": (2000, 5000, ["Local", "Hybrid", "Premium"]),
+        "Capsicum (Red)": (3000, 7000, ["Local", "Hybrid", "Premium"]),
+        "Capsicum (Yellow)": (3000, 7000, ["Local", "Hybrid", "Premium"]),
+        "Beans": (2000, 4500, ["French", "Cluster", "Local"]),
+        "Cluster Beans": (1800, 4000, ["Local", "Hybrid", "Premium"]),
+        "Lady Finger": (1500, 3500, ["Local", "Hybrid", "Premium"]),
+        "Drumstick": (2000, 5000, ["Local", "Hybrid", "Long"]),
+        "Bottle Gourd": (800, 2000, ["Local", "Long", "Round"]),
+        "Ridge Gourd": (1200, 2800, ["Local", "Long", "Short"]),
+        "Snake Gourd": (1000, 2500, ["Local", "Long", "Green"]),
+        "Bitter Gourd": (1500, 3500, ["Local", "Green", "White"]),
+        "Pumpkin": (600, 1500, ["Local", "Sweet", "Yellow"]),
+        "Ash Gourd": (700, 1800, ["Local", "Large", "Medium"]),
+        "Radish": (800, 2000, ["White", "Red", "Local"]),
+        "Turnip": (900, 2200, ["White", "Purple", "Local"]),
+        "Sweet Corn": (1800, 4000, ["Yellow", "White", "Hybrid"]),
+        "Peas": (3000, 6000, ["Local", "Frozen", "Premium"]),
+        "Garlic": (4000, 10000, ["Local", "Kashmiri", "Chinese"]),
+        "Ginger": (3000, 8000, ["Local", "Organic", "Premium"]),
+        "Coriander Leaves": (2000, 5000, ["Local", "Organic", "Fresh"]),
+        "Spinach": (1000, 2500, ["Local", "Organic", "Premium"]),
+    }),
+    'fruits': ('Fruits', {
+        "Apple": (5000, 12000, ["Shimla", "Kashmiri", "Imported"]),
+        "Banana": (1500, 3500, ["Robusta", "Yelakki", "Nendran"]),
+        "Orange": (2500, 5000, ["Nagpur", "Kinnow", "Mandarin"]),
+        "Mosambi": (2000, 4500, ["Local", "Hybrid", "Premium"]),
+        "Grapes": (4000, 10000, ["Green", "Black", "Red"]),
+        "Pomegranate": (5000, 12000, ["Bhagwa", "Arakta", "Ganesh"]),
+        "Papaya": (1500, 3500, ["Local", "Taiwan", "Hybrid"]),
+        "Pineapple": (2000, 4500, ["Queen", "Giant Kew", "Mauritius"]),
+        "Watermelon": (800, 2000, ["Striped", "Black", "Seedless"]),
+        "Muskmelon": (1500, 3500, ["Local", "Netted", "Honeydew"]),
+        "Mango": (3000, 10000, ["Alphonso", "Kesar", "Langra"]),
+        "Guava": (2000, 4000, ["Allahabad", "Pink", "White"]),
+        "Lemon": (2000, 5000, ["Kagzi", "Galgal", "Sweet"]),
+        "Custard Apple": (3000, 7000, ["Local", "Balanagar", "Arka Sahan"]),
+        "Sapota": (2500, 5500, ["Cricket Ball", "Oval", "Local"]),
+        "Strawberry": (10000, 25000, ["Camarosa", "Chandler", "Local"]),
+        "Kiwi": (12000, 25000, ["Green", "Golden", "Imported"]),
+        "Pear": (4000, 8000, ["Kashmir", "Chinese", "Bartlett"]),
+        "Plum": (4000, 9000, ["Black", "Red", "Yellow"]),
+        "Peach": (5000, 10000, ["Local", "Imported", "Yellow"]),
+    }),
+    'cereals': ('Grains', {
+        "Paddy (Rice – Common)": (2000, 2500, ["Common", "Grade A"]),
+        "Paddy (Basmati)": (3500, 6000, ["Pusa", "1121", "Traditional"]),
+        "Wheat": (2200, 3000, ["Sharbati", "Lokwan", "Dara"]),
+        "Maize (Corn)": (1800, 2600, ["Yellow", "White", "Hybrid"]),
+        "Barley": (1600, 2200, ["Malt", "Feed"]),
+        "Jowar (Sorghum)": (2500, 4000, ["White", "Yellow", "Hybrid"]),
+        "Bajra (Pearl Millet)": (2000, 3000, ["Hybrid", "Desi"]),
+        "Ragi (Finger Millet)": (3000, 4500, ["Local", "Hybrid"]),
+    }),
+    'pulses': ('Pulses', {
+        "Red Gram (Tur/Arhar)": (6000, 11000, ["Desi", "Hybrid", "Lemon"]),
+        "Green Gram (Moong)": (7000, 10000, ["Shiny", "Medium", "Bold"]),
+        "Black Gram (Urad)": (6500, 9500, ["FAQ", "SQ", "Bold"]),
+        "Bengal Gram (Chana)": (5000, 7000, ["Desi", "Kabuli", "Kantola"]),
+        "Lentil (Masur)": (6000, 8500, ["Small", "Bold", "Canadian"]),
+        "Horse Gram": (4000, 6500, ["Red", "Brown"]),
+        "Field Pea": (3500, 5500, ["Green", "Yellow", "White"]),
+    }),
+    'oilseeds': ('Oilseeds', {
+        "Groundnut": (5500, 8000, ["Java", "Bold", "Runner"]),
+        "Mustard Seed": (4500, 6500, ["Black", "Yellow", "Mustard"]),
+        "Soybean": (4000, 6000, ["Yellow", "Black", "Mixed"]),
+        "Sunflower Seed": (4500, 6500, ["Hybrid", "Local"]),
+        "Sesame (Gingelly)": (10000, 16000, ["White", "Black", "Red"]),
+        "Castor Seed": (5000, 7000, ["Small", "Bold"]),
+        "Linseed": (5500, 7500, ["Brown", "Yellow"]),
+    }),
+    'spices': ('Spices', {
+        "Dry Chilli": (12000, 25000, ["Teja", "Byadgi", "Guntur"]),
+        "Turmeric": (6000, 12000, ["Finger", "Bulb", "Powder"]),
+        "Coriander Seed": (7000, 11000, ["Eagle", "Scooter", "Badami"]),
+        "Cumin Seed (Jeera)": (25000, 55000, ["Ordinary", "Best", "Singapore"]),
+        "Pepper (Black)": (30000, 50000, ["Garbled", "Ungarbled", "Tellicherry"]),
+        "Cardamom": (100000, 250000, ["Small", "Bold", "Green"]),
+        "Clove": (60000, 90000, ["Zanzibar", "Madagascar"]),
+    }),
+    'commercial': ('Commercial Crops', {
+        "Sugarcane": (300, 500, ["Co 0238", "Co 86032"]),
+        "Cotton": (5500, 9000, ["H-4", "Shanker-6", "Bunny"]),
+        "Jute": (4000, 6500, ["TD-5", "W-5", "Mesta"]),
+        "Copra (Dry Coconut)": (9000, 14000, ["Milling", "Edible"]),
+        "Tobacco": (4000, 15000, ["Flue Cured", "Burley"]),
+        "Tea Leaves": (15000, 40000, ["Darjeeling", "Assam", "Nilgiri"]),
+        "Coffee Beans": (20000, 45000, ["Arabica", "Robusta"]),
+    }),
+    'dry_fruits': ('Dry Fruits', {
+        "Coconut": (1500, 3000, ["Large", "Medium", "Small"]),
+        "Cashew Nut": (80000, 120000, ["W320", "W240", "Splits"]),
+        "Groundnut Kernel": (8000, 12000, ["Bold", "Java"]),
+        "Almond": (60000, 90000, ["California", "Gurbandi", "Mamra"]),
+        "Walnut": (30000, 60000, ["Inshell", "Kernels"]),
+        "Raisins": (15000, 30000, ["Indian", "Afghan", "Black"]),
+    }),
+    'animal': ('Animal Products', {
+        "Milk": (4000, 6500, ["Cow", "Buffalo", "Mixed"]),
+        "Cow Ghee": (45000, 70000, ["Desi", "Pure", "A2"]),
+        "Buffalo Ghee": (40000, 60000, ["Pure", "Mixed"]),
+        "Egg": (400, 700, ["White", "Brown"]),
+        "Poultry Chicken": (8000, 14000, ["Broiler", "Layer", "Cockerel"]),
+        "Fish (Common Varieties)": (10000, 25000, ["Rohu", "Catla", "Mrigal"]),
+    }),
+}
+
+# Category keys in display order
+CATEGORY_KEYS = list(COMMODITY_CATEGORIES)
+
+# Commodity -> (min price, max price, varieties), in category order
+BASE_PRICES = {name: spec for _, commodities in COMMODITY_CATEGORIES.values()
+               for name, spec in commodities.items()}
+
+# Commodity -> category key
+CATEGORY_OF = {name: key for key, (_, commodities) in COMMODITY_CATEGORIES.items() for name in commodities}
+
+
+def category_key(name):
+    """Category key for a category key or dropdown name, else None"""
+    if name in COMMODITY_CATEGORIES:
+        return name
+    for key, (label, _) in COMMODITY_CATEGORIES.items():
+        if label == name:
+            return key
+    return None
+
+
+def category_commodities(key):
+    """Commodity names of a category, in registry order"""
+    return list(COMMODITY_CATEGORIES[key][1])
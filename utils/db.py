@@ -1,8 +1,22 @@
 from datetime import datetime
 import os
+import copy
 import json
+import functools
+import random
+import time
+from itertools import islice
 from pymongo import MongoClient
+from pymongo.collection import Collection as MongoCollection
+from pymongo.database import Database as MongoDatabase
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from utils import journal
+from utils.file_lock import file_lock, generation, thread_lock, write_atomic
+from utils.mock_index import IndexSet
+from utils.mock_query import VERSION_FIELD, compile_query, versioned
+from utils.mock_cursor import MockCursor, compile_projection
+from utils.market_price_index import get_price_index
 
 # Load environment variables
 load_dotenv()
@@ -10,6 +24,10 @@ load_dotenv()
 # MongoDB Atlas connection string from environment variable
 MONGODB_URI = os.getenv('MONGODB_URI')
 
+# SQLite database file used instead of the JSON files when MongoDB is not available
+# (see utils/sqlite_store.py). Leave unset to keep the JSON file storage.
+SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH')
+
 # Local file-based storage directory and file paths (used when MongoDB is not available)
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 DATA_DIR = os.path.abspath(DATA_DIR)
@@ -26,6 +44,53 @@ EXPENSES_FILE = os.path.join(DATA_DIR, 'expenses.json')
 client = None
 db = None
 
+# Per-process cache of parsed collection files shared by every MockCollection
+# instance. Entries are validated against os.stat() on each access, so writes
+# made by other workers or by the raw-file helpers below are still picked up.
+# Each file's entry is guarded by that file's own lock (utils.file_lock.thread_lock),
+# so a slow write to one collection never holds up reads of another.
+# Set MOCK_DB_CACHE=0 to always re-read from disk.
+DOC_CACHE_ENABLED = os.getenv('MOCK_DB_CACHE', '1') != '0'
+_doc_cache = {}
+
+# Index specs registered via MockCollection.create_index(), and the built indexes
+# (bound to the cached data they were built from), keyed by file path
+_index_specs = {}
+_index_state = {}
+
+# Append mutations to <collection>.json.journal instead of rewriting the file
+# (see utils/journal.py). Off by default.
+JOURNAL_ENABLED = os.getenv('MOCK_DB_JOURNAL', '0') == '1'
+
+def _file_signature(file_path):
+    """Return the (mtime, size, inode, write generation) used to validate cache entries"""
+    st = os.stat(file_path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino, generation(file_path))
+
+def _cache_entry(file_path):
+    """(signature, data) cached for file_path; writers replace it whenever they change the data in place"""
+    return _doc_cache.get(file_path) or (None, None)
+
+def clear_doc_cache(file_path=None):
+    """Drop cached documents for one file, or for every file when no path is given"""
+    if file_path is None:
+        _doc_cache.clear()
+        _index_state.clear()
+        return
+    file_path = os.path.abspath(file_path)
+    with thread_lock(file_path):
+        _doc_cache.pop(file_path, None)
+        _index_state.pop(file_path, None)
+
+def create_file(file_path, empty):
+    """Create a data file holding `empty` unless it exists; a worker creating it at the same time cannot clobber writes"""
+    if os.path.exists(file_path):
+        return
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with file_lock(file_path, exclusive=True):
+        if not os.path.exists(file_path):
+            write_atomic(file_path, json.dumps(empty).encode('utf-8'))
+
 def init_db(app):
     global client, db
     
@@ -37,12 +102,7 @@ def init_db(app):
     
     # Initialize JSON files if they don't exist
     for file_path in [USERS_FILE, CROPS_FILE, FERTILIZERS_FILE, DISEASES_FILE, GROWING_FILE, EQUIPMENT_FILE, NOTIFICATIONS_FILE, OTPS_FILE, TOKENS_FILE]:
-        if not os.path.exists(file_path):
-            with open(file_path, 'w', encoding='utf-8') as f:
-                if file_path in [EQUIPMENT_FILE, NOTIFICATIONS_FILE, OTPS_FILE, TOKENS_FILE]:
-                    json.dump([], f)
-                else:
-                    json.dump({}, f)
+        create_file(file_path, [] if file_path in [EQUIPMENT_FILE, NOTIFICATIONS_FILE, OTPS_FILE, TOKENS_FILE] else {})
     
     print("[SUCCESS] File-based database initialized successfully!")
     print("[INFO] Data will be stored in the 'data' directory")
@@ -79,10 +139,47 @@ def init_db(app):
             print("   2. Verify network connectivity and firewall settings")
             print("   3. Ensure Atlas SQL interface is enabled")
             print("[INFO] Using file-based database for development")
-            db = MockDatabase()
+            db = init_local_db()
     else:
         print("[INFO] MongoDB disabled - using file-based database")
-        db = MockDatabase()
+        db = init_local_db()
+
+def init_local_db():
+    """SQLite when SQLITE_DB_PATH is set, otherwise the JSON file database"""
+    if SQLITE_DB_PATH:
+        try:
+            from utils.sqlite_store import SQLiteDatabase, migrate_json_files
+            sqlite_db = SQLiteDatabase(SQLITE_DB_PATH)
+            if not sqlite_db.table_names():
+                print("[INFO] New SQLite database - migrating data/*.json")
+                migrate_json_files(sqlite_db, DATA_DIR)
+            sqlite_db.users.create_index("email", unique=True)
+            print("[SUCCESS] Using SQLite database (WAL mode)")
+            return sqlite_db
+        except Exception as e:
+            print(f"[ERROR] SQLite database failed: {e}")
+            print("[INFO] Falling back to JSON file storage")
+    mock_db = MockDatabase()
+    create_file_indexes(mock_db)
+    return mock_db
+
+def create_file_indexes(mock_db):
+    """Register the in-memory indexes behind the hot file-store queries"""
+    try:
+        mock_db.users.create_index("email", unique=True)
+        mock_db.users.create_index("_id")
+        mock_db.crop_listings.create_index("farmer_id")
+        mock_db.crop_listings.create_index("status")
+        mock_db.crop_listings.create_index([("created_at", -1)])
+        mock_db.crop_listings.create_index([("farmer_price", 1)])
+        mock_db.equipment_listings.create_index("owner_id")
+        mock_db.equipment_listings.create_index("status")
+        mock_db.equipment_listings.create_index([("created_at", -1)])
+        mock_db.notifications.create_index("user_id")
+        mock_db.otps.create_index("mobile_number")
+        print("[INFO] File database indexes created successfully")
+    except Exception as e:
+        print(f"[WARNING] Index creation note: {e}")
 
 class MockDatabase:
     """Enhanced Mock database that persists to JSON files when MongoDB is not available"""
@@ -121,6 +218,10 @@ class MockDatabase:
     def expenses(self):
         return MockCollection('expenses', EXPENSES_FILE)
 
+    @property
+    def equipment_base_prices(self):
+        return MockCollection('equipment_base_prices', EQUIPMENT_BASE_PRICES_FILE)
+
     @property
     def otps(self):
         OTPS_FILE = os.path.join(DATA_DIR, 'otps.json')
@@ -131,254 +232,481 @@ class MockDatabase:
         TOKENS_FILE = os.path.join(DATA_DIR, 'reset_tokens.json')
         return MockCollection('password_reset_tokens', TOKENS_FILE)
 
+def _json_doc(doc):
+    """Copy a document the way it will look after a round trip through the JSON file"""
+    return json.loads(json.dumps(doc, default=str, ensure_ascii=False))
+
+def _synchronized(method):
+    """Hold the collection file's in-process lock for a whole read so this process's threads don't interleave"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with thread_lock(self.file_path):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def _exclusive(method):
+    """Hold the collection file's exclusive lock (which includes its in-process lock) so other workers don't interleave"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with file_lock(self.file_path, exclusive=True):
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class MockCollection:
     def __init__(self, name, file_path, is_dict=False):
         self.name = name
-        self.file_path = file_path
+        self.file_path = os.path.abspath(file_path)
         self.is_dict = is_dict
+        self.journaled = JOURNAL_ENABLED
         self._ensure_file()
         
     def _ensure_file(self):
-        if not os.path.exists(self.file_path):
-            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump({} if self.is_dict else [], f)
+        create_file(self.file_path, {} if self.is_dict else [])
+
+    def _read_file(self):
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _serialize(self, data):
+        return json.dumps(data, indent=2, default=str, ensure_ascii=False).encode('utf-8')
+
+    def _entries(self, all_data):
+        """Yield (key, document) pairs; keys are dict keys or list positions"""
+        return iter(all_data.items()) if self.is_dict else enumerate(all_data)
 
-    def _load(self):
+    def _load(self, strict=False):
+        """Return the parsed collection, served from the shared cache when the file is unchanged; strict re-raises read errors"""
         try:
             if os.path.exists(self.file_path):
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                if self.journaled:
+                    return self._load_journaled()
+                if not DOC_CACHE_ENABLED:
+                    with file_lock(self.file_path):
+                        return self._read_file()
+                with thread_lock(self.file_path):
+                    signature = _file_signature(self.file_path)
+                    cached = _doc_cache.get(self.file_path)
+                    if cached is not None and cached[0] == signature:
+                        return cached[1]
+                    with file_lock(self.file_path):
+                        # Re-stat under the lock so the signature matches what is read
+                        signature = _file_signature(self.file_path)
+                        data = self._read_file()
+                    _doc_cache[self.file_path] = (signature, data)
+                    return data
         except Exception as e:
+            if strict:
+                raise
             print(f"[MOCK DB ERROR] Failed to load {self.name}: {e}")
         return {} if self.is_dict else []
 
+    def _load_journaled(self):
+        """Snapshot plus replayed journal; a cached copy only replays the journal tail"""
+        with thread_lock(self.file_path):
+            snapshot_signature = _file_signature(self.file_path)
+            cached = _doc_cache.get(self.file_path) if DOC_CACHE_ENABLED else None
+            if cached is not None and cached[0][:2] != ('journal', snapshot_signature):
+                # The snapshot was replaced (compacted by another worker)
+                cached = None
+            if cached is not None:
+                data = cached[1]
+                offset = journal.replay(self.file_path, data, snapshot_signature, cached[0][2], self.is_dict)
+                if offset is None:
+                    cached = None
+                elif offset != cached[0][2]:
+                    # Another process appended operations; indexes no longer match
+                    _index_state.pop(self.file_path, None)
+            if cached is None:
+                # Writers hold the exclusive lock, so snapshot and journal are read as one state
+                with file_lock(self.file_path):
+                    snapshot_signature = _file_signature(self.file_path)
+                    data = self._read_file()
+                    offset = journal.replay(self.file_path, data, snapshot_signature, None, self.is_dict)
+            _doc_cache[self.file_path] = (('journal', snapshot_signature, offset), data)
+            return data
+
     def _save(self, data):
         try:
-            # Create a separate process or lock if possible? For now, simple write.
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, default=str, ensure_ascii=False)
+            # Callers hold the exclusive file lock (see _exclusive)
+            write_atomic(self.file_path, self._serialize(data))
+            if DOC_CACHE_ENABLED:
+                # Write-through: keep the already-parsed objects instead of re-reading
+                _doc_cache[self.file_path] = (_file_signature(self.file_path), data)
         except Exception as e:
             print(f"[MOCK DB ERROR] Failed to save {self.name}: {e}")
-
-    def find_one(self, query):
+            # The in-memory objects may already hold the failed mutation
+            clear_doc_cache(self.file_path)
+
+    def _commit(self, all_data, ops):
+        """
+        Persist a mutation. `ops` describes it as journal operations; in journal
+        mode only those are appended, otherwise the whole file is rewritten.
+        """
+        if not ops:
+            return
+        if not self.journaled:
+            self._save(all_data)
+            return
+        try:
+            offset = journal.append_ops(self.file_path, ops)
+            cached = _doc_cache.get(self.file_path)
+            if cached is not None and cached[1] is all_data:
+                _doc_cache[self.file_path] = (cached[0][:2] + (offset,), all_data)
+            if journal.needs_compaction(self.file_path, offset):
+                journal.schedule_compaction(self.file_path, self.compact)
+        except Exception as e:
+            print(f"[MOCK DB ERROR] Failed to journal {self.name}: {e}")
+            clear_doc_cache(self.file_path)
+
+    def _rewrite(self, data):
+        """Replace the whole file with data (callers hold the exclusive lock); the cache reloads it on the next read"""
+        payload = self._serialize(data)
+        if self.journaled:
+            # data already includes the journal's operations
+            journal.compact(self.file_path, payload, _file_signature)
+        else:
+            write_atomic(self.file_path, payload)
+        clear_doc_cache(self.file_path)
+
+    @contextmanager
+    def edit(self):
+        """
+        Read-modify-write of the whole file, for the helpers below that change it
+        directly (crops.json, for one, maps user ids to lists of documents):
+
+            with MockCollection('crops', CROPS_FILE, is_dict=True).edit() as crops_db:
+                crops_db.setdefault(user_id, []).append(crop_record)
+
+        Yields a private copy of the contents under the exclusive lock and, if
+        the block changed it, writes it back with _rewrite(). An exception in
+        the block leaves the file as it was.
+        """
+        with file_lock(self.file_path, exclusive=True):
+            current = self._load(strict=True)
+            data = copy.deepcopy(current)
+            yield data
+            if data != current:
+                self._rewrite(data)
+
+    @_exclusive
+    def compact(self):
+        """Fold the journal into the JSON snapshot (journal mode only)"""
+        if not self.journaled:
+            return
+        data = self._load_journaled()
+        signature, offset = journal.compact(self.file_path, self._serialize(data), _file_signature)
+        _doc_cache[self.file_path] = (('journal', signature, offset), data)
+        print(f"[MOCK DB] Compacted journal for {self.name}")
+
+    def _index_set(self, data):
+        """Indexes registered through create_index(), built against the cached data"""
+        specs = _index_specs.get(self.file_path)
+        if not specs or not DOC_CACHE_ENABLED:
+            return None
+        indexes = _index_state.get(self.file_path)
+        if indexes is None or indexes.data is not data:
+            indexes = IndexSet(self.name, specs, data, self.is_dict)
+            _index_state[self.file_path] = indexes
+        return indexes
+
+    def _scan(self, all_data, query, indexes):
+        """
+        Yield (key, document) pairs that may match `query`. With a usable index
+        only its candidates are visited; their keys are resolved on demand.
+        """
+        candidates = indexes.candidates(query) if indexes is not None and query else None
+        if candidates is None:
+            return self._entries(all_data)
+        return ((None, doc) for doc in candidates)
+
+    def _resolve_key(self, doc_key, item, indexes):
+        return indexes.key_of(item) if doc_key is None else doc_key
+
+    @_synchronized
+    def find_one(self, query, projection=None):
         data = self._load()
-        if self.is_dict:
-            if 'email' in query:
-                return data.get(query['email'])
-            elif 'mobile_number' in query:
-                for user in data.values():
-                    if user.get('mobile_number') == query['mobile_number']:
-                        return user
-        
-        items = data.values() if self.is_dict else data
-        for item in items:
-            match = True
-            for key, val in query.items():
-                if key == '_id':
-                    if str(item.get('_id')) != str(val):
-                        match = False
-                        break
-                elif item.get(key) != val:
-                    match = False
-                    break
-            if match:
-                return item
+        match = compile_query(query)
+        # Hand out deep copies (of the projected fields) so callers cannot mutate the shared cache
+        project = compile_projection(projection)
+        if self.is_dict and isinstance(query.get('email'), str):
+            # users.json is keyed by email
+            user = data.get(query['email'])
+            return project(user) if user is not None and match(user) else None
+        
+        for _, item in self._scan(data, query, self._index_set(data)):
+            if match(item):
+                return project(item)
         return None
     
+    @_exclusive
     def insert_one(self, data):
         all_data = self._load()
+        indexes = self._index_set(all_data)
         import uuid
         if '_id' not in data:
             data['_id'] = str(uuid.uuid4())
         
-        if self.is_dict:
-            key = data.get('email', data['_id'])
-            all_data[key] = data
-        else:
-            all_data.append(data)
+        # Store a copy so later changes to the caller's dict don't leak into the cache
+        doc = _json_doc(data)
+        key = data.get('email', data['_id']) if self.is_dict else len(all_data)
+        self._put(all_data, key, doc, indexes)
             
-        self._save(all_data)
+        self._commit(all_data, [{'op': 'set', 'key': key, 'doc': doc}])
         return type('MockResult', (), {'inserted_id': data['_id']})()
 
+    @_exclusive
     def insert_many(self, data_list):
         all_data = self._load()
+        indexes = self._index_set(all_data)
         import uuid
         ids = []
-        for data in data_list:
-            if '_id' not in data:
-                data['_id'] = str(uuid.uuid4())
-            ids.append(data['_id'])
-            if self.is_dict:
-                key = data.get('email', data['_id'])
-                all_data[key] = data
-            else:
-                all_data.append(data)
-        
-        self._save(all_data)
+        ops = []
+        try:
+            for data in data_list:
+                if '_id' not in data:
+                    data['_id'] = str(uuid.uuid4())
+                doc = _json_doc(data)
+                key = data.get('email', data['_id']) if self.is_dict else len(all_data)
+                self._put(all_data, key, doc, indexes)
+                ids.append(data['_id'])
+                ops.append({'op': 'set', 'key': key, 'doc': doc})
+        finally:
+            # Like an ordered MongoDB insert, documents before a duplicate are kept
+            self._commit(all_data, ops)
         return type('MockResult', (), {'inserted_ids': ids})()
+
+    def _put(self, all_data, key, doc, indexes):
+        """Insert or replace the document at key, keeping indexes (and uniqueness) intact"""
+        old = all_data.get(key) if self.is_dict else None
+        if indexes is not None:
+            indexes.check(doc, replacing=old)
+        if self.is_dict:
+            all_data[key] = doc
+        else:
+            all_data.append(doc)
+        if indexes is not None:
+            if old is not None:
+                indexes.replace(old, doc, key)
+            else:
+                indexes.add(doc, key)
     
-    def find(self, query=None, sort=None):
+    def find(self, query=None, projection=None, sort=None, skip=0, limit=0):
+        """Lazy cursor supporting .sort(), .skip() and .limit(), like PyMongo"""
+        return MockCursor(self, query, projection, sort=sort, skip=skip, limit=limit)
+
+    @_synchronized
+    def _cursor_source(self, query, sort):
+        """Lazy walk over the documents matching `query`, and whether it already follows `sort`"""
         data = self._load()
-        items = list(data.values()) if self.is_dict else list(data)
-        
-        if query:
-            filtered = []
-            for item in items:
-                match = True
-                for key, val in query.items():
-                    if key == '$or':
-                        or_match = False
-                        for cond in val:
-                            if all(item.get(k) == v for k, v in cond.items()):
-                                or_match = True
-                                break
-                        if not or_match:
-                            match = False
-                            break
-                    elif key == '_id':
-                        if str(item.get('_id')) != str(val):
-                            match = False
-                            break
-                    elif item.get(key) != val:
-                        match = False
+        indexes = self._index_set(data)
+        # A single-field sort over a sorted index walks the index in order
+        ordered = bool(sort and len(sort) == 1 and indexes is not None
+                       and indexes.sorted_index(sort[0][0]) is not None
+                       and (not query or indexes.candidates(query) is None))
+        return self._walk(query, sort[0] if ordered else None), ordered
+
+    def _walk(self, query, sort_field):
+        """
+        Yield the documents matching `query` (in sort_field order, when given),
+        taking the in-process lock per document so skip/limit stop the walk early.
+        Writers change the cached data in place between steps; when the cache
+        entry has moved on, the walk resumes from a fresh load at the same
+        position, like a MongoDB cursor without snapshot isolation.
+        """
+        match = compile_query(query) if query else None
+        walk, seen, position = None, None, 0
+        while True:
+            with thread_lock(self.file_path):
+                current = _cache_entry(self.file_path)
+                if walk is None or current[0] != seen[0] or current[1] is not seen[1]:
+                    data = self._load()
+                    seen = _cache_entry(self.file_path)
+                    walk = islice(self._documents(data, query, sort_field), position, None)
+                for doc in walk:
+                    position += 1
+                    if match is None or match(doc):
                         break
-                if match:
-                    filtered.append(item)
-            items = filtered
-
-        class SortableList(list):
-            def sort(self, key_name, direction=-1):
-                # Handle direction (1 for ASC, -1 for DESC)
-                super().sort(key=lambda x: x.get(key_name, ''), reverse=(direction == -1))
-                return self
-        
-        result_list = SortableList(items)
-        if sort:
-            # Handle list of tuples like [('created_at', -1)]
-            for field, direction in sort:
-                result_list.sort(field, direction)
-        
-        return result_list
+                else:
+                    return
+            yield doc
+
+    def _documents(self, data, query, sort_field):
+        indexes = self._index_set(data)
+        if sort_field is not None:
+            return indexes.sorted_index(sort_field[0]).ordered(sort_field[1])
+        return (item for _, item in self._scan(data, query, indexes))
     
-    def update_one(self, query, update):
+    def _apply_update(self, item, update):
+        """Return an updated copy of item; the cached original is left untouched"""
+        item = dict(item)
+        if '$set' in update:
+            item.update(update['$set'])
+        if '$unset' in update:
+            for k in update['$unset']:
+                item.pop(k, None)
+        if '$inc' in update:
+            for k, v in update['$inc'].items():
+                item[k] = item.get(k, 0) + v
+        return _json_doc(item)
+
+    def _replace(self, all_data, doc_key, old, new, indexes):
+        if indexes is not None:
+            indexes.check(new, replacing=old)
+        all_data[doc_key] = new
+        if indexes is not None:
+            indexes.replace(old, new, doc_key)
+
+    @_exclusive
+    def update_one(self, query, update, expected_version=None):
+        """With expected_version, only update while the document's _version still matches (compare-and-swap)"""
+        if expected_version is not None:
+            query, update = versioned(query, update, expected_version)
         all_data = self._load()
-        items = all_data.values() if self.is_dict else all_data
-        
-        found = False
-        for item in items:
-            match = True
-            for key, val in query.items():
-                if key == '_id':
-                    if str(item.get('_id')) != str(val):
-                        match = False
-                        break
-                elif item.get(key) != val:
-                    match = False
-                    break
-            
-            if match:
-                if '$set' in update:
-                    item.update(update['$set'])
-                if '$unset' in update:
-                    for k in update['$unset']:
-                        item.pop(k, None)
-                if '$inc' in update:
-                    for k, v in update['$inc'].items():
-                        item[k] = item.get(k, 0) + v
-                found = True
-                break
-        
-        if found:
-            self._save(all_data)
-            return type('MockResult', (), {'modified_count': 1})()
+        indexes = self._index_set(all_data)
+        
+        match = compile_query(query)
+        for doc_key, item in self._scan(all_data, query, indexes):
+            if match(item):
+                doc_key = self._resolve_key(doc_key, item, indexes)
+                updated = self._apply_update(item, update)
+                self._replace(all_data, doc_key, item, updated, indexes)
+                self._commit(all_data, [{'op': 'set', 'key': doc_key, 'doc': updated}])
+                return type('MockResult', (), {'modified_count': 1})()
         
         return type('MockResult', (), {'modified_count': 0})()
 
+    @_exclusive
     def update_many(self, query, update):
         all_data = self._load()
-        items = all_data.values() if self.is_dict else all_data
-        modified_count = 0
-        
-        for item in items:
-            match = True
-            for key, val in query.items():
-                if item.get(key) != val:
-                    match = False
-                    break
-            
-            if match:
-                if '$set' in update:
-                    item.update(update['$set'])
-                modified_count += 1
+        indexes = self._index_set(all_data)
+        ops = []
         
-        if modified_count > 0:
-            self._save(all_data)
-        return type('MockResult', (), {'modified_count': modified_count})()
+        match = compile_query(query)
+        try:
+            for doc_key, item in list(self._scan(all_data, query, indexes)):
+                if match(item):
+                    doc_key = self._resolve_key(doc_key, item, indexes)
+                    updated = self._apply_update(item, {'$set': update.get('$set', {})})
+                    self._replace(all_data, doc_key, item, updated, indexes)
+                    ops.append({'op': 'set', 'key': doc_key, 'doc': updated})
+        finally:
+            self._commit(all_data, ops)
+        return type('MockResult', (), {'modified_count': len(ops)})()
     
+    @_exclusive
     def delete_one(self, query):
         all_data = self._load()
-        if self.is_dict:
-            if 'email' in query and query['email'] in all_data:
-                del all_data[query['email']]
-                self._save(all_data)
-                return type('MockResult', (), {'deleted_count': 1})()
-        else:
-            new_data = []
-            deleted = False
-            for item in all_data:
-                match = True
-                for key, val in query.items():
-                    if str(item.get(key)) != str(val):
-                        match = False
-                        break
-                if match and not deleted:
-                    deleted = True
-                else:
-                    new_data.append(item)
-            
-            if deleted:
-                self._save(new_data)
+        indexes = self._index_set(all_data)
+        match = compile_query(query)
+        for doc_key, item in self._scan(all_data, query, indexes):
+            if match(item):
+                doc_key = self._resolve_key(doc_key, item, indexes)
+                if indexes is not None:
+                    indexes.remove(item)
+                del all_data[doc_key]
+                self._commit(all_data, [{'op': 'del', 'key': doc_key}])
                 return type('MockResult', (), {'deleted_count': 1})()
         
         return type('MockResult', (), {'deleted_count': 0})()
 
+    @_exclusive
     def delete_many(self, query):
         all_data = self._load()
+        indexes = self._index_set(all_data)
+        match = compile_query(query)
+        ops = []
         if self.is_dict:
-            return type('MockResult', (), {'deleted_count': 0})()
-            
-        new_data = []
-        deleted_count = 0
-        for item in all_data:
-            match = True
-            for key, val in query.items():
-                if isinstance(val, dict) and '$lt' in val:
-                    item_val = item.get(key)
-                    if isinstance(item_val, str):
-                        try:
-                            item_val = datetime.fromisoformat(item_val)
-                        except: pass
-                    if item_val >= val['$lt']:
-                        match = False
-                elif item.get(key) != val:
-                    match = False
-                
-            if match:
-                deleted_count += 1
-            else:
-                new_data.append(item)
+            for key in [key for key, item in all_data.items() if match(item)]:
+                if indexes is not None:
+                    indexes.remove(all_data[key])
+                del all_data[key]
+                ops.append({'op': 'del', 'key': key})
+        else:
+            new_data = []
+            for item in all_data:
+                if match(item):
+                    # Position in the list as it stands after the earlier deletions
+                    ops.append({'op': 'del', 'key': len(new_data)})
+                    if indexes is not None:
+                        indexes.remove(item)
+                else:
+                    new_data.append(item)
+            if ops:
+                all_data[:] = new_data
         
-        if deleted_count > 0:
-            self._save(new_data)
-        return type('MockResult', (), {'deleted_count': deleted_count})()
+        self._commit(all_data, ops)
+        return type('MockResult', (), {'deleted_count': len(ops)})()
     
+    @_synchronized
     def create_index(self, field, unique=False):
-        print(f"Mock index created for {field} (unique: {unique})")
+        """
+        Register an index on this collection file. A plain field name builds a
+        hash index; a [(field, direction)] key list builds a sorted index that
+        also serves ranges and sort(). unique=True raises DuplicateKeyError on
+        existing or future duplicates, as MongoDB does.
+        """
+        is_sorted = not isinstance(field, str)
+        if is_sorted:
+            field = field[0][0]
+        specs = dict(_index_specs.get(self.file_path, {}))
+        specs[field] = {'unique': unique, 'sorted': is_sorted}
+        # Build first so a unique violation leaves the existing specs untouched
+        indexes = IndexSet(self.name, specs, self._load(), self.is_dict)
+        for index in indexes.indexes.values():
+            index.verify_unique()
+        _index_specs[self.file_path] = specs
+        _index_state[self.file_path] = indexes
+        return f"{field}_1"
+
+def edit_file(file_path, is_dict=True):
+    """MockCollection.edit() of a data file; is_dict=False for files holding a list"""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return MockCollection(name, file_path, is_dict=is_dict).edit()
 
 def get_db():
     return db
 
+# Attempts before an optimistic update gives up on a document that keeps changing
+CAS_RETRIES = 8
+
+def compare_and_swap(collection, query, update, expected_version):
+    """update_one that only applies while the document's _version is expected_version (any backend)"""
+    if isinstance(collection, MongoCollection):
+        # pymongo's update_one has no expected_version; the rewritten filter does the same job
+        return collection.update_one(*versioned(query, update, expected_version))
+    return collection.update_one(query, update, expected_version=expected_version)
+
+def transition_document(collection, query, decide, retries=CAS_RETRIES):
+    """
+    Optimistic read-check-write of one document. decide(doc) returns the update
+    to apply, or an error message to refuse the transition. The update is a
+    compare-and-swap on the version that was read; if another request changed
+    the document in between, it is re-read and decided again.
+    Returns (success, message); message is None on success and when nothing matched.
+    """
+    for attempt in range(retries):
+        doc = collection.find_one(query)
+        if doc is None:
+            return False, None
+        decision = decide(doc)
+        if isinstance(decision, str):
+            return False, decision
+        result = compare_and_swap(collection, {'_id': doc['_id']}, decision, doc.get(VERSION_FIELD, 0))
+        if result.modified_count > 0:
+            return True, None
+        # Lost the race; back off briefly so contending workers spread out
+        time.sleep(random.uniform(0, 0.002 * (attempt + 1)))
+    return False, "The listing is busy, please try again"
+
+def listing_id_query(listing_id):
+    """Filter for a listing by its string id, or its ObjectId on MongoDB"""
+    ids = [str(listing_id)]
+    if isinstance(db, MongoDatabase):
+        from bson.objectid import ObjectId
+        if ObjectId.is_valid(str(listing_id)):
+            ids.append(ObjectId(str(listing_id)))
+    return {'_id': {'$in': ids}}
+
 # User model functions
 def create_user(name, email, password, phone, state, district, pincode='', village=''):
     """Create a new user and save to file-based storage"""
@@ -413,18 +741,9 @@ def create_user(name, email, password, phone, state, district, pincode='', villa
     
     # Always save to file-based storage (primary for now)
     try:
-        # Load existing users
-        users_dict = {}
-        if os.path.exists(USERS_FILE):
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                users_dict = json.load(f)
-        
         # Add new user with email as key
-        users_dict[email] = user_data
-        
-        # Save back to file
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users_dict, f, indent=2, ensure_ascii=False, default=str)
+        with edit_file(USERS_FILE) as users_dict:
+            users_dict[email] = user_data
         
         print(f"👤 User created in file storage: {name} ({email}) - ID: {user_id}")
         
@@ -477,19 +796,11 @@ def find_user_by_phone(phone):
 def update_user_password(email, new_password):
     """Update user password by email"""
     try:
-        # Load users from file
-        with open(USERS_FILE, 'r') as f:
-            users_db = json.load(f)
-        
-        # Find and update user
-        for user_id, user in users_db.items():
-            if user.get('email') == email:
-                user['password'] = new_password
-                # Save back to file
-                with open(USERS_FILE, 'w') as f:
-                    json.dump(users_db, f, indent=2, default=str)
-                print(f"[SUCCESS] Password updated for user: {email}")
-                return True
+        result = MockCollection('users', USERS_FILE, is_dict=True).update_one(
+            {'email': email}, {'$set': {'password': new_password}})
+        if result.modified_count > 0:
+            print(f"[SUCCESS] Password updated for user: {email}")
+            return True
         
         print(f"[WARNING] User not found: {email}")
         return False
@@ -497,20 +808,20 @@ def update_user_password(email, new_password):
         print(f"[ERROR] Error updating password: {e}")
         return False
 
-def find_user_by_id(user_id):
+def find_user_by_id(user_id, fields=None):
+    """Find a user by id, without the password; `fields` limits the result to the fields the caller needs"""
     print(f"[DEBUG find_user_by_id] Searching for user_id: {user_id}", flush=True)
+    projection = {field: 1 for field in fields} if fields else {'password': 0}
     try:
-        if hasattr(db, 'users') and db:
+        # Not `and db`: pymongo's Database refuses truth testing
+        if db is not None and hasattr(db, 'users'):
             users = db.users
             
             # Try with ObjectId first (for MongoDB native ObjectIds)
             try:
                 from bson.objectid import ObjectId
                 if len(str(user_id)) == 24:  # ObjectId is 24 hex chars
-                    user = users.find_one(
-                        {'_id': ObjectId(user_id)}, 
-                        {'password': 0}  # Exclude password field
-                    )
+                    user = users.find_one({'_id': ObjectId(user_id)}, projection)
                     if user:
                         print(f"[DEBUG find_user_by_id] Found user via ObjectId: {user.get('name')}", flush=True)
                         return user
@@ -518,21 +829,16 @@ def find_user_by_id(user_id):
                 print(f"[DEBUG find_user_by_id] ObjectId lookup failed: {e}", flush=True)
             
             # Try with string ID (for UUID-based IDs stored as strings)
-            user = users.find_one({'_id': str(user_id)})
+            user = users.find_one({'_id': str(user_id)}, projection)
             if user:
                 print(f"[DEBUG find_user_by_id] Found user via string _id: {user.get('name')}", flush=True)
-                # Remove password from result
-                user_copy = dict(user)
-                user_copy.pop('password', None)
-                return user_copy
+                return user
             
             # Also try searching by user_id field (in case stored differently)
-            user = users.find_one({'user_id': str(user_id)})
+            user = users.find_one({'user_id': str(user_id)}, projection)
             if user:
                 print(f"[DEBUG find_user_by_id] Found user via user_id field: {user.get('name')}", flush=True)
-                user_copy = dict(user)
-                user_copy.pop('password', None)
-                return user_copy
+                return user
             
             print(f"[DEBUG find_user_by_id] User not found in MongoDB", flush=True)
         
@@ -544,10 +850,7 @@ def find_user_by_id(user_id):
             # Search through all users for matching _id
             for email, user_data in users_dict.items():
                 if user_data.get('_id') == str(user_id):
-                    # Remove password from result
-                    user_copy = user_data.copy()
-                    user_copy.pop('password', None)
-                    return user_copy
+                    return compile_projection(projection)(user_data)
                     
     except Exception as e:
         print(f"Error fetching user by ID: {e}")
@@ -555,6 +858,59 @@ def find_user_by_id(user_id):
     # If user not found, return None
     return None
 
+# User fields attached to marketplace and equipment listings
+CONTACT_FIELDS = ['name', 'phone']
+
+def _file_users():
+    """users.json with its _id index, for lookups that fall back to the file store"""
+    users = MockCollection('users', USERS_FILE, is_dict=True)
+    if '_id' not in _index_specs.get(users.file_path, {}):
+        users.create_index('_id')
+    return users
+
+def find_users_by_ids(user_ids, fields=None):
+    """Bulk find_user_by_id: returns {user_id: user} for the ids that exist, in one query"""
+    ids = {str(user_id) for user_id in user_ids if user_id}
+    if not ids:
+        return {}
+    projection = {field: 1 for field in fields} if fields else {'password': 0}
+    if fields:
+        projection['user_id'] = 1
+    found = {}
+    try:
+        if db is not None and hasattr(db, 'users'):
+            lookup = list(ids)
+            if isinstance(db, MongoDatabase):
+                # MongoDB native ids are ObjectIds
+                from bson.objectid import ObjectId
+                lookup += [ObjectId(user_id) for user_id in ids if ObjectId.is_valid(user_id)]
+            for user in db.users.find({'_id': {'$in': lookup}}, projection):
+                found[str(user['_id'])] = user
+            missing = list(ids - found.keys())
+            # Users stored with a separate user_id field, as find_user_by_id also allows
+            if missing:
+                for user in db.users.find({'user_id': {'$in': missing}}, projection):
+                    found.setdefault(str(user['user_id']), user)
+        missing = list(ids - found.keys())
+        # Users are always written to users.json too (see create_user), which find_user_by_id also falls back to
+        if missing and not isinstance(db, MockDatabase) and os.path.exists(USERS_FILE):
+            for user in _file_users().find({'_id': {'$in': missing}}, projection):
+                found[str(user['_id'])] = user
+    except Exception as e:
+        print(f"Error fetching users by ID: {e}")
+    return found
+
+def attach_user_contacts(listings, id_field, prefix, only_missing=False):
+    """Set <prefix>_name/<prefix>_phone on each listing from one bulk user lookup"""
+    if only_missing:
+        listings = [l for l in listings if not l.get(f'{prefix}_name') or l.get(f'{prefix}_name') == 'Unknown']
+    users = find_users_by_ids([l.get(id_field) for l in listings], fields=CONTACT_FIELDS)
+    for listing in listings:
+        user = users.get(str(listing.get(id_field)))
+        if user:
+            listing[f'{prefix}_name'] = user.get('name', 'Unknown')
+            listing[f'{prefix}_phone'] = user.get('phone', '')
+
 # Alias for backward compatibility
 get_user_by_id = find_user_by_id
 
@@ -586,16 +942,11 @@ def save_crop_recommendation(user_id, crop_data, timeline_data=None):
                 print(f"[MongoDB] Could not save crop: {e}")
         
         # Also save to file storage
-        with open(CROPS_FILE, 'r') as f:
-            crops_db = json.load(f)
-        
-        if user_id not in crops_db:
-            crops_db[user_id] = []
-        
-        crops_db[user_id].append(crop_record)
-        
-        with open(CROPS_FILE, 'w') as f:
-            json.dump(crops_db, f, indent=2)
+        with edit_file(CROPS_FILE) as crops_db:
+            if user_id not in crops_db:
+                crops_db[user_id] = []
+            
+            crops_db[user_id].append(crop_record)
         
         print(f"🌱 Crop recommendation saved for user {user_id}: {crop_record['crop_name']}")
         return type('MockResult', (), {'inserted_id': crop_id})()
@@ -635,14 +986,9 @@ def delete_crop(crop_id):
                 pass
         
         # Delete from file storage
-        with open(CROPS_FILE, 'r') as f:
-            crops_db = json.load(f)
-        
-        for user_id in crops_db:
-            crops_db[user_id] = [c for c in crops_db[user_id] if c.get('_id') != crop_id]
-        
-        with open(CROPS_FILE, 'w') as f:
-            json.dump(crops_db, f, indent=2)
+        with edit_file(CROPS_FILE) as crops_db:
+            for user_id in crops_db:
+                crops_db[user_id] = [c for c in crops_db[user_id] if c.get('_id') != crop_id]
         
         print(f"🗑️ Crop deleted: {crop_id}")
         return type('MockResult', (), {'deleted_count': 1})()
@@ -669,18 +1015,12 @@ def save_fertilizer_recommendation(user_id, fertilizer_data):
                 print(f"[MongoDB] Could not save fertilizer: {e}")
         
         # Also save to file storage
-        with open(FERTILIZERS_FILE, 'r') as f:
-            fertilizer_db = json.load(f)
-        
-        # Save fertilizer
-        if user_id not in fertilizer_db:
-            fertilizer_db[user_id] = []
-        
-        fertilizer_db[user_id].append(fertilizer_data)
-        
-        # Write back to file
-        with open(FERTILIZERS_FILE, 'w') as f:
-            json.dump(fertilizer_db, f, indent=2)
+        with edit_file(FERTILIZERS_FILE) as fertilizer_db:
+            # Save fertilizer
+            if user_id not in fertilizer_db:
+                fertilizer_db[user_id] = []
+            
+            fertilizer_db[user_id].append(fertilizer_data)
         
         print(f"🧪 Fertilizer recommendation saved for user {user_id}: {fertilizer_data.get('name')}")
         return type('MockResult', (), {'inserted_id': fertilizer_id})()
@@ -701,25 +1041,15 @@ def get_user_fertilizers(user_id):
             except Exception as e:
                 print(f"[MongoDB] Could not fetch fertilizers: {e}")
         
-        # Fallback to file storage
-        with open(FERTILIZERS_FILE, 'r') as f:
-            fertilizer_db = json.load(f)
-        
-        # Get user's fertilizers
-        user_fertilizers = fertilizer_db.get(user_id, [])
-        
-        # Add _id to fertilizers that don't have one
-        needs_save = False
-        for fert in user_fertilizers:
-            if '_id' not in fert:
-                fert['_id'] = str(uuid.uuid4())
-                needs_save = True
-        
-        # Save back if we added any IDs
-        if needs_save:
-            fertilizer_db[user_id] = user_fertilizers
-            with open(FERTILIZERS_FILE, 'w') as f:
-                json.dump(fertilizer_db, f, indent=2)
+        # Fallback to file storage; saved back only if _ids were added
+        with edit_file(FERTILIZERS_FILE) as fertilizer_db:
+            # Get user's fertilizers
+            user_fertilizers = fertilizer_db.get(user_id, [])
+            
+            # Add _id to fertilizers that don't have one
+            for fert in user_fertilizers:
+                if '_id' not in fert:
+                    fert['_id'] = str(uuid.uuid4())
         
         return user_fertilizers
     except Exception as e:
@@ -748,17 +1078,14 @@ def delete_fertilizer_recommendation(fertilizer_id, user_id):
     
     # Also delete from JSON file
     try:
-        with open(FERTILIZERS_FILE, 'r') as f:
-            fertilizer_db = json.load(f)
-        
-        user_fertilizers = fertilizer_db.get(user_id, [])
-        initial_count = len(user_fertilizers)
-        user_fertilizers = [f for f in user_fertilizers if f.get('_id') != fertilizer_id]
+        with edit_file(FERTILIZERS_FILE) as fertilizer_db:
+            user_fertilizers = fertilizer_db.get(user_id, [])
+            initial_count = len(user_fertilizers)
+            user_fertilizers = [f for f in user_fertilizers if f.get('_id') != fertilizer_id]
+            if len(user_fertilizers) < initial_count:
+                fertilizer_db[user_id] = user_fertilizers
         
         if len(user_fertilizers) < initial_count:
-            fertilizer_db[user_id] = user_fertilizers
-            with open(FERTILIZERS_FILE, 'w') as f:
-                json.dump(fertilizer_db, f, indent=2)
             print(f"[SUCCESS] Deleted fertilizer {fertilizer_id} from JSON for user {user_id}")
             deleted = True
             
@@ -812,17 +1139,12 @@ def save_growing_activity(activity_data):
             print(f"[SUCCESS] Growing activity saved to MongoDB: {activity_data.get('crop_display_name')} [ID: {activity_id}]")
         else:
             # Fallback to JSON file
-            with open(GROWING_FILE, 'r') as f:
-                growing_data = json.load(f)
-            
-            user_id = activity_data.get('user_id')
-            if user_id not in growing_data:
-                growing_data[user_id] = []
-            
-            growing_data[user_id].append(activity_data)
-            
-            with open(GROWING_FILE, 'w') as f:
-                json.dump(growing_data, f, indent=2, default=str)
+            with edit_file(GROWING_FILE) as growing_data:
+                user_id = activity_data.get('user_id')
+                if user_id not in growing_data:
+                    growing_data[user_id] = []
+                
+                growing_data[user_id].append(activity_data)
             
             print(f"[DEV] Growing activity saved to JSON: {activity_data.get('crop_display_name')} [ID: {activity_id}]")
         
@@ -886,23 +1208,18 @@ def update_growing_activity(activity_id, user_id, update_data):
                 return True
         
         # Fallback to JSON file
-        with open(GROWING_FILE, 'r') as f:
-            growing_data = json.load(f)
-        
-        user_activities = growing_data.get(user_id, [])
-        
-        activity_found = False
-        for i, activity in enumerate(user_activities):
-            if activity.get('_id') == activity_id or activity.get('id') == activity_id:
-                for key, value in update_data.items():
-                    user_activities[i][key] = value
-                activity_found = True
-                break
+        with edit_file(GROWING_FILE) as growing_data:
+            user_activities = growing_data.get(user_id, [])
+            
+            activity_found = False
+            for i, activity in enumerate(user_activities):
+                if activity.get('_id') == activity_id or activity.get('id') == activity_id:
+                    for key, value in update_data.items():
+                        user_activities[i][key] = value
+                    activity_found = True
+                    break
         
         if activity_found:
-            growing_data[user_id] = user_activities
-            with open(GROWING_FILE, 'w') as f:
-                json.dump(growing_data, f, indent=2, default=str)
             print(f"[SUCCESS] Updated activity {activity_id} in JSON")
             return True
         
@@ -934,17 +1251,14 @@ def delete_growing_activity(activity_id, user_id):
                 deleted = True
         
         # Also try JSON file
-        with open(GROWING_FILE, 'r') as f:
-            growing_data = json.load(f)
-        
-        user_activities = growing_data.get(user_id, [])
-        initial_count = len(user_activities)
-        user_activities = [a for a in user_activities if a.get('_id') != activity_id]
+        with edit_file(GROWING_FILE) as growing_data:
+            user_activities = growing_data.get(user_id, [])
+            initial_count = len(user_activities)
+            user_activities = [a for a in user_activities if a.get('_id') != activity_id]
+            if len(user_activities) < initial_count:
+                growing_data[user_id] = user_activities
         
         if len(user_activities) < initial_count:
-            growing_data[user_id] = user_activities
-            with open(GROWING_FILE, 'w') as f:
-                json.dump(growing_data, f, indent=2)
             print(f"[SUCCESS] Deleted activity {activity_id} from JSON")
             deleted = True
         
@@ -1079,6 +1393,10 @@ def get_dashboard_notifications(user_id):
     
     return notifications
 
+def _notifications_file_collection():
+    """notifications.json as a MockCollection, so it shares the document cache and journal"""
+    return MockCollection('notifications', NOTIFICATIONS_FILE)
+
 def mark_user_notifications_read(user_id):
     """Mark all notifications as read for a user in MongoDB"""
     try:
@@ -1089,20 +1407,11 @@ def mark_user_notifications_read(user_id):
                 {'$set': {'read': True}}
             )
         
-        # Also update in JSON file for fallback
-        if os.path.exists(NOTIFICATIONS_FILE):
-             with open(NOTIFICATIONS_FILE, 'r') as f:
-                all_notifs = json.load(f)
-             
-             updated = False
-             for n in all_notifs:
-                 if n.get('user_id') == str(user_id) and not n.get('read', False):
-                     n['read'] = True
-                     updated = True
-             
-             if updated:
-                 with open(NOTIFICATIONS_FILE, 'w') as f:
-                    json.dump(all_notifs, f, indent=2)
+        # Also update in JSON file for fallback; notifications without a read flag are unread too
+        _notifications_file_collection().update_many(
+            {'user_id': str(user_id), 'read': {'$ne': True}},
+            {'$set': {'read': True}}
+        )
 
         # Update user's last_notification_read_at timestamp
         timestamp = datetime.now().isoformat()
@@ -1148,13 +1457,7 @@ def add_notification(user_id, type, message, priority='medium', title=None, data
             print(f"[SUCCESS] Notification saved to MongoDB for user {user_id}")
         else:
             # Fallback to JSON file
-            notifications = []
-            if os.path.exists(NOTIFICATIONS_FILE):
-                with open(NOTIFICATIONS_FILE, 'r') as f:
-                    notifications = json.load(f)
-            notifications.append(new_notif)
-            with open(NOTIFICATIONS_FILE, 'w') as f:
-                json.dump(notifications, f, indent=2)
+            _notifications_file_collection().insert_one(new_notif)
         
         return True
     except Exception as e:
@@ -1174,17 +1477,8 @@ def delete_notification(notification_id):
                 deleted = True
         
         # Also try JSON file
-        if os.path.exists(NOTIFICATIONS_FILE):
-            with open(NOTIFICATIONS_FILE, 'r') as f:
-                notifications = json.load(f)
-                
-            initial_len = len(notifications)
-            notifications = [n for n in notifications if n.get('id') != notification_id]
-            
-            if len(notifications) < initial_len:
-                with open(NOTIFICATIONS_FILE, 'w') as f:
-                    json.dump(notifications, f, indent=2)
-                deleted = True
+        if _notifications_file_collection().delete_many({'id': notification_id}).deleted_count > 0:
+            deleted = True
         
         return deleted
     except Exception as e:
@@ -1210,21 +1504,14 @@ def update_equipment(equipment_id, update_data):
                 return True
         
         # Fallback to JSON file
-        with open(EQUIPMENT_FILE, 'r') as f:
-            equipment = json.load(f)
-        
         updated = False
-        for item in equipment:
-            if item.get('_id') == equipment_id:
-                item.update(update_data)
-                updated = True
-                break
-        
-        if updated:
-            with open(EQUIPMENT_FILE, 'w') as f:
-                json.dump(equipment, f, indent=2)
-            return True
-        return False
+        with edit_file(EQUIPMENT_FILE, is_dict=False) as equipment:
+            for item in equipment:
+                if item.get('_id') == equipment_id:
+                    item.update(update_data)
+                    updated = True
+                    break
+        return updated
     except Exception as e:
         print(f"Error updating equipment: {e}")
         return False
@@ -1240,11 +1527,7 @@ def get_persistent_notifications(user_id):
             return notifications
         
         # Fallback to JSON file
-        if not os.path.exists(NOTIFICATIONS_FILE):
-            return []
-        with open(NOTIFICATIONS_FILE, 'r') as f:
-            all_notifs = json.load(f)
-            return [n for n in all_notifs if n.get('user_id') == str(user_id)]
+        return list(_notifications_file_collection().find({'user_id': str(user_id)}))
     except Exception as e:
         print(f"Error loading notifications: {e}")
         return []
@@ -1283,10 +1566,8 @@ def save_equipment(equipment_data):
             print(f"[SUCCESS] Equipment saved to MongoDB: {equipment_data.get('name')} [ID: {equipment_id}]")
         else:
             # Fallback to JSON file
-            equipment = get_all_equipment()
-            equipment.append(equipment_data)
-            with open(EQUIPMENT_FILE, 'w') as f:
-                json.dump(equipment, f, indent=2)
+            with edit_file(EQUIPMENT_FILE, is_dict=False) as equipment:
+                equipment.append(equipment_data)
             print(f"[DEV] Equipment saved to JSON: {equipment_data.get('name')} [ID: {equipment_id}]")
             
         return equipment_id
@@ -1308,7 +1589,8 @@ def update_equipment_status(equipment_id, status):
                 
                 result = db.equipment_listings.update_one(
                     {'_id': obj_id},
-                    {'$set': {'status': status, 'updated_at': datetime.utcnow().isoformat()}}
+                    {'$set': {'status': status, 'updated_at': datetime.utcnow().isoformat()},
+                     '$inc': {VERSION_FIELD: 1}}
                 )
                 if result.modified_count > 0:
                     print(f"[MONGODB] Equipment status updated: {equipment_id} -> {status}")
@@ -1321,20 +1603,17 @@ def update_equipment_status(equipment_id, status):
             print(f"[ERROR] Equipment listings file not found: {EQUIPMENT_LISTINGS_FILE}")
             return False
         
-        with open(EQUIPMENT_LISTINGS_FILE, 'r', encoding='utf-8') as f:
-            listings = json.load(f)
-        
         updated = False
-        for listing in listings:
-            if listing.get('_id') == equipment_id:
-                listing['status'] = status
-                listing['updated_at'] = datetime.utcnow().isoformat()
-                updated = True
-                break
+        with edit_file(EQUIPMENT_LISTINGS_FILE, is_dict=False) as listings:
+            for listing in listings:
+                if listing.get('_id') == equipment_id:
+                    listing['status'] = status
+                    listing['updated_at'] = datetime.utcnow().isoformat()
+                    listing[VERSION_FIELD] = listing.get(VERSION_FIELD, 0) + 1
+                    updated = True
+                    break
         
         if updated:
-            with open(EQUIPMENT_LISTINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(listings, f, indent=2, ensure_ascii=False)
             print(f"[FILE] Equipment status updated: {equipment_id} -> {status}")
             return True
         else:
@@ -1368,17 +1647,8 @@ def save_expense(expense_data):
             expense_id = str(uuid.uuid4())
             expense_data['_id'] = expense_id
             
-            expenses = []
-            if os.path.exists(EXPENSES_FILE):
-                with open(EXPENSES_FILE, 'r') as f:
-                    try:
-                        expenses = json.load(f)
-                    except:
-                        expenses = []
-            
-            expenses.append(expense_data)
-            with open(EXPENSES_FILE, 'w') as f:
-                json.dump(expenses, f, indent=2)
+            with edit_file(EXPENSES_FILE, is_dict=False) as expenses:
+                expenses.append(expense_data)
             
             return expense_id
     except Exception as e:
@@ -1413,45 +1683,33 @@ def get_user_expenses(user_id):
 # ============================================
 
 LISTINGS_FILE = os.path.join(DATA_DIR, 'crop_listings.json')
-MARKET_PRICES_FILE = os.path.join(DATA_DIR, 'market_prices.json')
+
+# Fields rendered by the buyer marketplace (buyer_marketplace.html)
+MARKETPLACE_LISTING_FIELDS = ['crop', 'quantity', 'unit', 'farmer_price', 'live_market_price', 'district', 'state',
+                              'latitude', 'longitude', 'farmer_id', 'farmer_name', 'farmer_phone', 'status', 'created_at']
 
 # Initialize listings file
-if not os.path.exists(LISTINGS_FILE):
-    with open(LISTINGS_FILE, 'w') as f:
-        json.dump([], f)
+create_file(LISTINGS_FILE, [])
 
 
 def get_live_market_price(crop, district, state):
-    """Fetch live market price for a crop from market_prices.json"""
+    """Fetch live market price for a crop from the market price index"""
     try:
-        if not os.path.exists(MARKET_PRICES_FILE):
+        price_index = get_price_index()
+        if price_index is None or not crop:
             return None
         
-        with open(MARKET_PRICES_FILE, 'r', encoding='utf-8') as f:
-            market_data = json.load(f)
-        
         # Search for crop in user's district first
-        matching_items = [
-            item for item in market_data.get('data', [])
-            if item['commodity'].lower() == crop.lower() 
-            and item['district'].lower() == district.lower()
-            and item['state'].lower() == state.lower()
-        ]
+        matching_items = price_index.records(state=state, district=district, commodity=crop,
+                                             ignore_case=True, limit=1)
         
         # If not found in exact district, search in same state
         if not matching_items:
-            matching_items = [
-                item for item in market_data.get('data', [])
-                if item['commodity'].lower() == crop.lower()
-                and item['state'].lower() == state.lower()
-            ]
+            matching_items = price_index.records(state=state, commodity=crop, ignore_case=True, limit=1)
         
         # If still not found, search nationwide
         if not matching_items:
-            matching_items = [
-                item for item in market_data.get('data', [])
-                if item['commodity'].lower() == crop.lower()
-            ]
+            matching_items = price_index.records(commodity=crop, ignore_case=True, limit=1)
         
         if matching_items:
             item = matching_items[0]
@@ -1512,35 +1770,10 @@ def create_crop_listing(listing_data):
             listing_data['_id'] = str(uuid.uuid4())
             print(f"[DEBUG] Generated listing ID: {listing_data['_id']}", flush=True)
             
-        listings = []
-        if os.path.exists(LISTINGS_FILE):
-            try:
-                with open(LISTINGS_FILE, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    print(f"[DEBUG] File content: '{content}'", flush=True)
-                    if content:
-                        listings = json.loads(content)
-                    else:
-                        listings = []
-                print(f"[DEBUG] Loaded {len(listings)} existing listings from file", flush=True)
-            except json.JSONDecodeError as json_err:
-                print(f"[FILE JSON ERROR] {str(json_err)}", flush=True)
-                print("[DEBUG] Resetting file with empty array", flush=True)
-                listings = []
-            except Exception as read_err:
-                print(f"[FILE READ ERROR] {str(read_err)}", flush=True)
-                listings = []
-        else:
-            print("[DEBUG] File does not exist, creating new", flush=True)
-        
-        listings.append(listing_data)
-        print(f"[DEBUG] Total listings to save: {len(listings)}", flush=True)
-        
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(LISTINGS_FILE), exist_ok=True)
-        
-        with open(LISTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(listings, f, indent=2, default=str)
+        with edit_file(LISTINGS_FILE, is_dict=False) as listings:
+            print(f"[DEBUG] Loaded {len(listings)} existing listings from file", flush=True)
+            listings.append(listing_data)
+            print(f"[DEBUG] Total listings to save: {len(listings)}", flush=True)
         
         print(f"[SUCCESS] Listing saved to file with ID: {listing_data['_id']}", flush=True)
         return listing_data['_id']
@@ -1638,18 +1871,13 @@ def get_available_listings(crop='', district='', state='', sort_by='recent'):
                 if sort_by == 'price_low': sort_order = [('farmer_price', 1)]
                 elif sort_by == 'price_high': sort_order = [('farmer_price', -1)]
                 
-                listings = list(db.crop_listings.find(query).sort(sort_order))
+                listings = list(db.crop_listings.find(query, MARKETPLACE_LISTING_FIELDS).sort(sort_order))
                 print(f"[DEBUG] MongoDB found {len(listings)} available listings", flush=True)
                 
                 for listing in listings:
                     listing['_id'] = str(listing['_id'])
-                    # Robust farmer detail fetching
-                    f_id = listing.get('farmer_id')
-                    if f_id:
-                        farmer = find_user_by_id(f_id)
-                        if farmer:
-                            listing['farmer_name'] = farmer.get('name', 'Unknown')
-                            listing['farmer_phone'] = farmer.get('phone', '')
+                # Farmer details for every listing in one query
+                attach_user_contacts(listings, 'farmer_id', 'farmer')
                 return listings
             except Exception as e:
                 print(f"[MONGODB ERROR] {str(e)}", flush=True)
@@ -1673,13 +1901,7 @@ def get_available_listings(crop='', district='', state='', sort_by='recent'):
             else: available.sort(key=lambda x: x.get('created_at', ''), reverse=True)
             
             # Add farmer details
-            for listing in available:
-                f_id = listing.get('farmer_id')
-                if f_id:
-                    farmer = find_user_by_id(f_id)
-                    if farmer:
-                        listing['farmer_name'] = farmer.get('name', 'Unknown')
-                        listing['farmer_phone'] = farmer.get('phone', '')
+            attach_user_contacts(available, 'farmer_id', 'farmer')
             
             print(f"[DEBUG] File-based retrieval complete, returning {len(available)} listings", flush=True)
             return available
@@ -1741,20 +1963,14 @@ def confirm_purchase(listing_id, purchase_data):
     """Confirm purchase and update listing status atomically"""
     try:
         # MongoDB Atlas - ATOMIC UPDATE
+        # Optimistic concurrency: the sale only applies to the listing version that was
+        # checked, so two buyers can never both win (retried on conflicts)
         if db is not None:
             try:
-                from bson.objectid import ObjectId
-                
-                # Atomic update: only update if status is still 'active'
-                # This prevents double-selling
-                try:
-                    obj_id = ObjectId(listing_id)
-                except:
-                    obj_id = listing_id
-                
-                result = db.crop_listings.find_one_and_update(
-                    {'_id': obj_id, 'status': 'active'},  # Only if still active
-                    {
+                def sell(listing):
+                    if listing.get('status') != 'active':
+                        return "This listing is no longer available"
+                    return {
                         '$set': {
                             'status': 'sold',
                             'buyer_id': purchase_data['buyer_id'],
@@ -1762,68 +1978,38 @@ def confirm_purchase(listing_id, purchase_data):
                             'buyer_phone': purchase_data['buyer_phone'],
                             'sold_at': purchase_data['purchased_at']
                         }
-                    },
-                    return_document=True
-                )
+                    }
                 
-                if result:
-                    print(f"[MONGODB] Purchase confirmed for listing: {listing_id}")
+                success, message = transition_document(db.crop_listings, listing_id_query(listing_id), sell)
+                if success:
+                    print(f"[DB] Purchase confirmed for listing: {listing_id}")
                     return True, "Purchase confirmed successfully"
-                else:
-                    return False, "This listing is no longer available"
+                if message:
+                    return False, message
                     
             except Exception as e:
                 print(f"[MONGODB ERROR] {e}")
         
-        # File-based fallback (with lock to prevent race condition)
-        try:
-            import fcntl
-            use_fcntl = True
-        except ImportError:
-            # Windows doesn't support fcntl
-            use_fcntl = False
-        
-        with open(LISTINGS_FILE, 'r+') as f:
-            # Lock file to prevent concurrent access (Unix/Linux only)
-            if use_fcntl:
-                try:
-                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-                except:
-                    pass
+        # File-based fallback (exclusive lock across workers, atomic replace)
+        with edit_file(LISTINGS_FILE, is_dict=False) as listings:
+            # Find listing and check if still active
+            for listing in listings:
+                if listing.get('_id') == listing_id:
+                    if listing.get('status') != 'active':
+                        return False, "This listing is no longer available"
+                    
+                    # Update status
+                    listing['status'] = 'sold'
+                    listing['buyer_id'] = purchase_data['buyer_id']
+                    listing['buyer_name'] = purchase_data['buyer_name']
+                    listing['buyer_phone'] = purchase_data['buyer_phone']
+                    listing['sold_at'] = purchase_data['purchased_at']
+                    listing[VERSION_FIELD] = listing.get(VERSION_FIELD, 0) + 1
+                    
+                    print(f"[FILE] Purchase confirmed for listing: {listing_id}")
+                    return True, "Purchase confirmed successfully"
             
-            try:
-                listings = json.load(f)
-                
-                # Find listing and check if still active
-                for listing in listings:
-                    if listing.get('_id') == listing_id:
-                        if listing.get('status') != 'active':
-                            return False, "This listing is no longer available"
-                        
-                        # Update status
-                        listing['status'] = 'sold'
-                        listing['buyer_id'] = purchase_data['buyer_id']
-                        listing['buyer_name'] = purchase_data['buyer_name']
-                        listing['buyer_phone'] = purchase_data['buyer_phone']
-                        listing['sold_at'] = purchase_data['purchased_at']
-                        
-                        # Write back
-                        f.seek(0)
-                        json.dump(listings, f, indent=2)
-                        f.truncate()
-                        
-                        print(f"[FILE] Purchase confirmed for listing: {listing_id}")
-                        return True, "Purchase confirmed successfully"
-                
-                return False, "Listing not found"
-                
-            finally:
-                # Release lock
-                if use_fcntl:
-                    try:
-                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-                    except:
-                        pass
+            return False, "Listing not found"
         
     except Exception as e:
         print(f"Error confirming purchase: {e}")
@@ -1836,18 +2022,10 @@ def update_listing_status(listing_id, new_status):
         # MongoDB Atlas
         if db is not None:
             try:
-                from bson.objectid import ObjectId
-                try:
-                    obj_id = ObjectId(listing_id)
-                except:
-                    obj_id = listing_id
-                
-                result = db.crop_listings.update_one(
-                    {'_id': obj_id},
-                    {'$set': {'status': new_status, 'updated_at': datetime.utcnow().isoformat()}}
-                )
-                if result.modified_count > 0:
-                    print(f"[MONGODB] Listing status updated: {listing_id} -> {new_status}")
+                update = {'$set': {'status': new_status, 'updated_at': datetime.utcnow().isoformat()}}
+                success, _ = transition_document(db.crop_listings, listing_id_query(listing_id), lambda listing: update)
+                if success:
+                    print(f"[DB] Listing status updated: {listing_id} -> {new_status}")
                     return True
             except Exception as e:
                 print(f"[MONGODB ERROR] {e}")
@@ -1857,20 +2035,17 @@ def update_listing_status(listing_id, new_status):
             print(f"[ERROR] Listings file not found: {LISTINGS_FILE}")
             return False
         
-        with open(LISTINGS_FILE, 'r', encoding='utf-8') as f:
-            listings = json.load(f)
-        
         updated = False
-        for listing in listings:
-            if listing.get('_id') == listing_id:
-                listing['status'] = new_status
-                listing['updated_at'] = datetime.utcnow().isoformat()
-                updated = True
-                break
+        with edit_file(LISTINGS_FILE, is_dict=False) as listings:
+            for listing in listings:
+                if listing.get('_id') == listing_id:
+                    listing['status'] = new_status
+                    listing['updated_at'] = datetime.utcnow().isoformat()
+                    listing[VERSION_FIELD] = listing.get(VERSION_FIELD, 0) + 1
+                    updated = True
+                    break
         
         if updated:
-            with open(LISTINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(listings, f, indent=2, ensure_ascii=False)
             print(f"[FILE] Listing status updated: {listing_id} -> {new_status}")
             return True
         else:
@@ -1891,6 +2066,11 @@ def update_listing_status(listing_id, new_status):
 EQUIPMENT_LISTINGS_FILE = os.path.join(DATA_DIR, 'equipment_listings.json')
 EQUIPMENT_BASE_PRICES_FILE = os.path.join(DATA_DIR, 'equipment_base_prices.json')
 
+# Fields rendered by equipment_my_listings.html
+MY_EQUIPMENT_LISTING_FIELDS = ['equipment_name', 'description', 'district', 'state', 'owner_rent', 'status',
+                               'available_from', 'available_to', 'rental_from', 'rental_to', 'renter_name',
+                               'renter_phone', 'total_rent', 'created_at']
+
 def get_live_equipment_rent(equipment_name, district='', state=''):
     """
     Get live market rent for equipment
@@ -1970,21 +2150,12 @@ def create_equipment_listing(listing_data):
                 print(f"[MONGODB ERROR] {e}")
         
         # File-based fallback
-        if not os.path.exists(EQUIPMENT_LISTINGS_FILE):
-            with open(EQUIPMENT_LISTINGS_FILE, 'w') as f:
-                json.dump([], f)
-        
-        with open(EQUIPMENT_LISTINGS_FILE, 'r') as f:
-            listings = json.load(f)
-        
         # Generate unique ID
         import uuid
         listing_data['_id'] = str(uuid.uuid4())
         
-        listings.append(listing_data)
-        
-        with open(EQUIPMENT_LISTINGS_FILE, 'w') as f:
-            json.dump(listings, f, indent=2)
+        with edit_file(EQUIPMENT_LISTINGS_FILE, is_dict=False) as listings:
+            listings.append(listing_data)
         
         return listing_data['_id']
         
@@ -2046,12 +2217,7 @@ def get_available_equipment(equipment_name='', district='', state='', sort_by='r
             available.sort(key=lambda x: x.get('created_at', ''), reverse=True)
         
         # Enrich listings with owner details if missing
-        for listing in available:
-            if not listing.get('owner_name') or listing.get('owner_name') == 'Unknown':
-                owner = find_user_by_id(listing.get('owner_id'))
-                if owner:
-                    listing['owner_name'] = owner.get('name', 'Unknown')
-                    listing['owner_phone'] = owner.get('phone', '')
+        attach_user_contacts(available, 'owner_id', 'owner', only_missing=True)
         
         return available
         
@@ -2111,17 +2277,13 @@ def book_equipment_atomic(listing_id, booking_data):
     """
     try:
         # MongoDB Atlas - ATOMIC UPDATE
+        # Optimistic concurrency: only the booking whose check saw the current version wins
         if db is not None:
             try:
-                from bson.objectid import ObjectId
-                
-                # Atomic update: only update if status is 'available'
-                result = db.equipment_listings.update_one(
-                    {
-                        '_id': ObjectId(listing_id),
-                        'status': 'available'  # Critical: only update if still available
-                    },
-                    {
+                def book(listing):
+                    if listing.get('status') != 'available':
+                        return 'Equipment is no longer available'
+                    return {
                         '$set': {
                             'status': 'booked',
                             'renter_id': booking_data['renter_id'],
@@ -2132,41 +2294,37 @@ def book_equipment_atomic(listing_id, booking_data):
                             'booked_at': booking_data['booked_at']
                         }
                     }
-                )
                 
-                if result.modified_count > 0:
+                success, message = transition_document(db.equipment_listings, listing_id_query(listing_id), book)
+                if success:
                     return (True, 'Equipment booked successfully')
-                else:
-                    return (False, 'Equipment is no longer available')
+                if message:
+                    return (False, message)
                     
             except Exception as e:
                 print(f"[MONGODB ERROR] {e}")
         
-        # File-based fallback with simple locking
+        # File-based fallback (exclusive lock across workers, atomic replace)
         if not os.path.exists(EQUIPMENT_LISTINGS_FILE):
             return (False, 'Equipment not found')
         
-        with open(EQUIPMENT_LISTINGS_FILE, 'r') as f:
-            listings = json.load(f)
-        
-        for listing in listings:
-            if listing.get('_id') == listing_id:
-                if listing.get('status') != 'available':
-                    return (False, 'Equipment is no longer available')
-                
-                # Update listing
-                listing['status'] = 'booked'
-                listing['renter_id'] = booking_data['renter_id']
-                listing['renter_name'] = booking_data['renter_name']
-                listing['renter_phone'] = booking_data['renter_phone']
-                listing['from_date'] = booking_data['from_date']
-                listing['to_date'] = booking_data['to_date']
-                listing['booked_at'] = booking_data['booked_at']
-                
-                with open(EQUIPMENT_LISTINGS_FILE, 'w') as f:
-                    json.dump(listings, f, indent=2)
-                
-                return (True, 'Equipment booked successfully')
+        with edit_file(EQUIPMENT_LISTINGS_FILE, is_dict=False) as listings:
+            for listing in listings:
+                if listing.get('_id') == listing_id:
+                    if listing.get('status') != 'available':
+                        return (False, 'Equipment is no longer available')
+                    
+                    # Update listing
+                    listing['status'] = 'booked'
+                    listing['renter_id'] = booking_data['renter_id']
+                    listing['renter_name'] = booking_data['renter_name']
+                    listing['renter_phone'] = booking_data['renter_phone']
+                    listing['from_date'] = booking_data['from_date']
+                    listing['to_date'] = booking_data['to_date']
+                    listing['booked_at'] = booking_data['booked_at']
+                    listing[VERSION_FIELD] = listing.get(VERSION_FIELD, 0) + 1
+                    
+                    return (True, 'Equipment booked successfully')
         
         return (False, 'Equipment not found')
         
@@ -2189,7 +2347,8 @@ def complete_equipment_rental(listing_id):
                         '$set': {
                             'status': 'completed',
                             'completed_at': datetime.utcnow().isoformat()
-                        }
+                        },
+                        '$inc': {VERSION_FIELD: 1}
                     }
                 )
                 
@@ -2205,18 +2364,14 @@ def complete_equipment_rental(listing_id):
         if not os.path.exists(EQUIPMENT_LISTINGS_FILE):
             return (False, 'Equipment not found')
         
-        with open(EQUIPMENT_LISTINGS_FILE, 'r') as f:
-            listings = json.load(f)
-        
-        for listing in listings:
-            if listing.get('_id') == listing_id:
-                listing['status'] = 'completed'
-                listing['completed_at'] = datetime.utcnow().isoformat()
-                
-                with open(EQUIPMENT_LISTINGS_FILE, 'w') as f:
-                    json.dump(listings, f, indent=2)
-                
-                return (True, 'Rental completed successfully')
+        with edit_file(EQUIPMENT_LISTINGS_FILE, is_dict=False) as listings:
+            for listing in listings:
+                if listing.get('_id') == listing_id:
+                    listing['status'] = 'completed'
+                    listing['completed_at'] = datetime.utcnow().isoformat()
+                    listing[VERSION_FIELD] = listing.get(VERSION_FIELD, 0) + 1
+                    
+                    return (True, 'Rental completed successfully')
         
         return (False, 'Equipment not found')
         
@@ -2231,7 +2386,7 @@ def get_user_equipment_listings(user_id):
         # MongoDB Atlas
         if db is not None:
             try:
-                listings = list(db.equipment_listings.find({'owner_id': user_id}).sort('created_at', -1))
+                listings = list(db.equipment_listings.find({'owner_id': user_id}, MY_EQUIPMENT_LISTING_FIELDS).sort('created_at', -1))
                 for listing in listings:
                     listing['_id'] = str(listing['_id'])
                 return listings
@@ -2259,20 +2414,13 @@ def confirm_equipment_rental(listing_id, rental_data):
     """Confirm equipment rental and update listing status atomically"""
     try:
         # MongoDB Atlas - ATOMIC UPDATE
+        # Optimistic concurrency: only the renter whose check saw the current version wins
         if db is not None:
             try:
-                from bson.objectid import ObjectId
-                
-                # Atomic update: only update if status is still 'available'
-                # This prevents double-booking
-                try:
-                    obj_id = ObjectId(listing_id)
-                except:
-                    obj_id = listing_id
-                
-                result = db.equipment_listings.find_one_and_update(
-                    {'_id': obj_id, 'status': 'available'},  # Only if still available
-                    {
+                def rent(listing):
+                    if listing.get('status') != 'available':
+                        return "This equipment is no longer available"
+                    return {
                         '$set': {
                             'status': 'booked',
                             'renter_id': rental_data['renter_id'],
@@ -2284,73 +2432,44 @@ def confirm_equipment_rental(listing_id, rental_data):
                             'total_rent': rental_data['total_rent'],
                             'booked_at': rental_data['booked_at']
                         }
-                    },
-                    return_document=True
-                )
+                    }
                 
-                if result:
-                    print(f"[MONGODB] Rental confirmed for listing: {listing_id}")
+                success, message = transition_document(db.equipment_listings, listing_id_query(listing_id), rent)
+                if success:
+                    print(f"[DB] Rental confirmed for listing: {listing_id}")
                     return True, "Rental confirmed successfully"
-                else:
-                    return False, "This equipment is no longer available"
+                if message:
+                    return False, message
                     
             except Exception as e:
                 print(f"[MONGODB ERROR] {e}")
         
-        # File-based fallback (with lock to prevent race condition)
-        try:
-            import fcntl
-            use_fcntl = True
-        except ImportError:
-            # Windows doesn't support fcntl
-            use_fcntl = False
-        
+        # File-based fallback (exclusive lock across workers, atomic replace)
         if not os.path.exists(EQUIPMENT_LISTINGS_FILE):
             return False, "Listing not found"
         
-        with open(EQUIPMENT_LISTINGS_FILE, 'r+') as f:
-            # Lock file to prevent concurrent access (Unix/Linux only)
-            if use_fcntl:
-                try:
-                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-                except:
-                    pass
+        with edit_file(EQUIPMENT_LISTINGS_FILE, is_dict=False) as listings:
+            # Find listing and check if still available
+            for listing in listings:
+                if listing.get('_id') == listing_id:
+                    if listing.get('status') != 'available':
+                        return False, "This equipment is no longer available"
+                    
+                    # Update status
+                    listing['status'] = 'booked'
+                    listing['renter_id'] = rental_data['renter_id']
+                    listing['renter_name'] = rental_data['renter_name']
+                    listing['renter_phone'] = rental_data['renter_phone']
+                    listing['rental_from'] = rental_data['rental_from']
+                    listing['rental_to'] = rental_data['rental_to']
+                    listing['rental_days'] = rental_data['rental_days']
+                    listing['total_rent'] = rental_data['total_rent']
+                    listing['booked_at'] = rental_data['booked_at']
+                    listing[VERSION_FIELD] = listing.get(VERSION_FIELD, 0) + 1
+                    
+                    return True, "Rental confirmed successfully"
             
-            try:
-                listings = json.load(f)
-                
-                # Find listing and check if still available
-                for listing in listings:
-                    if listing.get('_id') == listing_id:
-                        if listing.get('status') != 'available':
-                            return False, "This equipment is no longer available"
-                        
-                        # Update status
-                        listing['status'] = 'booked'
-                        listing['renter_id'] = rental_data['renter_id']
-                        listing['renter_name'] = rental_data['renter_name']
-                        listing['renter_phone'] = rental_data['renter_phone']
-                        listing['rental_from'] = rental_data['rental_from']
-                        listing['rental_to'] = rental_data['rental_to']
-                        listing['rental_days'] = rental_data['rental_days']
-                        listing['total_rent'] = rental_data['total_rent']
-                        listing['booked_at'] = rental_data['booked_at']
-                        
-                        # Write back
-                        f.seek(0)
-                        f.truncate()
-                        json.dump(listings, f, indent=4)
-                        
-                        return True, "Rental confirmed successfully"
-                
-                return False, "Listing not found"
-                
-            finally:
-                if use_fcntl:
-                    try:
-                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-                    except:
-                        pass
+            return False, "Listing not found"
         
     except Exception as e:
         print(f"Error confirming rental: {e}")
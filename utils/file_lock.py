@@ -0,0 +1,154 @@
+"""
+Cross-process reader/writer locks and atomic replacement for the data/*.json files.
+
+    with file_lock(path):                   # shared: many readers at once
+        data = json.load(open(path))
+    with file_lock(path, exclusive=True):   # exclusive: one writer, no readers
+        data = json.load(open(path))
+        ...
+        write_atomic(path, payload)
+
+Locks are fcntl.flock() locks on a sidecar <file>.lock, because the data file
+itself is swapped out by os.replace() on every write. Within one process
+threads take turns on a path's lock, and it is re-entrant (an exclusive
+request inside a shared section upgrades it). thread_lock(path) is that
+in-process part alone, for sections that only need to keep this process's
+threads apart. Where fcntl is not available (Windows) only the in-process part applies.
+
+hold_lease(path) is a lock for the lifetime of the process instead of a
+section: the first process to ask gets it (and keeps it until it exits, when
+the OS releases it), every other process gets False without waiting. The
+market scheduler uses it to run its jobs in one worker only.
+
+The first 8 bytes of the lock file hold a write generation that
+write_atomic() increments. It is part of the cache signature in utils/db.py:
+two quick writes of the same size can otherwise end up with identical
+(mtime, size, inode) when the filesystem reuses the freed inode.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows doesn't support fcntl
+    fcntl = None
+
+LOCK_SUFFIX = '.lock'
+LEASE_SUFFIX = '.lease'
+
+
+class _PathLock:
+    def __init__(self, path):
+        self.path = path
+        self.mutex = threading.RLock()
+        self.fd = os.open(path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+        self.depth = 0
+        self.exclusive = False
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+_leases = {}
+
+
+def _reset_after_fork():
+    # Inherited descriptors share lock state with the parent; start over in the child
+    global _locks, _locks_guard
+    _locks = {}
+    _locks_guard = threading.Lock()
+    # A lease belongs to the process that took it, not to its children
+    for fd in _leases.values():
+        os.close(fd)
+    _leases.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _path_lock(path):
+    path = os.path.abspath(path)
+    lock = _locks.get(path)
+    if lock is None:
+        with _locks_guard:
+            lock = _locks.get(path)
+            if lock is None:
+                lock = _locks[path] = _PathLock(path)
+    return lock
+
+
+def thread_lock(path):
+    """The re-entrant in-process lock file_lock(path) holds, without the cross-process flock"""
+    return _path_lock(path).mutex
+
+
+@contextmanager
+def file_lock(path, exclusive=False):
+    """Hold a shared (default) or exclusive lock on path across processes"""
+    lock = _path_lock(path)
+    with lock.mutex:
+        was_exclusive = lock.exclusive
+        if fcntl is not None and (lock.depth == 0 or (exclusive and not was_exclusive)):
+            fcntl.flock(lock.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        lock.exclusive = was_exclusive or exclusive
+        lock.depth += 1
+        try:
+            yield
+        finally:
+            lock.depth -= 1
+            if fcntl is not None:
+                if lock.depth == 0:
+                    fcntl.flock(lock.fd, fcntl.LOCK_UN)
+                elif lock.exclusive and not was_exclusive:
+                    # Back to the shared lock the enclosing section asked for
+                    fcntl.flock(lock.fd, fcntl.LOCK_SH)
+            lock.exclusive = was_exclusive if lock.depth else False
+
+
+def hold_lease(path):
+    """True if this process holds (or just took) the lease on path, False if another process does"""
+    path = os.path.abspath(path)
+    with _locks_guard:
+        if path in _leases:
+            return True
+        fd = os.open(path + LEASE_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+        # Owner's pid, for whoever wonders which worker runs the jobs
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, f"{os.getpid()}\n".encode(), 0)
+        _leases[path] = fd
+        return True
+
+
+def generation(path):
+    """Number of write_atomic() calls made on path, by any process"""
+    raw = os.pread(_path_lock(path).fd, 8, 0)
+    return int.from_bytes(raw, 'little') if len(raw) == 8 else 0
+
+
+def write_atomic(path, payload, bump=True):
+    """
+    Replace path with payload (bytes) via a temp file + fsync + os.replace, so
+    readers see either the old or the new file, never a partial one. Call it
+    while holding the exclusive lock when bump=True.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if bump:
+        os.pwrite(_path_lock(path).fd, (generation(path) + 1).to_bytes(8, 'little'), 0)
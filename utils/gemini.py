@@ -0,0 +1,33 @@
+"""
+Gemini client, imported and configured on first use.
+
+google.generativeai (with the gRPC and protobuf modules behind it) takes
+about a second to import, and four controllers used to import and configure
+it at import time. generative_model() does both once, the first time a
+route actually calls the API:
+
+    response = generative_model().generate_content(prompt)
+"""
+import os
+import threading
+
+GEMINI_MODEL = 'gemma-3-4b-it'
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def _configured_genai():
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.environ.get('GEMINI_API_KEY', 'YOUR_GEMINI_API_KEY_HERE'))
+                _genai = genai
+    return _genai
+
+
+def generative_model(name=GEMINI_MODEL):
+    """A google.generativeai GenerativeModel, configured with GEMINI_API_KEY"""
+    return _configured_genai().GenerativeModel(name)
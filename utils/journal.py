@@ -0,0 +1,203 @@
+"""
+Append-only journal for the file-backed MockCollection.
+
+When journal mode is enabled (MOCK_DB_JOURNAL=1) a collection such as
+data/otps.json keeps its JSON file as a snapshot and appends every mutation as
+one JSON line to data/otps.json.journal instead of rewriting the whole file.
+
+Journal layout:
+    {"snapshot": [mtime_ns, size, inode, gen]}     <- header, first line
+    {"op": "set", "key": <email or index>, "doc": {...}}
+    {"op": "del", "key": <email or index>}
+
+Keys are dict keys for dict collections (users) and list positions for list
+collections. Operations are replayed strictly in order, so positions are the
+ones that were valid when the operation was written. A line cut short by a
+crash is truncated before the next append.
+
+The header records the snapshot the journal applies to. If the snapshot is
+replaced by anything other than compaction, the journal no longer describes it;
+it is set aside as <name>.journal.orphaned-<timestamp> instead of being
+replayed onto the wrong base.
+"""
+import json
+import os
+import threading
+import time
+
+from utils.file_lock import write_atomic
+
+JOURNAL_SUFFIX = '.journal'
+
+# Fold the journal into the snapshot after this many operations or bytes
+JOURNAL_MAX_OPS = int(os.getenv('MOCK_DB_JOURNAL_MAX_OPS', '500'))
+JOURNAL_MAX_BYTES = int(os.getenv('MOCK_DB_JOURNAL_MAX_BYTES', str(1024 * 1024)))
+
+# Operations written since the last compaction, per journal file
+_op_counts = {}
+_compacting = set()
+_compacting_lock = threading.Lock()
+
+
+def journal_path(file_path):
+    return file_path + JOURNAL_SUFFIX
+
+
+def _encode(record):
+    return (json.dumps(record, default=str, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def start_journal(file_path, snapshot_signature):
+    """Create an empty journal bound to the given snapshot; returns the replay offset"""
+    header = _encode({'snapshot': list(snapshot_signature)})
+    write_atomic(journal_path(file_path), header, bump=False)
+    _op_counts[journal_path(file_path)] = 0
+    return len(header)
+
+
+def _set_aside(path, reason):
+    orphan = f"{path}.orphaned-{int(time.time())}"
+    os.replace(path, orphan)
+    print(f"[MOCK DB WARNING] {reason}; journal moved to {orphan}")
+
+
+def _read_records(path, offset):
+    """
+    Read complete JSON lines from offset; returns (records, end_offset).
+    An unterminated final line is left alone here: it is either a record still
+    being written or a crash leftover that the next append truncates.
+    """
+    records = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        chunk = f.read()
+    good = offset
+    for line in chunk.split(b'\n')[:-1]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            print(f"[MOCK DB ERROR] Corrupt record at byte {good} of {path}; replay stopped there")
+            break
+        good += len(line) + 1
+    return records, good
+
+
+def _truncate_torn_tail(f):
+    """Cut a partially written last line left behind by a crash mid-append"""
+    size = f.seek(0, os.SEEK_END)
+    if size == 0:
+        return
+    f.seek(size - 1)
+    if f.read(1) == b'\n':
+        return
+    pos = size
+    while pos > 0:
+        step = min(4096, pos)
+        pos -= step
+        f.seek(pos)
+        newline = f.read(step).rfind(b'\n')
+        if newline != -1:
+            pos += newline + 1
+            break
+    f.truncate(pos)
+    print(f"[MOCK DB WARNING] Truncated partially written record at end of {f.name}")
+
+
+def apply_op(data, op, is_dict):
+    """Apply one journal operation to the in-memory collection"""
+    key = op['key']
+    if op['op'] == 'set':
+        if not is_dict and key == len(data):
+            data.append(op['doc'])
+        else:
+            data[key] = op['doc']
+    elif op['op'] == 'del':
+        if is_dict:
+            data.pop(key, None)
+        else:
+            del data[key]
+
+
+def replay(file_path, data, snapshot_signature, offset, is_dict):
+    """
+    Bring `data` up to date with the journal.
+
+    `offset` is where the previous replay of this snapshot stopped, or None when
+    `data` was just read from the snapshot. Returns the new offset, or None if
+    the journal was reset underneath a cached copy and the caller must re-read
+    the snapshot.
+    """
+    path = journal_path(file_path)
+    if not os.path.exists(path):
+        return start_journal(file_path, snapshot_signature)
+
+    if offset is None:
+        records, end = _read_records(path, 0)
+        header = records[0] if records else {}
+        if header.get('snapshot') != list(snapshot_signature):
+            if len(records) > 1:
+                _set_aside(path, f"{os.path.basename(file_path)} changed outside the journal "
+                                 f"({len(records) - 1} pending operations not replayed)")
+            return start_journal(file_path, snapshot_signature)
+        ops = records[1:]
+        _op_counts[path] = len(ops)
+    else:
+        if os.path.getsize(path) < offset:
+            return None
+        ops, end = _read_records(path, offset)
+        _op_counts[path] = _op_counts.get(path, 0) + len(ops)
+
+    for op in ops:
+        apply_op(data, op, is_dict)
+    return end
+
+
+def append_ops(file_path, ops):
+    """Append operations with a single write; returns the new end offset"""
+    path = journal_path(file_path)
+    with open(path, 'rb+') as f:
+        _truncate_torn_tail(f)
+        f.seek(0, os.SEEK_END)
+        f.write(b''.join(_encode(op) for op in ops))
+        f.flush()
+        end = f.tell()
+    _op_counts[path] = _op_counts.get(path, 0) + len(ops)
+    return end
+
+
+def needs_compaction(file_path, offset):
+    path = journal_path(file_path)
+    return _op_counts.get(path, 0) >= JOURNAL_MAX_OPS or offset >= JOURNAL_MAX_BYTES
+
+
+def compact(file_path, snapshot_bytes, signature_of):
+    """
+    Fold the journal into a new snapshot.
+
+    The snapshot is replaced first and the journal second, so a crash in between
+    leaves a journal whose header no longer matches; replay then discards it,
+    which is correct because the new snapshot already holds every operation.
+    Returns (snapshot_signature, journal_offset) for the caller's cache.
+    """
+    write_atomic(file_path, snapshot_bytes)
+    signature = signature_of(file_path)
+    return signature, start_journal(file_path, signature)
+
+
+def schedule_compaction(file_path, run):
+    """Run `run()` on a background thread unless a compaction of this file is already pending"""
+    with _compacting_lock:
+        if file_path in _compacting:
+            return
+        _compacting.add(file_path)
+
+    def worker():
+        try:
+            run()
+        except Exception as e:
+            print(f"[MOCK DB ERROR] Journal compaction failed for {file_path}: {e}")
+        finally:
+            with _compacting_lock:
+                _compacting.discard(file_path)
+
+    threading.Thread(target=worker, name=f"journal-compact-{os.path.basename(file_path)}", daemon=True).start()
@@ -0,0 +1,221 @@
+"""
+MarketGeoIndex: radius queries over the mandis of one market snapshot.
+
+/api/nearby-mandis used to walk every market record per request, look up its
+district in district_coordinates.json (or scan the state's city names for one
+contained in the market name) and call a scalar haversine for each. The index
+resolves every (state, district, market) of a snapshot to coordinates once,
+buckets the located markets into a lat/lon grid and answers
+
+    geo = get_geo_index()
+    positions, distances = geo.within(12.97, 77.59, radius_km=50)
+    nearest = geo.nearest(12.97, 77.59, radius_km=50, limit=15)
+
+by computing distances only for the markets in the grid cells the radius
+overlaps. Every state partition has its own grid; get_geo_index() grids only
+the partitions the price index has not seen before (all of them when the
+coordinates file changes) and queries them together as a PartitionedGeoIndex.
+"""
+import json
+import os
+import threading
+from math import cos, floor, radians
+
+import numpy as np
+
+from utils.market_price_index import get_price_index
+from utils.market_snapshot import DATA_DIR
+from utils.warmup import register
+
+DISTRICT_COORDS_FILE = os.path.join(DATA_DIR, 'district_coordinates.json')
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+# Grid cell size in degrees of latitude and longitude (about 55 km north-south)
+GRID_CELL_DEGREES = 0.5
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; any argument may be a numpy array"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def load_district_coordinates():
+    """{state: {district or city: {'lat': ..., 'lon': ...}}} from district_coordinates.json"""
+    try:
+        with open(DISTRICT_COORDS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[ERROR] Failed to load district coordinates: {e}")
+        return {}
+
+
+def resolve_coordinates(district_coords, state, district, market):
+    """Coordinates of the district, else of the first city of the state named in the market, else None"""
+    places = district_coords.get(state)
+    if not places:
+        return None
+    if district in places:
+        return places[district]
+    market = market.lower()
+    for city_name, coords in places.items():
+        if city_name.lower() in market:
+            return coords
+    return None
+
+
+class _NearestQueries:
+    """nearest() on top of a within() that returns record positions of self.snapshot"""
+
+    def nearest(self, lat, lon, radius_km, limit=15):
+        """
+        ([(record position, distance)] of the limit nearest priced records within
+        radius_km, total within radius_km). Distances are compared at the 0.1 km
+        they are reported with, ties in file order.
+        """
+        positions, distances = self.within(lat, lon, radius_km)
+        total = len(positions)
+        # One sortable integer per record: distance in tenths of a km, then file position
+        keys = np.round(distances, 1) * 10
+        keys = keys.astype(np.int64) * self.snapshot.count + positions
+        if total > limit:
+            keep = np.argpartition(keys, limit - 1)[:limit]
+            positions, distances, keys = positions[keep], distances[keep], keys[keep]
+        order = np.argsort(keys)
+        return list(zip(positions[order].tolist(), distances[order].tolist())), total
+
+
+class MarketGeoIndex(_NearestQueries):
+    """Grid of the located markets of a snapshot and the priced records at each"""
+
+    def __init__(self, snapshot, district_coords):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        codes, vocab = snapshot.codes, snapshot.vocab
+        sizes = [len(vocab['district']), len(vocab['market'])]
+        key = (codes['state'].astype(np.int64) * sizes[0] + codes['district']) * sizes[1] + codes['market']
+        places, place_of_record = np.unique(key, return_inverse=True)
+
+        # Resolve each (state, district, market) once instead of once per record
+        lat = np.full(len(places), np.nan)
+        lon = np.full(len(places), np.nan)
+        for place, composite in enumerate(places.tolist()):
+            rest, market = divmod(composite, sizes[1])
+            state, district = divmod(rest, sizes[0])
+            coords = resolve_coordinates(district_coords, vocab['state'][state], vocab['district'][district],
+                                         vocab['market'][market])
+            if coords:
+                lat[place], lon[place] = coords['lat'], coords['lon']
+        self.lat, self.lon = lat, lon
+
+        # Records with a price at a located market, grouped by market in file order
+        located = ~np.isnan(lat)[place_of_record] & (np.asarray(snapshot.prices['modal_price']) != 0)
+        positions = np.flatnonzero(located)
+        order = np.argsort(place_of_record[positions], kind='stable')
+        self.positions = positions[order]
+        self.bounds = np.searchsorted(place_of_record[positions][order], np.arange(len(places) + 1))
+
+        cells = {}
+        for place in np.flatnonzero(np.diff(self.bounds)).tolist():
+            cell = (floor(lat[place] / GRID_CELL_DEGREES), floor(lon[place] / GRID_CELL_DEGREES))
+            cells.setdefault(cell, []).append(place)
+        self.cells = {cell: np.array(members) for cell, members in cells.items()}
+        self.markets = sum(len(members) for members in cells.values())
+
+    def _candidates(self, lat, lon, radius_km):
+        # Markets in the grid cells overlapped by the bounding box of the radius
+        dlat = radius_km / KM_PER_DEGREE
+        # A degree of longitude shrinks towards the poles; use the widest box the radius needs
+        widest = min(89.0, abs(lat) + dlat)
+        dlon = min(180.0, dlat / cos(radians(widest)))
+        rows = range(floor((lat - dlat) / GRID_CELL_DEGREES), floor((lat + dlat) / GRID_CELL_DEGREES) + 1)
+        cols = range(floor((lon - dlon) / GRID_CELL_DEGREES), floor((lon + dlon) / GRID_CELL_DEGREES) + 1)
+        if len(rows) * len(cols) > len(self.cells):
+            hits = list(self.cells.values())
+        else:
+            hits = [self.cells[cell] for cell in ((row, col) for row in rows for col in cols) if cell in self.cells]
+        return np.concatenate(hits) if hits else np.zeros(0, dtype=np.int64)
+
+    def within(self, lat, lon, radius_km):
+        """(record positions, distances in km) of the priced records at markets within radius_km"""
+        places = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lat[places], self.lon[places])
+        inside = distances <= radius_km
+        places, distances = places[inside], distances[inside]
+        starts, ends = self.bounds[places], self.bounds[places + 1]
+        if not len(places):
+            return self.positions[:0], distances
+        positions = np.concatenate([self.positions[s:e] for s, e in zip(starts.tolist(), ends.tolist())])
+        return positions, np.repeat(distances, ends - starts)
+
+
+class PartitionedGeoIndex(_NearestQueries):
+    """Radius queries over the MarketGeoIndex of every partition of a PartitionedSnapshot"""
+
+    def __init__(self, snapshot, indexes):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.indexes = indexes
+        self.markets = sum(index.markets for index in indexes)
+        self.located = sum(len(index.positions) for index in indexes)
+
+    def within(self, lat, lon, radius_km):
+        """(record positions, distances in km) of the priced records at markets within radius_km"""
+        positions, distances = [], []
+        for offset, index in zip(self.snapshot.offsets.tolist(), self.indexes):
+            part_positions, part_distances = index.within(lat, lon, radius_km)
+            if len(part_positions):
+                positions.append(part_positions + offset)
+                distances.append(part_distances)
+        if not positions:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(positions), np.concatenate(distances)
+
+
+_geo_index = None
+_geo_key = None
+_geo_lock = threading.Lock()
+# MarketGeoIndex of each state partition by (path, coordinates file mtime)
+_part_geo_indexes = {}
+
+
+def get_geo_index():
+    """PartitionedGeoIndex of the current market data, or None if there is none yet"""
+    global _geo_index, _geo_key, _part_geo_indexes
+    price_index = get_price_index()
+    if price_index is None:
+        return None
+    try:
+        coords_mtime = os.stat(DISTRICT_COORDS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        coords_mtime = None
+    key = (price_index.version, coords_mtime)
+    if _geo_key == key:
+        return _geo_index
+    with _geo_lock:
+        if _geo_key != key:
+            snapshot = price_index.snapshot
+            district_coords = None
+            indexes = {}
+            for path, part in zip(snapshot.paths, snapshot.parts):
+                index = _part_geo_indexes.get((path, coords_mtime))
+                if index is None:
+                    if district_coords is None:
+                        district_coords = load_district_coordinates()
+                    index = MarketGeoIndex(part, district_coords)
+                indexes[(path, coords_mtime)] = index
+            built = sum(1 for part_key in indexes if part_key not in _part_geo_indexes)
+            _part_geo_indexes = indexes
+            _geo_index = PartitionedGeoIndex(snapshot, list(indexes.values()))
+            _geo_key = key
+            print(f"[INFO] Market geo index built for version {price_index.version}: "
+                  f"{_geo_index.markets} located markets, {_geo_index.located} records, "
+                  f"{built} of {len(indexes)} state partition(s) gridded")
+        return _geo_index
+
+
+# The price index and the geo index on top of it; None until the scheduler wrote a snapshot
+register('market_indexes', get_geo_index)
@@ -0,0 +1,293 @@
+"""
+Append-only, date-partitioned history of the daily market prices.
+
+Every market refresh replaces the current snapshot partitions, so nothing
+older than today survived. append_history() adds each
+day's prices as a partition under data/market_history/:
+
+    <partition>/commodity.npy, state.npy, district.npy   integer codes, rows sorted by commodity
+    <partition>/min_price.npy, max_price.npy, modal_price.npy   int32 prices (per quintal)
+    <partition>/days.npy                                  days of data averaged into each row
+    <partition>/meta.json                                 date, span in days, vocabularies
+    PARTITIONS                                            the live partitions, replaced atomically
+
+Daily partitions older than MARKET_HISTORY_DAILY_DAYS are merged into one
+partition of weekly means per week, and partitions older than
+MARKET_HISTORY_DAYS are dropped.
+
+    history = get_history()
+    history.trend('Tomato', state='Kerala', days=30)   # [{'date', 'modal_price', 'min_price', 'max_price'}, ...]
+"""
+import json
+import os
+import shutil
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from utils.file_lock import file_lock, generation, write_atomic
+from utils.market_snapshot import DATA_DIR
+
+HISTORY_DIR = os.path.join(DATA_DIR, 'market_history')
+MANIFEST_FILE = os.path.join(HISTORY_DIR, 'PARTITIONS')
+# Days kept at daily resolution, and days kept at all
+HISTORY_DAILY_DAYS = int(os.getenv('MARKET_HISTORY_DAILY_DAYS', '90'))
+HISTORY_DAYS = int(os.getenv('MARKET_HISTORY_DAYS', '400'))
+KEY_FIELDS = ('commodity', 'state', 'district')
+VALUE_FIELDS = ('min_price', 'max_price', 'modal_price')
+
+
+def _end(entry):
+    return date.fromisoformat(entry['date']) + timedelta(days=entry['days'] - 1)
+
+
+class HistoryPartition:
+    """One memory-mapped partition: prices per (commodity, state, district) for a day or a week"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.date = meta['date']
+        self.days = meta['days']
+        self.vocab = meta['vocab']
+        self.codes = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode='r') for field in KEY_FIELDS}
+        self.values = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode='r')
+                       for field in VALUE_FIELDS + ('days',)}
+        self._code_of = {field: {value: code for code, value in enumerate(values)}
+                         for field, values in self.vocab.items()}
+        # Rows of commodity code c are offsets[c]:offsets[c + 1]
+        self.offsets = np.searchsorted(self.codes['commodity'], np.arange(len(self.vocab['commodity']) + 1))
+
+    def region_rows(self, state=None, district=None):
+        """Boolean mask of the rows in a state/district (all rows when neither is given), None if unknown"""
+        mask = np.ones(len(self.values['days']), dtype=bool)
+        for field, value in (('state', state), ('district', district)):
+            if value is not None:
+                code = self._code_of[field].get(value)
+                if code is None:
+                    return None
+                mask &= self.codes[field] == code
+        return mask
+
+    def aggregate(self, commodity, state=None, district=None):
+        """(rows, sum of min, max and modal prices) of the matching rows, or None if there are none"""
+        code = self._code_of['commodity'].get(commodity)
+        if code is None:
+            return None
+        rows = slice(self.offsets[code], self.offsets[code + 1])
+        mask = np.ones(rows.stop - rows.start, dtype=bool)
+        for field, value in (('state', state), ('district', district)):
+            if value is not None:
+                field_code = self._code_of[field].get(value)
+                if field_code is None:
+                    return None
+                mask &= self.codes[field][rows] == field_code
+        count = int(mask.sum())
+        if not count:
+            return None
+        return (count,) + tuple(int(self.values[field][rows][mask].sum(dtype=np.int64)) for field in VALUE_FIELDS)
+
+
+class MarketHistory:
+    """The partitions listed in one version of the manifest"""
+
+    def __init__(self, entries, partitions):
+        self.entries = entries
+        self.partitions = partitions
+        # Partition names never repeat, so they identify the history's contents
+        self.version = tuple(entry['name'] for entry in entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def dates(self):
+        return [entry['date'] for entry in self.entries]
+
+    def _window(self, days):
+        # Entries overlapping the last days days of history, oldest first
+        if not self.entries:
+            return []
+        cutoff = max(_end(entry) for entry in self.entries) - timedelta(days=days - 1)
+        return [entry for entry in self.entries if _end(entry) >= cutoff]
+
+    def trend(self, commodity, state=None, district=None, days=7):
+        """
+        Average min/max/modal price per partition over the last days days of
+        history (daily points, weekly ones for downsampled weeks), oldest first
+        """
+        points, sums = [], []
+        for entry in self._window(days):
+            result = self.partitions[entry['name']].aggregate(commodity, state, district)
+            if result is not None:
+                points.append(entry['date'])
+                sums.append(result)
+        if not sums:
+            return []
+        sums = np.array(sums, dtype=np.float64)
+        means = (sums[:, 1:] / sums[:, :1]).astype(np.int64).tolist()
+        return [{'date': day, 'modal_price': modal, 'min_price': low, 'max_price': high}
+                for day, (low, high, modal) in zip(points, means)]
+
+    def region_matrix(self, state=None, district=None, days=7):
+        """
+        (dates, commodity names, sums, counts) over the last days days of history:
+        sums[c, d] is the summed modal price of commodity c in the region on
+        dates[d] and counts[c, d] the number of rows summed
+        """
+        entries = self._window(days)
+        partitions = [self.partitions[entry['name']] for entry in entries]
+        names = sorted(set().union(*(partition.vocab['commodity'] for partition in partitions)))
+        index = {name: i for i, name in enumerate(names)}
+        sums = np.zeros((len(names), len(entries)))
+        counts = np.zeros((len(names), len(entries)))
+        for column, partition in enumerate(partitions):
+            rows = partition.region_rows(state, district)
+            if rows is None:
+                continue
+            remap = np.array([index[name] for name in partition.vocab['commodity']], dtype=np.int64)
+            commodity = remap[partition.codes['commodity'][rows]]
+            counts[:, column] = np.bincount(commodity, minlength=len(names))
+            sums[:, column] = np.bincount(commodity, weights=partition.values['modal_price'][rows], minlength=len(names))
+        return [entry['date'] for entry in entries], names, sums, counts
+
+
+def _read_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _write_partition(day, days, codes, values, vocab):
+    # New directory per write; the manifest decides which partitions are live
+    name = f"{day}-{days}d-{datetime.now().strftime('%H%M%S%f')}"
+    tmp_dir = os.path.join(HISTORY_DIR, f".tmp-{name}-{os.getpid()}")
+    os.makedirs(tmp_dir)
+    try:
+        for field, column in {**codes, **values}.items():
+            np.save(os.path.join(tmp_dir, f"{field}.npy"), column)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'date': str(day), 'days': days, 'count': len(values['modal_price']),
+                       'vocab': {field: list(vocab[field]) for field in KEY_FIELDS}}, f, ensure_ascii=False)
+        os.replace(tmp_dir, os.path.join(HISTORY_DIR, name))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return {'name': name, 'date': str(day), 'days': days}
+
+
+def _merge_week(monday, partitions):
+    # Weighted mean per (commodity, state, district) over every day in the partitions
+    vocab = {field: sorted(set().union(*(p.vocab[field] for p in partitions))) for field in KEY_FIELDS}
+    sizes = [len(vocab[field]) for field in KEY_FIELDS]
+    keys, weights, sums = [], [], {field: [] for field in VALUE_FIELDS}
+    for partition in partitions:
+        key = np.zeros(len(partition.values['days']), dtype=np.int64)
+        for field, size in zip(KEY_FIELDS, sizes):
+            index = {name: code for code, name in enumerate(vocab[field])}
+            remap = np.array([index[name] for name in partition.vocab[field]], dtype=np.int64)
+            key = key * size + remap[partition.codes[field]]
+        keys.append(key)
+        weight = np.asarray(partition.values['days'], dtype=np.float64)
+        weights.append(weight)
+        for field in VALUE_FIELDS:
+            sums[field].append(weight * partition.values[field])
+    unique, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    total_weight = np.bincount(inverse, weights=np.concatenate(weights))
+    values = {field: np.rint(np.bincount(inverse, weights=np.concatenate(sums[field])) / total_weight)
+              .astype(np.int32) for field in VALUE_FIELDS}
+    values['days'] = total_weight.astype(np.int16)
+    codes = {}
+    for field, size in reversed(list(zip(KEY_FIELDS, sizes))):
+        unique, codes[field] = np.divmod(unique, size)
+        codes[field] = codes[field].astype(np.uint16 if size <= 65536 else np.int32)
+    # Keys were sorted commodity-major, so the rows already are too
+    return _write_partition(monday, 7, codes, values, vocab)
+
+
+def _compact(entries, today):
+    """(live entries, entries to delete) after downsampling old days and applying retention"""
+    keep_after = today - timedelta(days=HISTORY_DAYS)
+    daily_after = today - timedelta(days=HISTORY_DAILY_DAYS)
+    removed = [entry for entry in entries if _end(entry) <= keep_after]
+    entries = [entry for entry in entries if _end(entry) > keep_after]
+
+    weeks = {}
+    for entry in entries:
+        day = date.fromisoformat(entry['date'])
+        if entry['days'] == 1 and day <= daily_after:
+            weeks.setdefault(day - timedelta(days=day.weekday()), []).append(entry)
+    for monday, group in weeks.items():
+        group += [entry for entry in entries if entry['days'] == 7 and entry['date'] == str(monday)]
+        merged = _merge_week(monday, [HistoryPartition(os.path.join(HISTORY_DIR, e['name'])) for e in group])
+        entries = [entry for entry in entries if entry not in group] + [merged]
+        removed += group
+    return entries, removed
+
+
+def append_history(prices, codes, vocab, day=None):
+    """Add one day of encoded market columns (see encode_columns) to the history, replacing that day if present"""
+    day = day or date.today()
+    order = np.lexsort([codes['district'], codes['state'], codes['commodity']])
+    rows = {field: np.asarray(codes[field])[order] for field in KEY_FIELDS}
+    values = {field: np.asarray(prices[field], dtype=np.int32)[order] for field in VALUE_FIELDS}
+    values['days'] = np.ones(len(order), dtype=np.int16)
+
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    with file_lock(MANIFEST_FILE, exclusive=True):
+        entries = _read_manifest()
+        replaced = [entry for entry in entries if entry['date'] == str(day) and entry['days'] == 1]
+        entries = [entry for entry in entries if entry not in replaced]
+        entries.append(_write_partition(day, 1, rows, values, vocab))
+        entries, removed = _compact(entries, day)
+        entries.sort(key=lambda entry: entry['date'])
+        write_atomic(MANIFEST_FILE, json.dumps(entries, indent=1).encode())
+    # Readers that still map the old files keep them until they move on
+    for entry in replaced + removed:
+        shutil.rmtree(os.path.join(HISTORY_DIR, entry['name']), ignore_errors=True)
+    print(f"[INFO] Market history: added {day}, {len(entries)} partitions kept")
+    return entries
+
+
+def has_partition(day):
+    """Whether the history already holds the given day at daily resolution"""
+    return any(entry['date'] == str(day) and entry['days'] == 1 for entry in _read_manifest())
+
+
+_history = None
+_history_signature = None
+_history_lock = threading.Lock()
+_partitions = {}
+
+
+def get_history():
+    """MarketHistory of the current manifest (empty if nothing was recorded yet)"""
+    global _history, _history_signature
+    try:
+        stat = os.stat(MANIFEST_FILE)
+    except FileNotFoundError:
+        return MarketHistory([], {})
+    signature = (generation(MANIFEST_FILE), stat.st_mtime_ns, stat.st_ino)
+    if signature == _history_signature:
+        return _history
+    with _history_lock:
+        if signature != _history_signature:
+            with file_lock(MANIFEST_FILE):
+                entries = _read_manifest()
+                partitions = {}
+                for entry in entries:
+                    partition = _partitions.get(entry['name'])
+                    if partition is None:
+                        try:
+                            partition = HistoryPartition(os.path.join(HISTORY_DIR, entry['name']))
+                        except (OSError, ValueError, KeyError) as e:
+                            print(f"[WARNING] Could not load market history partition {entry['name']}: {e}")
+                            continue
+                    partitions[entry['name']] = partition
+            _partitions.clear()
+            _partitions.update(partitions)
+            _history = MarketHistory([entry for entry in entries if entry['name'] in partitions], partitions)
+            _history_signature = signature
+        return _history
@@ -0,0 +1,534 @@
+"""
+MarketPriceIndex: hash lookups and per-commodity aggregates over the market snapshot.
+
+The market routes, dashboard, reports and get_live_market_price() used to
+filter the full list of market records with list comprehensions on every
+request. The index groups the record positions of a snapshot by every
+combination of state, district and commodity once per snapshot version, so
+
+    index = get_price_index()
+    index.records(state='Kerala', district='Idukki', commodity='Banana')
+    index.commodity_stats('Banana', state='Kerala')   # mean/min/max modal price
+    index.category_summary(state='Kerala')            # records and bullish records per category
+
+are a dictionary lookup plus the rows that match. Each state partition gets
+its own MarketPriceIndex, and get_price_index() answers for the whole market
+with a PartitionedPriceIndex over them. When the scheduler refreshes a state
+only that partition is indexed again, in a background thread, and the other
+states keep their indexes.
+"""
+import threading
+from itertools import combinations, product
+
+import numpy as np
+
+from utils.commodity_catalog import CATEGORY_KEYS, CATEGORY_OF
+from utils.market_snapshot import load_snapshot
+
+KEY_FIELDS = ('state', 'district', 'commodity')
+# Sort keys of ordered_positions(); prefix with '-' for descending
+SORT_KEYS = ('price', 'change', 'commodity')
+# Cached orderings per index (one index per snapshot version)
+ORDER_CACHE_SIZE = 128
+# Every non-empty combination of the key fields, in KEY_FIELDS order
+KEY_COMBINATIONS = [fields for size in range(1, len(KEY_FIELDS) + 1)
+                    for fields in combinations(KEY_FIELDS, size)]
+# Groupings whose per-category counts are precomputed with the index
+SUMMARY_GROUPINGS = ((), ('state',), ('state', 'district'))
+# Prices averaged per price_date by date_trend()
+DATE_FIELDS = ('modal_price', 'min_price', 'max_price')
+
+
+def date_rows(dates, counts, sums):
+    """date_trend() rows of date_sums() results, oldest first"""
+    if not len(dates):
+        return []
+    means = {field: (sums[field] / counts).astype(np.int64).tolist() for field in DATE_FIELDS}
+    rows = [{'date': day, 'modal_price': modal, 'min_price': low, 'max_price': high}
+            for day, modal, low, high in zip(dates, means['modal_price'], means['min_price'], means['max_price'])]
+    return sorted(rows, key=lambda row: row['date'])
+
+
+class _Grouping:
+    """Record positions grouped by the codes of some key fields"""
+
+    def __init__(self, snapshot, fields):
+        self.sizes = [len(snapshot.vocab[field]) for field in fields]
+        key = np.zeros(snapshot.count, dtype=np.int64)
+        for field, size in zip(fields, self.sizes):
+            key = key * size + snapshot.codes[field]
+        # Stable sort keeps every group's positions in file order
+        self.order = np.argsort(key, kind='stable')
+        keys, starts = np.unique(key[self.order], return_index=True)
+        self.bounds = np.append(starts, snapshot.count)
+        self.group_of = dict(zip(keys.tolist(), range(len(keys))))
+        self.keys = keys
+
+    def composite(self, codes):
+        key = 0
+        for code, size in zip(codes, self.sizes):
+            key = key * size + code
+        return key
+
+    def positions(self, codes):
+        group = self.group_of.get(self.composite(codes))
+        if group is None:
+            return self.order[:0]
+        return self.order[self.bounds[group]:self.bounds[group + 1]]
+
+
+class MarketPriceIndex:
+    """Lookups by state/district/commodity and modal price aggregates for one snapshot"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.last_updated = snapshot.last_updated
+        self._groups = {fields: _Grouping(snapshot, fields) for fields in KEY_COMBINATIONS}
+        self._districts = self._build_districts()
+        self._state_stats, self._national_stats = self._build_stats()
+        self._orders = {}
+        self._change_values = None
+        self._summaries = self._build_summaries()
+
+    def __len__(self):
+        return self.snapshot.count
+
+    def _build_districts(self):
+        vocab = self.snapshot.vocab
+        grouping = self._groups[('state', 'district')]
+        districts = {}
+        for key in grouping.keys.tolist():
+            state, district = divmod(key, grouping.sizes[1])
+            districts.setdefault(vocab['state'][state], []).append(vocab['district'][district])
+        return {state: sorted(names) for state, names in districts.items()}
+
+    def _build_stats(self):
+        modal = np.asarray(self.snapshot.prices['modal_price'], dtype=np.int64)
+        vocab = self.snapshot.vocab
+        results = []
+        for fields in (('state', 'commodity'), ('commodity',)):
+            grouping = self._groups[fields]
+            values = modal[grouping.order]
+            starts = grouping.bounds[:-1]
+            counts = np.diff(grouping.bounds)
+            sums = np.add.reduceat(values, starts) if len(starts) else values[:0]
+            lows = np.minimum.reduceat(values, starts) if len(starts) else values[:0]
+            highs = np.maximum.reduceat(values, starts) if len(starts) else values[:0]
+            stats = {}
+            for key, total, count, low, high in zip(grouping.keys.tolist(), sums.tolist(), counts.tolist(),
+                                                    lows.tolist(), highs.tolist()):
+                if len(fields) == 2:
+                    state, commodity = divmod(key, grouping.sizes[1])
+                    name = (vocab['state'][state], vocab['commodity'][commodity])
+                else:
+                    name = vocab['commodity'][key]
+                stats[name] = {'mean': round(total / count, 2), 'min': low, 'max': high, 'count': count}
+            results.append(stats)
+        return results
+
+    def _record_categories(self, positions=None):
+        # Category of every record (or of the given positions); len(CATEGORY_KEYS) for unknown commodities
+        names = self.snapshot.vocab['commodity']
+        by_code = np.array([CATEGORY_KEYS.index(CATEGORY_OF[name]) if name in CATEGORY_OF else len(CATEGORY_KEYS)
+                            for name in names], dtype=np.int64)
+        codes = self.snapshot.codes['commodity']
+        return by_code[codes if positions is None else codes[positions]]
+
+    def _build_summaries(self):
+        # Records and bullish records per category for every state and (state, district), in one bincount each
+        size = len(CATEGORY_KEYS) + 1
+        categories = self._record_categories()
+        bullish = self.change_values() >= 0
+        summaries = {}
+        for fields in SUMMARY_GROUPINGS:
+            if fields:
+                grouping = self._groups[fields]
+                groups = len(grouping.keys)
+                group_of_record = np.empty(self.snapshot.count, dtype=np.int64)
+                group_of_record[grouping.order] = np.repeat(np.arange(groups), np.diff(grouping.bounds))
+            else:
+                groups, group_of_record = 1, 0
+            cells = group_of_record * size + categories
+            totals = np.bincount(cells, minlength=groups * size).reshape(groups, size)
+            ups = np.bincount(cells, weights=bullish, minlength=groups * size).reshape(groups, size)
+            summaries[fields] = (totals[:, :-1].astype(np.int64), ups[:, :-1].astype(np.int64))
+        return summaries
+
+    def positions(self, state=None, district=None, commodity=None, ignore_case=False):
+        """Record positions matching the given fields, in file order"""
+        filters = {'state': state, 'district': district, 'commodity': commodity}
+        fields = tuple(field for field in KEY_FIELDS if filters[field] is not None)
+        if not fields:
+            return np.arange(self.snapshot.count)
+        codes = [self.snapshot.codes_for(field, filters[field], ignore_case) for field in fields]
+        grouping = self._groups[fields]
+        matches = [grouping.positions(combo) for combo in product(*codes)]
+        if len(matches) == 1:
+            return matches[0]
+        if not matches:
+            return grouping.order[:0]
+        # Case-folded names can match several spellings
+        return np.sort(np.concatenate(matches))
+
+    def records(self, state=None, district=None, commodity=None, ignore_case=False, limit=None):
+        """Market records matching the given fields as dicts, at most limit of them"""
+        positions = self.positions(state, district, commodity, ignore_case)
+        return self.snapshot.records(positions[:limit] if limit else positions)
+
+    def display_rows(self, state=None, district=None, commodity=None):
+        """Precomputed market watch rows matching the given fields"""
+        return self.snapshot.display_rows(self.positions(state, district, commodity))
+
+    def commodity_codes(self, names):
+        """Commodity codes of the given commodity names (unknown names are skipped)"""
+        return [code for name in names for code in self.snapshot.codes_for('commodity', name)]
+
+    def change_values(self):
+        """Change % of every record as floats, parsed once from the change labels"""
+        if self._change_values is None:
+            self.snapshot.ensure_display_columns()
+            labels = np.array([float(label.rstrip('%')) for label in self.snapshot.vocab['change']])
+            self._change_values = labels[self.snapshot.codes['change']]
+        return self._change_values
+
+    def ordered_positions(self, state=None, district=None, commodities=None, sort=None):
+        """
+        Positions matching state/district, restricted to a collection of commodity
+        names when given, in sort order ('price', '-change', 'commodity', ... or
+        None for file order). Orderings are cached for the life of the index.
+        """
+        key = (state, district, None if commodities is None else tuple(sorted(commodities)), sort)
+        order = self._orders.get(key)
+        if order is not None:
+            return order
+
+        positions = self.positions(state, district)
+        if commodities is not None:
+            allowed = self.commodity_codes(key[2])
+            positions = positions[np.isin(self.snapshot.codes['commodity'][positions], allowed)]
+        if sort:
+            values = self.sort_values(sort.lstrip('-'), positions)
+            # Stable, so ties keep file order in both directions
+            positions = positions[np.argsort(-values if sort.startswith('-') else values, kind='stable')]
+
+        if len(self._orders) >= ORDER_CACHE_SIZE:
+            self._orders.clear()
+        self._orders[key] = positions
+        return positions
+
+    def sort_values(self, field, positions, rank=None):
+        """
+        Values of a sort key (see SORT_KEYS, without '-') at positions. Commodities
+        sort by name: rank maps names to their place, by default among this index's names.
+        """
+        if field == 'price':
+            return np.asarray(self.snapshot.prices['modal_price'][positions], dtype=np.int64)
+        if field == 'change':
+            return self.change_values()[positions]
+        if field == 'commodity':
+            names = self.snapshot.vocab['commodity']
+            if rank is None:
+                rank = {name: i for i, name in enumerate(sorted(names))}
+            return np.array([rank[name] for name in names], dtype=np.int64)[self.snapshot.codes['commodity'][positions]]
+        raise ValueError(f"Unknown sort key: {field}")
+
+    def category_summary(self, state=None, district=None, commodities=None):
+        """
+        {category key: (records, bullish records)} for the records of a state/district,
+        optionally restricted to a collection of commodity names. Whole states and
+        districts are read from the counts precomputed with the index; anything
+        else takes a single pass over the matching records.
+        """
+        fields = tuple(field for field, value in (('state', state), ('district', district)) if value is not None)
+        if commodities is None and fields in self._summaries:
+            totals, ups = self._summaries[fields]
+            group = 0
+            if fields:
+                grouping = self._groups[fields]
+                codes = [self.snapshot.codes_for(field, value) for field, value in zip(fields, (state, district))]
+                group = grouping.group_of.get(grouping.composite([c[0] for c in codes])) if all(codes) else None
+            if group is None:
+                return {key: (0, 0) for key in CATEGORY_KEYS}
+            return {key: (int(total), int(up))
+                    for key, total, up in zip(CATEGORY_KEYS, totals[group], ups[group])}
+
+        positions = self.positions(state, district)
+        if commodities is not None:
+            positions = positions[np.isin(self.snapshot.codes['commodity'][positions],
+                                          self.commodity_codes(commodities))]
+        size = len(CATEGORY_KEYS) + 1
+        categories = self._record_categories(positions)
+        totals = np.bincount(categories, minlength=size)
+        ups = np.bincount(categories, weights=self.change_values()[positions] >= 0, minlength=size)
+        return {key: (int(total), int(up)) for key, total, up in zip(CATEGORY_KEYS, totals, ups)}
+
+    def date_sums(self, state=None, district=None, commodity=None):
+        """
+        (price dates, record counts, {field: summed prices}) of the matching records,
+        one entry per price_date; the fields are modal_price, min_price and max_price
+        """
+        positions = self.positions(state, district, commodity)
+        dates, inverse = np.unique(self.snapshot.codes['price_date'][positions], return_inverse=True)
+        sums = {field: np.bincount(inverse, weights=self.snapshot.prices[field][positions], minlength=len(dates))
+                for field in DATE_FIELDS}
+        names = self.snapshot.vocab['price_date']
+        return [names[code] for code in dates.tolist()], np.bincount(inverse, minlength=len(dates)), sums
+
+    def date_trend(self, state=None, district=None, commodity=None):
+        """Average min/max/modal price per price_date of the matching records, oldest first"""
+        return date_rows(*self.date_sums(state, district, commodity))
+
+    def date_matrix(self, state=None, district=None):
+        """
+        (price dates, commodity names, sums, counts) of the records of a state/district:
+        sums[c, d] is the summed modal price of commodity c on dates[d], counts[c, d] the records summed
+        """
+        positions = self.positions(state, district)
+        dates = sorted(self.snapshot.vocab['price_date'])
+        column_of = np.empty(len(dates), dtype=np.int64)
+        column_of[[self.snapshot.codes_for('price_date', day)[0] for day in dates]] = np.arange(len(dates))
+        names = self.snapshot.vocab['commodity']
+        cells = (np.asarray(self.snapshot.codes['commodity'][positions], dtype=np.int64) * len(dates)
+                 + column_of[self.snapshot.codes['price_date'][positions]])
+        shape = (len(names), len(dates))
+        counts = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape).astype(np.float64)
+        sums = np.bincount(cells, weights=self.snapshot.prices['modal_price'][positions],
+                           minlength=shape[0] * shape[1]).reshape(shape)
+        return dates, list(names), sums, counts
+
+    def count(self, state=None, district=None, commodity=None):
+        return len(self.positions(state, district, commodity))
+
+    def districts(self, state=None):
+        """Sorted district names of a state, or of every state"""
+        if state is not None:
+            return list(self._districts.get(state, []))
+        return sorted({name for names in self._districts.values() for name in names})
+
+    def commodity_stats(self, commodity, state=None):
+        """Mean/min/max modal price and record count of a commodity, nationally or in one state"""
+        if state is not None:
+            return self._state_stats.get((state, commodity))
+        return self._national_stats.get(commodity)
+
+
+class PartitionedPriceIndex:
+    """
+    The MarketPriceIndex API over a PartitionedSnapshot, answered from one
+    MarketPriceIndex per state partition. Positions are those of the
+    PartitionedSnapshot: partition offset plus the position in the partition.
+    """
+
+    def __init__(self, snapshot, indexes):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.last_updated = snapshot.last_updated
+        self.indexes = indexes
+        self._orders = {}
+        self._commodity_rank = None
+
+    def __len__(self):
+        return self.snapshot.count
+
+    def _parts(self, state=None, ignore_case=False):
+        # (partition number, index) of the partitions that can hold state
+        if state is None:
+            return list(enumerate(self.indexes))
+        if not ignore_case:
+            number = self.snapshot.part_number(state)
+            return [] if number is None else [(number, self.indexes[number])]
+        return [(number, index) for number, index in enumerate(self.indexes)
+                if index.snapshot.codes_for('state', state, ignore_case=True)]
+
+    def region_version(self, state=None):
+        """Version of the data behind a state (its partition stamp), or of the whole market"""
+        part = self.snapshot.part(state) if state is not None else None
+        return self.version if part is None else part.version
+
+    def commodity_names(self):
+        """Every commodity name in the market data, sorted"""
+        return list(self._ranks())
+
+    def _ranks(self):
+        if self._commodity_rank is None:
+            names = sorted(set().union(*(index.snapshot.vocab['commodity'] for index in self.indexes)))
+            self._commodity_rank = {name: i for i, name in enumerate(names)}
+        return self._commodity_rank
+
+    def positions(self, state=None, district=None, commodity=None, ignore_case=False):
+        """Record positions matching the given fields, in file order"""
+        matches = [index.positions(state, district, commodity, ignore_case) + self.snapshot.offsets[number]
+                   for number, index in self._parts(state, ignore_case)]
+        return np.concatenate(matches) if matches else np.zeros(0, dtype=np.intp)
+
+    def records(self, state=None, district=None, commodity=None, ignore_case=False, limit=None):
+        """Market records matching the given fields as dicts, at most limit of them"""
+        rows = []
+        for _, index in self._parts(state, ignore_case):
+            rows += index.records(state, district, commodity, ignore_case, limit and limit - len(rows))
+            if limit and len(rows) >= limit:
+                break
+        return rows
+
+    def display_rows(self, state=None, district=None, commodity=None):
+        """Precomputed market watch rows matching the given fields"""
+        return [row for _, index in self._parts(state) for row in index.display_rows(state, district, commodity)]
+
+    def ordered_positions(self, state=None, district=None, commodities=None, sort=None):
+        """
+        Positions matching state/district, restricted to a collection of commodity
+        names when given, in sort order ('price', '-change', 'commodity', ... or
+        None for file order). Orderings are cached for the life of the index.
+        """
+        key = (state, district, None if commodities is None else tuple(sorted(commodities)), sort)
+        order = self._orders.get(key)
+        if order is not None:
+            return order
+
+        positions, values = [], []
+        for number, index in self._parts(state):
+            # File order within the partition, cached by the partition's own index
+            local = index.ordered_positions(state, district, commodities)
+            positions.append(local + self.snapshot.offsets[number])
+            if sort:
+                values.append(index.sort_values(sort.lstrip('-'), local, self._ranks()))
+        positions = np.concatenate(positions) if positions else np.zeros(0, dtype=np.intp)
+        if sort:
+            values = np.concatenate(values) if values else np.zeros(0)
+            # Stable, so ties keep file order in both directions
+            positions = positions[np.argsort(-values if sort.startswith('-') else values, kind='stable')]
+
+        if len(self._orders) >= ORDER_CACHE_SIZE:
+            self._orders.clear()
+        self._orders[key] = positions
+        return positions
+
+    def category_summary(self, state=None, district=None, commodities=None):
+        """{category key: (records, bullish records)}, summed over the partitions of the state (or all)"""
+        totals = {key: (0, 0) for key in CATEGORY_KEYS}
+        for _, index in self._parts(state):
+            for key, (total, up) in index.category_summary(state, district, commodities).items():
+                totals[key] = (totals[key][0] + total, totals[key][1] + up)
+        return totals
+
+    def date_trend(self, state=None, district=None, commodity=None):
+        """Average min/max/modal price per price_date of the matching records, oldest first"""
+        merged = {}
+        for _, index in self._parts(state):
+            dates, counts, sums = index.date_sums(state, district, commodity)
+            for i, day in enumerate(dates):
+                entry = merged.setdefault(day, [0] + [0.0] * len(DATE_FIELDS))
+                entry[0] += int(counts[i])
+                for j, field in enumerate(DATE_FIELDS, 1):
+                    entry[j] += sums[field][i]
+        dates = list(merged)
+        columns = np.array([merged[day] for day in dates], dtype=np.float64).reshape(len(dates), len(DATE_FIELDS) + 1)
+        return date_rows(dates, columns[:, 0], {field: columns[:, j] for j, field in enumerate(DATE_FIELDS, 1)})
+
+    def date_matrix(self, state=None, district=None):
+        """
+        (price dates, commodity names, sums, counts) of the records of a state/district:
+        sums[c, d] is the summed modal price of commodity c on dates[d], counts[c, d] the records summed
+        """
+        parts = [index.date_matrix(state, district) for _, index in self._parts(state)]
+        dates = sorted(set().union(*(part[0] for part in parts)))
+        names = self.commodity_names()
+        column_of = {day: i for i, day in enumerate(dates)}
+        row_of = self._ranks()
+        sums = np.zeros((len(names), len(dates)))
+        counts = np.zeros((len(names), len(dates)))
+        for part_dates, part_names, part_sums, part_counts in parts:
+            cells = np.ix_(np.array([row_of[name] for name in part_names], dtype=np.intp),
+                           np.array([column_of[day] for day in part_dates], dtype=np.intp))
+            sums[cells] += part_sums
+            counts[cells] += part_counts
+        return dates, names, sums, counts
+
+    def count(self, state=None, district=None, commodity=None):
+        return sum(index.count(state, district, commodity) for _, index in self._parts(state))
+
+    def districts(self, state=None):
+        """Sorted district names of a state, or of every state"""
+        if state is not None:
+            return [name for _, index in self._parts(state) for name in index.districts(state)]
+        return sorted({name for index in self.indexes for name in index.districts()})
+
+    def commodity_stats(self, commodity, state=None):
+        """Mean/min/max modal price and record count of a commodity, nationally or in one state"""
+        if state is not None:
+            return next((index.commodity_stats(commodity, state) for _, index in self._parts(state)), None)
+        modal = [np.asarray(index.snapshot.prices['modal_price'][index.positions(commodity=commodity)], dtype=np.int64)
+                 for index in self.indexes]
+        modal = np.concatenate(modal) if modal else np.zeros(0, dtype=np.int64)
+        if not len(modal):
+            return None
+        return {'mean': round(int(modal.sum()) / len(modal), 2), 'min': int(modal.min()), 'max': int(modal.max()),
+                'count': len(modal)}
+
+
+_index = None
+_index_lock = threading.Lock()
+# Snapshot version being indexed in the background, if any
+_building = None
+# MarketPriceIndex of each state partition by path, kept while the partition is current
+_part_indexes = {}
+
+
+def _index_partitions(snapshot):
+    # PartitionedPriceIndex of a snapshot, indexing only the partitions that have no index yet
+    indexes = []
+    for path, part in zip(snapshot.paths, snapshot.parts):
+        index = _part_indexes.get(path)
+        indexes.append(MarketPriceIndex(part) if index is None else index)
+    built = sum(1 for path in snapshot.paths if path not in _part_indexes)
+    index = PartitionedPriceIndex(snapshot, indexes)
+    return index, built
+
+
+def _publish(index, built):
+    # Under _index_lock: serve index and keep the partition indexes it uses
+    global _index, _part_indexes
+    _index = index
+    _part_indexes = dict(zip(index.snapshot.paths, index.indexes))
+    print(f"[INFO] Market price index built for version {index.version}: {len(index)} records, "
+          f"{built} of {len(index.indexes)} state partition(s) indexed")
+
+
+def _build_in_background(snapshot):
+    # Index the refreshed partitions off the request path; readers keep the previous index meanwhile
+    global _building
+    try:
+        index, built = _index_partitions(snapshot)
+        with _index_lock:
+            if _index is None or _index.version != index.version:
+                _publish(index, built)
+    except Exception as e:
+        print(f"[WARNING] Could not build market price index for version {snapshot.version}: {e}")
+    finally:
+        with _index_lock:
+            _building = None
+
+
+def get_price_index():
+    """
+    PartitionedPriceIndex of the current market data, or None if there is none yet.
+    After the first build, refreshed partitions are indexed in a background
+    thread and the previous index is returned until they are ready.
+    """
+    global _building
+    snapshot = load_snapshot()
+    index = _index
+    if snapshot is not None and index is not None:
+        if index.version != snapshot.version and _building != snapshot.version:
+            with _index_lock:
+                if _building is None and _index.version != snapshot.version:
+                    _building = snapshot.version
+                    threading.Thread(target=_build_in_background, args=(snapshot,), daemon=True).start()
+        return index
+    with _index_lock:
+        if snapshot is None:
+            return None
+        if _index is None or _index.version != snapshot.version:
+            _publish(*_index_partitions(snapshot))
+        return _index
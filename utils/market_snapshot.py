@@ -0,0 +1,517 @@
+"""
+Columnar, memory-mapped snapshot of the daily market prices, partitioned by state.
+
+data/market_prices.json repeats the state, district, commodity and market
+strings in every one of its records and each reader used to json.load() the
+whole file per request. save_partitions() writes the records of each state
+column by column into data/market_snapshot/states/<state>/<stamp>/:
+
+    min_price.npy, max_price.npy, modal_price.npy   int32 prices (per quintal)
+    <field>.codes.npy                               integer codes of a string field
+    vocab.npz                                       the strings behind the codes
+    meta.json                                       state, record count, last_updated, digest, column names
+
+plus the market watch display columns (change label, trend, 7-day prediction,
+confidence) from display_columns(). A state is only written when its content
+digest changed, and data/market_snapshot/PARTITIONS (replaced atomically)
+names the current stamp of every state, so the scheduler can refresh one
+state at a time. load_snapshot() memory-maps each partition once per stamp
+and serves the states in place as one PartitionedSnapshot, whose positions
+run through the states one after the other; when PARTITIONS changes only the
+refreshed states are mapped again and no column is copied out of its map.
+
+    snapshot = load_snapshot()
+    kerala = snapshot.part('Kerala')
+    rows = kerala.records(kerala.where(district='Idukki'))
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from utils.file_lock import file_lock, generation, write_atomic
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'market_snapshot')
+PARTITIONS_FILE = os.path.join(SNAPSHOT_DIR, 'PARTITIONS')
+STATES_DIR = os.path.join(SNAPSHOT_DIR, 'states')
+
+# Record layout, in the key order of the JSON records
+FIELDS = ['commodity', 'variety', 'market', 'state', 'district', 'min_price', 'max_price', 'modal_price',
+          'price_date', 'arrival', 'unit']
+PRICE_FIELDS = ('min_price', 'max_price', 'modal_price')
+STRING_FIELDS = tuple(f for f in FIELDS if f not in PRICE_FIELDS)
+
+# Market watch columns, derived from the records by display_columns()
+DISPLAY_NUMERIC = ('prediction_7d', 'prediction_7d_paise', 'confidence')
+DISPLAY_CODED = ('change', 'trend')
+# Display row layout: key -> (column, scale); scale 100 turns a paise/quintal price into ₹/kg
+DISPLAY_ROW = [
+    ('commodity', 'commodity', None), ('mandi', 'market', None), ('state', 'state', None),
+    ('district', 'district', None), ('current_price', 'modal_price', None), ('current_price_kg', 'modal_price', 100),
+    ('unit', 'unit', None), ('change', 'change', None), ('trend', 'trend', None),
+    ('prediction_7d', 'prediction_7d', None), ('prediction_7d_kg', 'prediction_7d_paise', 100),
+    ('confidence', 'confidence', None), ('min_price', 'min_price', None), ('max_price', 'max_price', None),
+    ('min_price_kg', 'min_price', 100), ('max_price_kg', 'max_price', 100), ('arrival', 'arrival', None),
+    ('arrival_date', 'price_date', None),
+]
+DISPLAY_FIELDS = [key for key, _, _ in DISPLAY_ROW]
+
+# Old stamps of a state stay on disk for workers that still have them mapped
+KEEP_VERSIONS = 2
+
+
+def _price(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def encode_columns(records):
+    """Split records into int32 price columns and dictionary-encoded string columns"""
+    prices = {field: np.array([_price(r.get(field)) for r in records], dtype=np.int32)
+              for field in PRICE_FIELDS}
+    codes, vocab = {}, {}
+    for field in STRING_FIELDS:
+        # Codes in order of first appearance
+        index = {}
+        column = [index.setdefault(str(r.get(field) or ''), len(index)) for r in records]
+        dtype = np.uint16 if len(index) <= np.iinfo(np.uint16).max else np.int32
+        codes[field] = np.array(column, dtype=dtype)
+        vocab[field] = list(index)
+    return prices, codes, vocab
+
+
+def display_columns(prices, codes, vocab, date_str):
+    """
+    Market watch columns for encoded records, as (numeric, coded, vocab) dicts.
+    Change %, 7-day prediction and confidence come from an md5 of
+    commodity_market_date, so they are stable for a day in every worker.
+    """
+    n_markets = len(vocab['market'])
+    pair = codes['commodity'].astype(np.int64) * n_markets + codes['market']
+    pairs, inverse = np.unique(pair, return_inverse=True)
+    digests = []
+    for key in pairs.tolist():
+        commodity, market = divmod(key, n_markets)
+        seed_key = f"{vocab['commodity'][commodity]}_{vocab['market'][market]}_{date_str}"
+        digests.append(int(hashlib.md5(seed_key.encode()).hexdigest(), 16))
+    h1500 = np.array([d % 1500 for d in digests], dtype=np.int64)[inverse]
+    h1000 = np.array([d % 1000 for d in digests], dtype=np.int64)[inverse]
+    h16 = np.array([d // 1500 % 16 for d in digests], dtype=np.int64)[inverse]
+
+    # -5% to +10% change, labelled once per possible value
+    labels = {}
+    change_label = []
+    for value in range(1500):
+        change = value / 100.0 - 5.0
+        change_label.append(labels.setdefault(f"{'+' if change > 0 else ''}{change:.1f}%", len(labels)))
+    change_percent = h1500 / 100.0 - 5.0
+
+    # Prediction 5-15% above the modal price
+    prediction = prices['modal_price'] * (1 + (0.05 + h1000 / 10000.0))
+    paise = [round(round(p / 100, 2) * 100) for p in prediction.tolist()]
+
+    numeric = {
+        'prediction_7d': prediction.astype(np.int32),
+        'prediction_7d_paise': np.array(paise, dtype=np.int32),
+        'confidence': (80 + h16).astype(np.uint8),
+    }
+    coded = {
+        'change': np.array(change_label, dtype=np.uint16)[h1500],
+        'trend': (change_percent > 0).astype(np.uint8),
+    }
+    return numeric, coded, {'change': list(labels), 'trend': ['Bearish', 'Bullish']}
+
+
+def save_snapshot(records, last_updated=None):
+    """Write records as snapshot partitions (only the states that changed)"""
+    return save_columns(*encode_columns(records), last_updated=last_updated)
+
+
+def save_columns(prices, codes, vocab, last_updated=None):
+    """Write already encoded columns (see encode_columns) as snapshot partitions, one per state"""
+    return save_partitions(prices, codes, vocab, last_updated)
+
+
+def _subset(prices, codes, vocab, positions):
+    # Rows at positions, every string field re-encoded with its used values in sorted order
+    sub_prices = {field: np.ascontiguousarray(column[positions]) for field, column in prices.items()}
+    sub_codes, sub_vocab = {}, {}
+    for field, column in codes.items():
+        used = np.unique(column[positions])
+        names = [vocab[field][code] for code in used.tolist()]
+        order = sorted(range(len(names)), key=names.__getitem__)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        dtype = np.uint16 if len(names) <= np.iinfo(np.uint16).max else np.int32
+        sub_codes[field] = rank[np.searchsorted(used, column[positions])].astype(dtype)
+        sub_vocab[field] = [names[i] for i in order]
+    return sub_prices, sub_codes, sub_vocab
+
+
+def _digest(prices, codes, vocab):
+    digest = hashlib.md5()
+    for field in sorted(prices):
+        digest.update(field.encode() + np.ascontiguousarray(prices[field]).tobytes())
+    for field in sorted(codes):
+        digest.update(field.encode() + np.ascontiguousarray(codes[field]).tobytes())
+        digest.update(json.dumps(vocab[field], ensure_ascii=False).encode())
+    return digest.hexdigest()
+
+
+def _state_dir(state):
+    return os.path.join(STATES_DIR, hashlib.md5(state.encode()).hexdigest()[:12])
+
+
+def read_partitions():
+    """{state: {'version', 'path', 'last_updated', 'digest', 'count'}} of the current partitions"""
+    try:
+        with open(PARTITIONS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_partitions(prices, codes, vocab, last_updated=None):
+    """
+    Write the states in already encoded columns as new partition stamps where
+    their content changed, and point PARTITIONS at them. Returns the states written.
+    """
+    last_updated = last_updated or datetime.now().isoformat()
+    current = read_partitions()
+    by_state = np.argsort(codes['state'], kind='stable')
+    bounds = np.searchsorted(codes['state'][by_state], np.arange(len(vocab['state']) + 1))
+    updates, refreshed = {}, {}
+    for code, state in enumerate(vocab['state']):
+        positions = by_state[bounds[code]:bounds[code + 1]]
+        if not len(positions):
+            continue
+        part_prices, part_codes, part_vocab = _subset(prices, codes, vocab, positions)
+        if 'confidence' not in part_prices:
+            # Precompute the market watch rows once per refresh instead of per request
+            numeric, coded, display_vocab = display_columns(part_prices, part_codes, part_vocab, last_updated[:10])
+            part_prices, part_codes = {**part_prices, **numeric}, {**part_codes, **coded}
+            part_vocab = {**part_vocab, **display_vocab}
+        digest = _digest(part_prices, part_codes, part_vocab)
+        if current.get(state, {}).get('digest') == digest:
+            # Same prices: keep the partition, only mark it as refreshed
+            refreshed[state] = {**current[state], 'last_updated': last_updated}
+            continue
+        updates[state] = _write_partition(state, part_prices, part_codes, part_vocab, last_updated, digest)
+
+    if updates or refreshed:
+        with file_lock(PARTITIONS_FILE, exclusive=True):
+            partitions = read_partitions()
+            partitions.update(refreshed)
+            partitions.update(updates)
+            write_atomic(PARTITIONS_FILE, json.dumps(partitions, indent=1, ensure_ascii=False).encode())
+    if updates:
+        for state in updates:
+            _prune(state, updates[state]['version'])
+        _remove_legacy()
+        print(f"[INFO] Market snapshot partitions written: {len(updates)} state(s), "
+              f"{sum(entry['count'] for entry in updates.values())} records")
+    return list(updates)
+
+
+def _write_partition(state, prices, codes, vocab, last_updated, digest):
+    version = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    state_dir = _state_dir(state)
+    os.makedirs(state_dir, exist_ok=True)
+    tmp_dir = os.path.join(state_dir, f".tmp-{version}-{os.getpid()}")
+    os.makedirs(tmp_dir)
+    count = len(prices['modal_price'])
+    try:
+        for field, column in prices.items():
+            np.save(os.path.join(tmp_dir, f"{field}.npy"), column)
+        for field, column in codes.items():
+            np.save(os.path.join(tmp_dir, f"{field}.codes.npy"), column)
+        np.savez(os.path.join(tmp_dir, 'vocab.npz'),
+                 **{field: np.array(values, dtype=str) for field, values in vocab.items()})
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'state': state, 'count': count, 'last_updated': last_updated,
+                       'digest': digest, 'numeric': list(prices), 'coded': list(codes)}, f, ensure_ascii=False)
+        os.replace(tmp_dir, os.path.join(state_dir, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return {'version': version, 'path': os.path.relpath(os.path.join(state_dir, version), SNAPSHOT_DIR),
+            'last_updated': last_updated, 'digest': digest, 'count': count}
+
+
+def _remove_legacy():
+    # Whole-snapshot versions and their CURRENT pointer from before the state partitions
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        if name[:1].isdigit() and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name.startswith('CURRENT'):
+            os.remove(path)
+
+
+def _prune(state, current):
+    state_dir = _state_dir(state)
+    versions = sorted(name for name in os.listdir(state_dir) if name[:1].isdigit())
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != current:
+            shutil.rmtree(os.path.join(state_dir, name), ignore_errors=True)
+
+
+def concat_columns(parts):
+    """
+    (prices, codes, vocab) of the rows of several snapshots, string fields
+    re-encoded over their joined vocabularies. A copy of every column: for
+    the daily history record, not for serving.
+    """
+    numeric = [field for field in parts[0].prices if all(field in part.prices for part in parts)]
+    coded = [field for field in parts[0].codes if all(field in part.codes for part in parts)]
+    prices = {field: np.concatenate([part.prices[field] for part in parts]) for field in numeric}
+    codes, vocab = {}, {}
+    for field in coded:
+        index = {}
+        remapped = []
+        for part in parts:
+            remap = np.array([index.setdefault(value, len(index)) for value in part.vocab[field]], dtype=np.int64)
+            remapped.append(remap[part.codes[field]] if len(remap) else np.zeros(0, dtype=np.int64))
+        dtype = np.uint16 if len(index) <= np.iinfo(np.uint16).max else np.int32
+        codes[field] = np.concatenate(remapped).astype(dtype)
+        vocab[field] = list(index)
+    return prices, codes, vocab
+
+
+class MarketSnapshot:
+    """One snapshot version: memory-mapped columns plus the string vocabularies
+
+    prices holds the integer columns (prices, predictions, confidence), codes the
+    dictionary-encoded string columns and vocab the strings behind each code.
+    """
+
+    def __init__(self, version, last_updated, prices, codes, vocab):
+        self.version = version
+        self.last_updated = last_updated
+        self.prices = prices
+        self.codes = codes
+        self.vocab = vocab
+        self.count = len(prices['modal_price'])
+        self._code_of = {field: {value: code for code, value in enumerate(values)}
+                         for field, values in vocab.items()}
+        self._folded = {}
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map the snapshot version stored in path"""
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        numeric = meta.get('numeric', PRICE_FIELDS)
+        coded = meta.get('coded', STRING_FIELDS)
+        prices = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode='r') for field in numeric}
+        codes = {field: np.load(os.path.join(path, f"{field}.codes.npy"), mmap_mode='r') for field in coded}
+        with np.load(os.path.join(path, 'vocab.npz')) as vocab:
+            vocab = {field: vocab[field].tolist() for field in coded}
+        return cls(meta['version'], meta.get('last_updated'), prices, codes, vocab)
+
+    @classmethod
+    def from_records(cls, records, version, last_updated=None):
+        """In-memory snapshot of records, for data that was never written as one"""
+        return cls(version, last_updated, *encode_columns(records))
+
+    def __len__(self):
+        return self.count
+
+    def codes_for(self, field, value, ignore_case=False):
+        """Codes of field matching value (at most one unless ignore_case)"""
+        if not ignore_case:
+            code = self._code_of[field].get(value)
+            return [] if code is None else [code]
+        folded = self._folded.get(field)
+        if folded is None:
+            folded = {}
+            for code, text in enumerate(self.vocab[field]):
+                folded.setdefault(text.lower(), []).append(code)
+            self._folded[field] = folded
+        return folded.get(str(value).lower(), [])
+
+    def mask(self, ignore_case=False, **filters):
+        """Boolean array of the records whose string fields equal the given values"""
+        mask = np.ones(self.count, dtype=bool)
+        for field, value in filters.items():
+            if value is None:
+                continue
+            codes = self.codes_for(field, value, ignore_case)
+            if not codes:
+                return np.zeros(self.count, dtype=bool)
+            column = self.codes[field]
+            mask &= (column == codes[0]) if len(codes) == 1 else np.isin(column, codes)
+        return mask
+
+    def where(self, ignore_case=False, **filters):
+        """Record positions matching filters, in file order"""
+        return np.flatnonzero(self.mask(ignore_case, **filters))
+
+    def record(self, i):
+        """Record i as the dict stored in market_prices.json"""
+        row = {}
+        for field in FIELDS:
+            if field in self.prices:
+                row[field] = int(self.prices[field][i])
+            else:
+                row[field] = self.vocab[field][self.codes[field][i]]
+        return row
+
+    def _column(self, field, indices, scale=None):
+        if field in self.prices:
+            values = self.prices[field][indices]
+            return (values / scale).tolist() if scale else values.tolist()
+        vocab = self.vocab[field]
+        return [vocab[code] for code in self.codes[field][indices].tolist()]
+
+    def records(self, indices=None):
+        """Records at indices (all when None) as a list of dicts"""
+        if indices is None:
+            indices = np.arange(self.count)
+        indices = np.asarray(indices, dtype=np.intp)
+        columns = [self._column(field, indices) for field in FIELDS]
+        return [dict(zip(FIELDS, row)) for row in zip(*columns)]
+
+    def ensure_display_columns(self):
+        """Compute the display columns of a snapshot written before they existed, or built from JSON"""
+        if 'confidence' not in self.prices:
+            date_str = (self.last_updated or datetime.now().isoformat())[:10]
+            numeric, coded, vocab = display_columns(self.prices, self.codes, self.vocab, date_str)
+            self.vocab = {**self.vocab, **vocab}
+            self.codes = {**self.codes, **coded}
+            self.prices = {**self.prices, **numeric}
+
+    def display_rows(self, indices=None, fields=None):
+        """Market watch rows (prices per quintal and per kg, change, trend, prediction) at indices"""
+        self.ensure_display_columns()
+        if indices is None:
+            indices = np.arange(self.count)
+        indices = np.asarray(indices, dtype=np.intp)
+        layout = [entry for entry in DISPLAY_ROW if fields is None or entry[0] in fields]
+        keys = [key for key, _, _ in layout]
+        columns = [self._column(field, indices, scale) for _, field, scale in layout]
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+class PartitionedSnapshot:
+    """
+    The state partitions of one PARTITIONS version, read in place. Position i
+    is row i - offsets[p] of partition p, so positions run through the states
+    in manifest order without the columns ever being joined.
+    """
+
+    def __init__(self, version, states, paths, parts):
+        self.version = version
+        self.states = states
+        self.paths = paths
+        self.parts = parts
+        self.offsets = np.cumsum([0] + [part.count for part in parts])
+        self.count = int(self.offsets[-1])
+        self.last_updated = max((part.last_updated for part in parts if part.last_updated), default=None)
+        self._part_of_state = dict(zip(states, range(len(states))))
+
+    def __len__(self):
+        return self.count
+
+    def part_number(self, state):
+        """Number of the partition holding state, or None"""
+        return self._part_of_state.get(state)
+
+    def part(self, state):
+        """MarketSnapshot of one state, or None"""
+        number = self._part_of_state.get(state)
+        return None if number is None else self.parts[number]
+
+    def _gather(self, positions, rows_of):
+        # rows_of(part, local positions) for each partition the positions fall in, back in the given order
+        positions = np.asarray(positions, dtype=np.intp)
+        number = np.searchsorted(self.offsets, positions, side='right') - 1
+        rows = [None] * len(positions)
+        for p in np.unique(number).tolist():
+            at = np.flatnonzero(number == p)
+            for i, row in zip(at.tolist(), rows_of(self.parts[p], positions[at] - self.offsets[p])):
+                rows[i] = row
+        return rows
+
+    def record(self, i):
+        """Record at position i as the dict stored in market_prices.json"""
+        p = int(np.searchsorted(self.offsets, i, side='right')) - 1
+        return self.parts[p].record(i - int(self.offsets[p]))
+
+    def records(self, positions=None):
+        """Records at positions (all when None) as a list of dicts"""
+        if positions is None:
+            return [row for part in self.parts for row in part.records()]
+        return self._gather(positions, lambda part, local: part.records(local))
+
+    def display_rows(self, positions=None, fields=None):
+        """Market watch rows at positions (all when None)"""
+        if positions is None:
+            return [row for part in self.parts for row in part.display_rows(None, fields)]
+        return self._gather(positions, lambda part, local: part.display_rows(local, fields))
+
+
+_snapshot = None
+_snapshot_signature = None
+_snapshot_lock = threading.Lock()
+# Mapped partitions by path, and the path each state is served from
+_parts = {}
+_state_paths = {}
+
+
+def load_snapshot():
+    """
+    The current PartitionedSnapshot, or None if no partition was written.
+    Partitions are mapped once per stamp, so after a state refresh only that
+    state is read again; the others are served from the maps they had.
+    """
+    global _snapshot, _snapshot_signature
+    try:
+        stat = os.stat(PARTITIONS_FILE)
+    except FileNotFoundError:
+        return None
+    signature = (generation(PARTITIONS_FILE), stat.st_mtime_ns, stat.st_ino)
+    if signature == _snapshot_signature:
+        return _snapshot
+    with _snapshot_lock:
+        if signature == _snapshot_signature:
+            return _snapshot
+        with file_lock(PARTITIONS_FILE):
+            partitions = read_partitions()
+        parts, paths = {}, {}
+        for state, entry in partitions.items():
+            path = entry['path']
+            part = _parts.get(path)
+            if part is None:
+                try:
+                    part = MarketSnapshot.open(os.path.join(SNAPSHOT_DIR, path))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[WARNING] Could not load market snapshot partition of {state}: {e}")
+                    # Keep serving the stamp mapped before, if any
+                    path = _state_paths.get(state)
+                    part = _parts.get(path)
+                    if part is None:
+                        continue
+            parts[path] = part
+            paths[state] = path
+        if not parts:
+            return None
+        version = max(part.version for part in parts.values()) + '-' + \
+            hashlib.md5('|'.join(parts).encode()).hexdigest()[:8]
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = PartitionedSnapshot(version, list(paths), list(paths.values()),
+                                            [parts[path] for path in paths.values()])
+        _parts.clear()
+        _parts.update(parts)
+        _state_paths.clear()
+        _state_paths.update(paths)
+        _snapshot_signature = signature
+        return _snapshot
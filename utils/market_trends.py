@@ -0,0 +1,136 @@
+"""
+Price trend statistics for every commodity of a region in one pass.
+
+price_trend answers one commodity per request, filtering the market data
+again each time. region_trends() builds a commodities x dates matrix of
+average modal prices for a region (from the price history, or from the price
+dates of the current snapshot when that covers more of the window) and
+computes the statistics for all rows at once:
+
+    trends = region_trends(state='Kerala', days=30)
+    trends['Tomato']   # change_percent, moving_average, volatility, direction, confidence, ...
+
+Results are cached per (region, window, data version of the region, history
+version), so refreshing one state leaves the cached trends of the others.
+"""
+import threading
+
+import numpy as np
+
+from utils.market_history import get_history
+from utils.market_price_index import get_price_index
+
+# Windows in days that trends are computed for
+TREND_WINDOWS = (7, 30, 90, 365)
+# Points in the trailing moving average
+MOVING_AVERAGE_POINTS = 7
+# Price change (%) over the window beyond which a trend is Rising or Falling
+DIRECTION_THRESHOLD = 2
+TREND_CACHE_SIZE = 64
+DIRECTIONS = np.array(['Falling', 'Stable', 'Rising'])
+
+
+def trend_statistics(prices):
+    """
+    Statistics of each row of prices (commodities x dates, NaN where a date has
+    no price) as arrays: points, first/last price, change_percent,
+    moving_average, volatility (standard deviation of the point-to-point
+    change, %), direction and confidence (50-95).
+    """
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    rows, columns = prices.shape
+    valid = ~np.isnan(prices)
+    points = valid.sum(axis=1)
+    row = np.arange(rows)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first = prices[row, np.argmax(valid, axis=1)] if columns else np.full(rows, np.nan)
+        last = prices[row, columns - 1 - np.argmax(valid[:, ::-1], axis=1)] if columns else np.full(rows, np.nan)
+        change_percent = (last - first) / first * 100
+
+        # Mean of the last MOVING_AVERAGE_POINTS prices of each row
+        rank = np.cumsum(valid, axis=1)
+        recent = valid & (rank > (points - MOVING_AVERAGE_POINTS)[:, None])
+        moving_average = np.where(recent, prices, 0).sum(axis=1) / recent.sum(axis=1)
+
+        # Change from each price to the previous one the row has, skipping gaps
+        previous = np.maximum.accumulate(np.where(valid, np.arange(columns), 0), axis=1)
+        filled = prices[row[:, None], previous]
+        returns = np.where(valid[:, 1:] & valid[row[:, None], previous[:, :-1]],
+                           prices[:, 1:] / filled[:, :-1] - 1, np.nan)
+        has_returns = (~np.isnan(returns)).any(axis=1)
+        volatility = np.full(rows, np.nan)
+        volatility[has_returns] = np.nanstd(returns[has_returns], axis=1) * 100
+
+    direction = DIRECTIONS[(change_percent >= -DIRECTION_THRESHOLD).astype(int)
+                           + (change_percent > DIRECTION_THRESHOLD).astype(int)]
+    # Full confidence for a steady week of prices, less for volatile or sparse ones
+    confidence = np.clip(95 - 2 * np.nan_to_num(volatility) - 5 * np.maximum(0, 7 - points), 50, 95)
+    return {
+        'points': points,
+        'first_price': first,
+        'last_price': last,
+        'change_percent': change_percent,
+        'moving_average': moving_average,
+        'volatility': volatility,
+        'direction': direction,
+        'confidence': confidence.round().astype(int),
+    }
+
+
+def recommendation(direction):
+    return 'Wait' if direction == 'Rising' else 'Sell Now'
+
+
+def _rows(dates, names, sums, counts, source):
+    # {commodity: statistics} for the commodities with at least two prices
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Whole rupees, like the averages price_trend reports
+        stats = trend_statistics(np.where(counts > 0, np.floor(sums / counts), np.nan))
+    results = {}
+    for i in np.flatnonzero(stats['points'] >= 2).tolist():
+        valid = np.flatnonzero(counts[i] > 0)
+        results[names[i]] = {
+            'commodity': names[i],
+            'data_source': source,
+            'points': int(stats['points'][i]),
+            'from': dates[valid[0]],
+            'to': dates[valid[-1]],
+            'first_price': int(stats['first_price'][i]),
+            'last_price': int(stats['last_price'][i]),
+            'change_percent': round(float(stats['change_percent'][i]), 1),
+            'moving_average': round(float(stats['moving_average'][i]), 2),
+            'volatility': round(float(stats['volatility'][i]), 2),
+            'direction': str(stats['direction'][i]),
+            'recommendation': recommendation(stats['direction'][i]),
+            'confidence': int(stats['confidence'][i]),
+        }
+    return results
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def region_trends(state=None, district=None, days=7):
+    """{commodity: trend statistics} for every commodity with a trend in the region, or None without data"""
+    price_index = get_price_index()
+    if price_index is None:
+        return None
+    history = get_history()
+    key = (state, district, days, price_index.region_version(state), history.version)
+    trends = _cache.get(key)
+    if trends is not None:
+        return trends
+
+    dates, names, sums, counts = price_index.date_matrix(state, district)
+    # The snapshot's price dates stand in for history that covers less of the window
+    trends = _rows(dates[-days:], names, sums[:, -days:], counts[:, -days:], 'snapshot')
+    for commodity, stats in _rows(*history.region_matrix(state, district, days), 'history').items():
+        if commodity not in trends or stats['points'] >= trends[commodity]['points']:
+            trends[commodity] = stats
+
+    with _cache_lock:
+        if len(_cache) >= TREND_CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = trends
+    return trends
@@ -0,0 +1,179 @@
+"""
+Lazy PyMongo-style cursor returned by MockCollection.find().
+
+    for doc in db.crop_listings.find({'status': 'active'}).sort('created_at', -1).limit(20):
+        ...
+
+Nothing is evaluated until iteration starts. The cursor then pulls matching
+documents from the collection lazily (see MockCollection._walk), so skip +
+limit stop the walk early, and orders and pages them: sort + limit keeps only
+skip + limit documents in a bounded heap instead of sorting every match, and
+documents are copied only as they are yielded (and only their projected
+fields, when a projection is given). The copies are deep, so a caller
+changing a nested list or dict cannot change the shared document cache.
+"""
+import heapq
+from functools import cmp_to_key
+from itertools import islice
+
+from pymongo.errors import InvalidOperation
+
+from utils.mock_index import sort_key
+from utils.mock_query import MISSING, get_path
+
+
+def copy_value(value):
+    """Deep copy of a JSON value: dicts and lists are copied, strings and numbers shared"""
+    if isinstance(value, dict):
+        return {k: copy_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_value(v) for v in value]
+    return value
+
+
+def compile_projection(projection):
+    """
+    Return doc -> deep-copied dict for a projection. Inclusion ({'name': 1} or
+    ['name']) copies only the listed fields; exclusion ({'password': 0}) copies
+    the rest. _id is included unless excluded explicitly.
+    """
+    if not projection:
+        return copy_value
+    if not isinstance(projection, dict):
+        projection = {field: 1 for field in projection}
+    include_id = bool(projection.get('_id', 1))
+    fields = {field: bool(flag) for field, flag in projection.items() if field != '_id'}
+    if fields and len(set(fields.values())) > 1:
+        raise ValueError("Projection cannot have a mix of inclusion and exclusion")
+
+    if fields and all(fields.values()):
+        paths = [tuple(field.split('.')) for field in fields]
+        if include_id:
+            paths.insert(0, ('_id',))
+        if all(len(path) == 1 for path in paths):
+            keys = [path[0] for path in paths]
+            return lambda doc: {k: copy_value(doc[k]) for k in keys if k in doc}
+
+        def include(doc):
+            result = {}
+            for path in paths:
+                value = get_path(doc, path)
+                if value is MISSING:
+                    continue
+                target = result
+                for part in path[:-1]:
+                    target = target.setdefault(part, {})
+                target[path[-1]] = copy_value(value)
+            return result
+        return include
+
+    excluded = set(fields)
+    if not include_id:
+        excluded.add('_id')
+    nested = [tuple(field.split('.')) for field in excluded if '.' in field]
+    top_level = {field for field in excluded if '.' not in field}
+
+    def exclude(doc):
+        result = {k: copy_value(v) for k, v in doc.items() if k not in top_level}
+        for path in nested:
+            parent = result
+            for part in path[:-1]:
+                if not isinstance(parent.get(part), dict):
+                    break
+                parent = parent[part]
+            else:
+                parent.pop(path[-1], None)
+        return result
+    return exclude
+
+
+def normalize_sort(key_or_list, direction=None):
+    """'field' / ('field', dir) / [('field', dir), ...] -> [('field', dir), ...]"""
+    if isinstance(key_or_list, str):
+        keys = [(key_or_list, direction if direction is not None else 1)]
+    elif isinstance(key_or_list, tuple) and len(key_or_list) == 2 and isinstance(key_or_list[0], str):
+        keys = [key_or_list]
+    else:
+        keys = list(key_or_list)
+    return [(field, -1 if dir_ == -1 else 1) for field, dir_ in keys]
+
+
+def _field_key(field):
+    parts = tuple(field.split('.'))
+
+    def key(doc):
+        value = get_path(doc, parts)
+        # Missing fields sort as '' (as SortableList did)
+        return sort_key('' if value is MISSING else value)
+    return key
+
+
+def order_documents(docs, sort, keep=None):
+    """Sort docs by a normalized sort spec; with keep=N only the first N are selected (heap)"""
+    if len(sort) == 1 or len({direction for _, direction in sort}) == 1:
+        field_keys = [_field_key(field) for field, _ in sort]
+        key = field_keys[0] if len(field_keys) == 1 else (lambda doc: tuple(k(doc) for k in field_keys))
+        descending = sort[0][1] == -1
+        if keep is None:
+            return sorted(docs, key=key, reverse=descending)
+        return (heapq.nlargest if descending else heapq.nsmallest)(keep, docs, key=key)
+
+    field_keys = [(_field_key(field), direction) for field, direction in sort]
+
+    def compare(a, b):
+        for key, direction in field_keys:
+            ka, kb = key(a), key(b)
+            if ka != kb:
+                return (-1 if ka < kb else 1) * direction
+        return 0
+    if keep is None:
+        return sorted(docs, key=cmp_to_key(compare))
+    return heapq.nsmallest(keep, docs, key=cmp_to_key(compare))
+
+
+class MockCursor:
+    def __init__(self, collection, query=None, projection=None, sort=None, skip=0, limit=0):
+        self._collection = collection
+        self._query = query or {}
+        self._project = compile_projection(projection)
+        self._sort = normalize_sort(sort) if sort else None
+        self._skip = skip
+        self._limit = limit
+        self._results = None
+
+    def _check_unused(self):
+        if self._results is not None:
+            raise InvalidOperation("cannot set options after executing query")
+
+    def sort(self, key_or_list, direction=None):
+        self._check_unused()
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._check_unused()
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._check_unused()
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._results is None:
+            self._results = self._execute()
+        return next(self._results)
+
+    def _execute(self):
+        # The source has already matched the query
+        docs, ordered = self._collection._cursor_source(self._query, self._sort)
+        if self._sort and not ordered:
+            docs = order_documents(docs, self._sort, keep=self._skip + self._limit if self._limit else None)
+        end = self._skip + self._limit if self._limit else None
+        for doc in islice(docs, self._skip, end):
+            # Deep copies (of the projected fields only) so callers cannot mutate the shared cache
+            yield self._project(doc)
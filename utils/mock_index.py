@@ -0,0 +1,281 @@
+"""
+In-memory secondary indexes for the file-backed MockCollection.
+
+MockCollection.create_index() registers an index spec per collection file:
+    create_index('email', unique=True)        -> hash index (equality lookups)
+    create_index([('created_at', -1)])        -> sorted index (equality, ranges, sort)
+
+Indexes are built lazily against the cached document list and maintained on
+insert, update and delete. They hold references to the cached documents, so
+they are thrown away whenever that cache is reloaded from disk.
+"""
+from bisect import bisect_left, bisect_right
+from math import inf
+from numbers import Number
+
+from pymongo.errors import DuplicateKeyError
+
+
+def hashable(value):
+    """Turn a document value into something usable as a dict key"""
+    if isinstance(value, list):
+        return ('__list__',) + tuple(hashable(v) for v in value)
+    if isinstance(value, dict):
+        return ('__dict__',) + tuple((k, hashable(v)) for k, v in value.items())
+    return value
+
+
+def sort_key(value):
+    """Total order across the value types found in the JSON files (None < numbers < strings < other)"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, Number):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, repr(value))
+
+
+def is_equality(value):
+    """True for plain values; operator dicts like {'$lt': x} are not equality clauses"""
+    return not (isinstance(value, dict) and any(str(k).startswith('$') for k in value))
+
+
+class HashIndex:
+    """Maps a field value to the documents holding it"""
+
+    def __init__(self, collection, field, unique=False):
+        self.collection = collection
+        self.field = field
+        self.unique = unique
+        self._buckets = {}
+
+    def key_for(self, value):
+        # _id is always compared as a string (ObjectId or UUID text)
+        if self.field == '_id' and value is not None:
+            return str(value)
+        return hashable(value)
+
+    def add(self, doc):
+        bucket = self._buckets.setdefault(self.key_for(doc.get(self.field)), {})
+        bucket[id(doc)] = doc
+
+    def remove(self, doc):
+        key = self.key_for(doc.get(self.field))
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.pop(id(doc), None)
+            if not bucket:
+                del self._buckets[key]
+
+    def lookup(self, value):
+        return list(self._buckets.get(self.key_for(value), {}).values())
+
+    def count(self, value):
+        return len(self._buckets.get(self.key_for(value), ()))
+
+    def verify_unique(self):
+        """Raise DuplicateKeyError if the indexed documents already hold duplicates"""
+        for bucket in self._buckets.values():
+            if self.unique and len(bucket) > 1:
+                self.check(next(iter(bucket.values())))
+
+    def check(self, doc, replacing=None):
+        """Raise DuplicateKeyError if adding doc (in place of `replacing`) breaks uniqueness"""
+        if not self.unique:
+            return
+        bucket = self._buckets.get(self.key_for(doc.get(self.field)), {})
+        if any(other is not replacing for other in bucket.values()):
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.collection} "
+                f"index: {self.field}_1 dup key: {{ {self.field}: {doc.get(self.field)!r} }}"
+            )
+
+
+class SortedIndex(HashIndex):
+    """Hash index plus the documents kept in field order for ranges and sorting"""
+
+    def __init__(self, collection, field, unique=False):
+        super().__init__(collection, field, unique)
+        # (sort key, seq) per document, ascending; seq keeps ties in collection order
+        self._keys = []
+        self._docs = []
+
+    def _sort_value(self, doc):
+        # Missing fields sort as '' to match SortableList.sort()
+        return sort_key(doc.get(self.field, ''))
+
+    def build(self, entries):
+        """Index (seq, doc) pairs with one sort instead of an insertion each"""
+        for _, doc in entries:
+            super().add(doc)
+        pairs = sorted(((self._sort_value(doc), seq), doc) for seq, doc in entries)
+        self._keys = [key for key, _ in pairs]
+        self._docs = [doc for _, doc in pairs]
+
+    def add(self, doc, seq=0):
+        super().add(doc)
+        key = (self._sort_value(doc), seq)
+        pos = bisect_left(self._keys, key)
+        self._keys.insert(pos, key)
+        self._docs.insert(pos, doc)
+
+    def remove(self, doc, seq=0):
+        super().remove(doc)
+        pos = bisect_left(self._keys, (self._sort_value(doc), seq))
+        if pos < len(self._docs) and self._docs[pos] is doc:
+            del self._keys[pos]
+            del self._docs[pos]
+
+    def ordered(self, direction=1):
+        """Documents by field value; equal values stay in collection order either way, like a stable sort"""
+        return iter(self._docs) if direction == 1 else self._descending()
+
+    def _descending(self):
+        hi = len(self._keys)
+        while hi:
+            lo = bisect_left(self._keys, (self._keys[hi - 1][0],), 0, hi)
+            yield from self._docs[lo:hi]
+            hi = lo
+
+    def range(self, gt=None, gte=None, lt=None, lte=None):
+        """Documents with gt < value < lt (or the inclusive variants), in ascending order"""
+        # (value,) sorts before and (value, inf) after every (value, seq) key
+        lo, hi = 0, len(self._keys)
+        if gte is not None:
+            lo = bisect_left(self._keys, (sort_key(gte),))
+        if gt is not None:
+            lo = max(lo, bisect_right(self._keys, (sort_key(gt), inf)))
+        if lte is not None:
+            hi = bisect_right(self._keys, (sort_key(lte), inf))
+        if lt is not None:
+            hi = min(hi, bisect_left(self._keys, (sort_key(lt),)))
+        return self._docs[lo:hi] if lo < hi else []
+
+
+class IndexSet:
+    """All indexes of one collection, bound to one cached data object"""
+
+    def __init__(self, collection, specs, data, is_dict):
+        self.data = data
+        self.is_dict = is_dict
+        self.indexes = {}
+        # Per document (by id()): its dict key or list position, and its seq, the
+        # collection order used to break ties in sorted indexes
+        self._key_of = {}
+        self._seq = {}
+        for field, spec in specs.items():
+            index_cls = SortedIndex if spec['sorted'] else HashIndex
+            self.indexes[field] = index_cls(collection, field, spec['unique'])
+        entries = list(data.items() if is_dict else enumerate(data))
+        for seq, (key, doc) in enumerate(entries):
+            self._key_of[id(doc)] = key
+            self._seq[id(doc)] = seq
+        self._next_seq = len(entries)
+        numbered = [(seq, doc) for seq, (_, doc) in enumerate(entries)]
+        for index in self.indexes.values():
+            if isinstance(index, SortedIndex):
+                index.build(numbered)
+            else:
+                for _, doc in numbered:
+                    index.add(doc)
+
+    def add(self, doc, key=None, seq=None):
+        """Index doc, stored at key (dict key or list position); a new document goes last in collection order"""
+        if seq is None:
+            seq = self._next_seq
+            self._next_seq += 1
+        self._key_of[id(doc)] = key
+        self._seq[id(doc)] = seq
+        for index in self.indexes.values():
+            if isinstance(index, SortedIndex):
+                index.add(doc, seq)
+            else:
+                index.add(doc)
+
+    def remove(self, doc):
+        """Unindex doc; returns its seq"""
+        self._key_of.pop(id(doc), None)
+        seq = self._seq.pop(id(doc), None)
+        for index in self.indexes.values():
+            if isinstance(index, SortedIndex):
+                index.remove(doc, seq)
+            else:
+                index.remove(doc)
+        return seq
+
+    def replace(self, old, new, key):
+        """Swap old for new at key; new keeps old's place in collection order"""
+        self.add(new, key, seq=self.remove(old))
+
+    def check(self, doc, replacing=None):
+        for index in self.indexes.values():
+            index.check(doc, replacing)
+
+    def key_of(self, doc):
+        """Dict key or current list position of a cached document"""
+        key = self._key_of[id(doc)]
+        if self.is_dict or (key < len(self.data) and self.data[key] is doc):
+            return key
+        # A deletion shifted the list; renumber once
+        for pos, other in enumerate(self.data):
+            self._key_of[id(other)] = pos
+        return self._key_of[id(doc)]
+
+    def candidates(self, query):
+        """
+        Documents that may match `query`, narrowed through an index, or None when
+        no index applies. Callers still evaluate the full query on each candidate.
+        """
+        best = None
+        for field, value in query.items():
+            index = self.indexes.get(field)
+            if index is None:
+                continue
+            if is_equality(value):
+                if best is None or index.count(value) < len(best):
+                    best = index.lookup(value)
+            elif list(value) == ['$in']:
+                if best is None or sum(index.count(v) for v in value['$in']) < len(best):
+                    found = {}
+                    for v in value['$in']:
+                        for doc in index.lookup(v):
+                            found[id(doc)] = doc
+                    best = list(found.values())
+            elif isinstance(index, SortedIndex) and self._range_bounds(value) is not None:
+                docs = index.range(**self._range_bounds(value))
+                if best is None or len(docs) < len(best):
+                    best = docs
+        for branch in query.get('$and', ()):
+            docs = self.candidates(branch)
+            if docs is not None and (best is None or len(docs) < len(best)):
+                best = docs
+        if '$or' in query:
+            union = {}
+            for branch in query['$or']:
+                branch_docs = self.candidates(branch)
+                if branch_docs is None:
+                    union = None
+                    break
+                for doc in branch_docs:
+                    union[id(doc)] = doc
+            if union is not None and (best is None or len(union) < len(best)):
+                best = list(union.values())
+        return best
+
+    @staticmethod
+    def _range_bounds(condition):
+        """range() arguments for a {'$gt': ..., '$lte': ...} clause, if the index can serve it"""
+        bounds = {}
+        for op, value in condition.items():
+            if op not in ('$gt', '$gte', '$lt', '$lte'):
+                return None
+            # Dates are stored as strings, so datetime bounds cannot use the index order
+            if not isinstance(value, (Number, str)) or isinstance(value, bool):
+                return None
+            bounds[op[1:]] = value
+        return bounds
+
+    def sorted_index(self, field):
+        index = self.indexes.get(field)
+        return index if isinstance(index, SortedIndex) else None
@@ -0,0 +1,241 @@
+"""
+Query compiler for the file-backed MockCollection.
+
+compile_query() turns a Mongo-style filter into a predicate over documents:
+    match = compile_query({'status': 'available', 'price': {'$lte': 40}})
+    rows = [doc for doc in docs if match(doc)]
+
+Supported: plain equality, $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte,
+$regex (+ $options), $exists, $and, $or, $nor and dotted paths ('a.b').
+
+The predicate is generated as Python source once per query *shape* (fields,
+operators and value kinds, not the values themselves) and memoized; the values
+are bound as parameters, so e.g. every find_one({'email': ...}) shares one
+compiled function.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+
+MISSING = object()
+
+_RANGE_OPS = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+_REGEX_FLAGS = {'i': re.IGNORECASE, 'm': re.MULTILINE, 's': re.DOTALL, 'x': re.VERBOSE}
+
+
+def is_operator_dict(value):
+    return isinstance(value, dict) and any(str(k).startswith('$') for k in value)
+
+
+def get_path(doc, parts):
+    """Value at a dotted path, or MISSING"""
+    for part in parts:
+        if not isinstance(doc, dict) or part not in doc:
+            return MISSING
+        doc = doc[part]
+    return doc
+
+
+def _value(doc, parts):
+    value = get_path(doc, parts)
+    return None if value is MISSING else value
+
+
+def _as_datetime(value):
+    """Stored datetimes are strings (json default=str or isoformat)"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _compare(value, op, param):
+    # Mixed types (None vs number, str vs int) never match, as in MongoDB
+    try:
+        if op == '>':
+            return value > param
+        if op == '>=':
+            return value >= param
+        if op == '<':
+            return value < param
+        return value <= param
+    except TypeError:
+        return False
+
+
+def _in(value, params):
+    try:
+        return value in params
+    except TypeError:
+        return False
+
+
+def _regex(value, pattern):
+    return isinstance(value, str) and pattern.search(value) is not None
+
+
+def _kind(value):
+    if value is None:
+        return 'none'
+    if isinstance(value, datetime):
+        return 'datetime'
+    return 'value'
+
+
+def _in_param(values):
+    values = list(values)
+    try:
+        return frozenset(values)
+    except TypeError:
+        return values
+
+
+def _regex_param(condition):
+    pattern = condition['$regex']
+    if not isinstance(pattern, str):
+        return pattern
+    flags = 0
+    for option in condition.get('$options', ''):
+        flags |= _REGEX_FLAGS.get(option, 0)
+    return re.compile(pattern, flags)
+
+
+def _field_shape(field, condition, params):
+    """Shape of one field clause; appends the values it binds to params"""
+    if not is_operator_dict(condition):
+        condition = {'$eq': condition}
+    ops = []
+    for op, value in condition.items():
+        if op in ('$eq', '$ne'):
+            if field == '_id' and value is not None:
+                value = str(value)
+            params.append(value)
+            ops.append((op, _kind(value)))
+        elif op in _RANGE_OPS:
+            params.append(value)
+            ops.append((op, _kind(value)))
+        elif op in ('$in', '$nin'):
+            values = [str(v) if field == '_id' and v is not None else v for v in value]
+            params.append(_in_param(values))
+            ops.append((op, 'value'))
+        elif op == '$regex':
+            params.append(_regex_param(condition))
+            ops.append((op, 'value'))
+        elif op == '$exists':
+            ops.append((op, bool(value)))
+        elif op == '$options':
+            continue
+        else:
+            raise ValueError(f"Unsupported query operator: {op}")
+    return ('field', field, tuple(ops))
+
+
+def query_shape(query, params):
+    """Hashable shape of a filter; appends its values to params in evaluation order"""
+    clauses = []
+    for key, value in (query or {}).items():
+        if key in ('$and', '$or', '$nor'):
+            clauses.append((key, tuple(query_shape(branch, params) for branch in value)))
+        elif str(key).startswith('$'):
+            raise ValueError(f"Unsupported query operator: {key}")
+        else:
+            clauses.append(_field_shape(key, value, params))
+    return tuple(clauses)
+
+
+class _Codegen:
+    def __init__(self):
+        self.param = 0
+
+    def next_param(self):
+        name = f"p[{self.param}]"
+        self.param += 1
+        return name
+
+    def value_expr(self, field):
+        parts = field.split('.')
+        if len(parts) == 1:
+            expr = f"d.get({field!r})"
+        else:
+            expr = f"_value(d, {tuple(parts)!r})"
+        return f"str({expr})" if field == '_id' else expr
+
+    def field(self, field, ops):
+        value = self.value_expr(field)
+        raw = value[4:-1] if field == '_id' else value
+        terms = []
+        for op, kind in ops:
+            if op == '$exists':
+                test = 'is not' if kind else 'is'
+                terms.append(f"get_path(d, {tuple(field.split('.'))!r}) {test} MISSING")
+                continue
+            param = self.next_param()
+            if op in ('$eq', '$ne'):
+                # _id is compared as text, but a missing _id is still None
+                operand = raw if kind == 'none' else value
+                terms.append(f"{operand} {'==' if op == '$eq' else '!='} {param}")
+            elif op in _RANGE_OPS:
+                operand = f"_as_datetime({raw})" if kind == 'datetime' else raw
+                terms.append(f"_compare({operand}, {_RANGE_OPS[op]!r}, {param})")
+            elif op == '$in':
+                terms.append(f"_in({value}, {param})")
+            elif op == '$nin':
+                terms.append(f"not _in({value}, {param})")
+            elif op == '$regex':
+                terms.append(f"_regex({raw}, {param})")
+        return ' and '.join(f"({t})" for t in terms) or 'True'
+
+    def clauses(self, shape):
+        terms = []
+        for clause in shape:
+            if clause[0] == 'field':
+                terms.append(self.field(clause[1], clause[2]))
+            else:
+                branches = [self.clauses(branch) for branch in clause[1]]
+                if clause[0] == '$and':
+                    terms.append(' and '.join(f"({b})" for b in branches) or 'True')
+                elif clause[0] == '$or':
+                    terms.append(' or '.join(f"({b})" for b in branches) or 'False')
+                else:
+                    terms.append('not (' + (' or '.join(f"({b})" for b in branches) or 'False') + ')')
+        return ' and '.join(f"({t})" for t in terms) or 'True'
+
+
+_GLOBALS = {
+    'MISSING': MISSING, 'get_path': get_path, '_value': _value, '_as_datetime': _as_datetime,
+    '_compare': _compare, '_in': _in, '_regex': _regex,
+}
+
+
+@lru_cache(maxsize=512)
+def _compile_shape(shape):
+    source = f"lambda d, p: {_Codegen().clauses(shape)}"
+    return eval(compile(source, '<mock-query>', 'eval'), dict(_GLOBALS))
+
+
+def compile_query(query):
+    """Return a predicate doc -> bool for a Mongo-style filter"""
+    params = []
+    matcher = _compile_shape(query_shape(query, params))
+    params = tuple(params)
+    return lambda doc: matcher(doc, params)
+
+
+VERSION_FIELD = '_version'
+
+
+def versioned(query, update, expected_version):
+    """
+    Rewrite an update into a compare-and-swap on the document version: it only
+    matches while the version is still expected_version and increments it.
+    Documents written before versioning have no _version and count as 0.
+    """
+    query = dict(query)
+    query[VERSION_FIELD] = {'$in': [0, None]} if expected_version == 0 else expected_version
+    update = dict(update)
+    update['$inc'] = dict(update.get('$inc', {}), **{VERSION_FIELD: 1})
+    return query, update
@@ -0,0 +1,471 @@
+"""
+SQLite storage backend with the same collection surface as MockCollection.
+
+Enabled by setting SQLITE_DB_PATH (see utils/db.py). Every collection is a
+table holding the document as JSON, with generated columns and B-tree indexes
+for the hot lookup fields. The database runs in WAL mode so gunicorn workers
+can read concurrently while one of them writes.
+
+Migrate the existing data/*.json files with:
+    python -m utils.sqlite_store [path/to/database.db]
+(this also happens automatically the first time an empty database is opened).
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import uuid
+from datetime import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+from utils.mock_cursor import compile_projection
+from utils.mock_query import versioned
+
+# Fields that get a generated column and an index in every collection table
+HOT_FIELDS = ('_id', 'email', 'user_id', 'farmer_id', 'status', 'district', 'created_at')
+
+# data/*.json file -> collection name
+JSON_COLLECTIONS = {
+    'users.json': 'users',
+    'crops.json': 'crops',
+    'fertilizers.json': 'fertilizers',
+    'diseases.json': 'diseases',
+    'growing_activities.json': 'growing_activities',
+    'crop_listings.json': 'crop_listings',
+    'equipment_listings.json': 'equipment_listings',
+    # Legacy file used by save_equipment(); on MongoDB those documents live in equipment_listings
+    'equipment.json': 'equipment_listings',
+    'equipment_base_prices.json': 'equipment_base_prices',
+    'notifications.json': 'notifications',
+    'otps.json': 'otps',
+    'reset_tokens.json': 'password_reset_tokens',
+    'expenses.json': 'expenses',
+}
+
+_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%f'
+
+
+def _json_path(field):
+    parts = ''.join('."{}"'.format(part.replace('"', '\\"')) for part in field.split('.'))
+    return ('$' + parts).replace("'", "''")
+
+
+def _column(field):
+    """SQL expression for a (possibly dotted) document field"""
+    if field in HOT_FIELDS:
+        return f'"{field}"'
+    return f"json_extract(doc, '{_json_path(field)}')"
+
+
+def _param(value):
+    """Bind values the way json.dump(default=str) stored them"""
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str, ensure_ascii=False)
+    return str(value)
+
+
+def _regexp(pattern, value):
+    if value is None:
+        return False
+    return re.search(pattern, str(value)) is not None
+
+
+def _translate_field(field, condition, params):
+    column = _column(field)
+    is_id = field == '_id'
+
+    def bind(value):
+        params.append(str(value) if is_id and value is not None else _param(value))
+        return 'json(?)' if isinstance(value, (list, dict)) else '?'
+
+    if not (isinstance(condition, dict) and any(str(k).startswith('$') for k in condition)):
+        if condition is None:
+            return f'{column} IS NULL'
+        return f'{column} = {bind(condition)}'
+
+    clauses = []
+    for op, value in condition.items():
+        if op == '$eq':
+            clauses.append(_translate_field(field, value, params))
+        elif op == '$ne':
+            if value is None:
+                clauses.append(f'{column} IS NOT NULL')
+            else:
+                clauses.append(f'({column} IS NULL OR {column} != {bind(value)})')
+        elif op in ('$gt', '$gte', '$lt', '$lte'):
+            sql_op = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}[op]
+            if isinstance(value, datetime):
+                # Stored dates mix 'YYYY-MM-DD HH:MM:SS' and ISO 'T' forms; compare them normalized
+                clauses.append(f"strftime('{_DATETIME_FORMAT}', {column}) {sql_op} "
+                               f"strftime('{_DATETIME_FORMAT}', {bind(value)})")
+            else:
+                # Like MongoDB (and the file store), numbers never compare against strings
+                kind = "IN ('integer', 'real')" if isinstance(value, (int, float)) else "= 'text'"
+                clauses.append(f'(typeof({column}) {kind} AND {column} {sql_op} {bind(value)})')
+        elif op in ('$in', '$nin'):
+            values = list(value)
+            present = [v for v in values if v is not None]
+            placeholders = ', '.join(bind(v) for v in present)
+            in_sql = f'{column} IN ({placeholders})' if present else '0'
+            if None in values:
+                in_sql = f'({in_sql} OR {column} IS NULL)'
+            clauses.append(in_sql if op == '$in' else f'NOT COALESCE({in_sql}, 0)')
+        elif op == '$exists':
+            test = 'IS NOT NULL' if value else 'IS NULL'
+            clauses.append(f"json_type(doc, '{_json_path(field)}') {test}")
+        elif op == '$regex':
+            pattern = value if isinstance(value, str) else value.pattern
+            if 'i' in condition.get('$options', ''):
+                pattern = '(?i)' + pattern
+            params.append(pattern)
+            clauses.append(f'{column} REGEXP ?')
+        elif op == '$options':
+            continue
+        else:
+            raise ValueError(f"Unsupported query operator for SQLite backend: {op}")
+    return '(' + ' AND '.join(clauses) + ')' if clauses else '1'
+
+
+def translate_query(query, params):
+    """Translate a Mongo-style filter into a SQL WHERE clause, appending bind values to params"""
+    clauses = []
+    for key, value in (query or {}).items():
+        if key in ('$and', '$or', '$nor'):
+            parts = [translate_query(branch, params) for branch in value]
+            joined = ' AND '.join(parts) if key == '$and' else ' OR '.join(parts)
+            joined = f'({joined})' if parts else ('1' if key == '$and' else '0')
+            clauses.append(f'NOT COALESCE({joined}, 0)' if key == '$nor' else joined)
+        else:
+            clauses.append(_translate_field(key, value, params))
+    return ' AND '.join(clauses) if clauses else '1'
+
+
+def _set_path(doc, field, value):
+    *parents, leaf = field.split('.')
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+def _get_path(doc, field, default=None):
+    for part in field.split('.'):
+        if not isinstance(doc, dict) or part not in doc:
+            return default
+        doc = doc[part]
+    return doc
+
+
+def _unset_path(doc, field):
+    *parents, leaf = field.split('.')
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(leaf, None)
+
+
+def apply_update(doc, update):
+    """Apply $set/$unset/$inc/$push to a document copy"""
+    doc = json.loads(json.dumps(doc, default=str))
+    for field, value in update.get('$set', {}).items():
+        _set_path(doc, field, value)
+    for field in update.get('$unset', {}):
+        _unset_path(doc, field)
+    for field, value in update.get('$inc', {}).items():
+        _set_path(doc, field, _get_path(doc, field, 0) + value)
+    for field, value in update.get('$push', {}).items():
+        current = _get_path(doc, field)
+        _set_path(doc, field, (current or []) + [value])
+    return doc
+
+
+class SQLiteCursor:
+    """Lazy PyMongo-style cursor; sort/skip/limit are pushed into the SQL query"""
+
+    def __init__(self, collection, where, params, projection=None):
+        self._collection = collection
+        self._where = where
+        self._params = params
+        self._project = compile_projection(projection)
+        self._order = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=1):
+        keys = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+        self._order = [(field, direction) for field, direction in keys]
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        sql = f'SELECT doc FROM "{self._collection.name}" WHERE {self._where}'
+        if self._order:
+            sql += ' ORDER BY ' + ', '.join(
+                f"{_column(field)} {'DESC' if direction == -1 else 'ASC'}" for field, direction in self._order
+            )
+        params = list(self._params)
+        if self._limit or self._skip:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [self._limit or -1, self._skip]
+        for (doc,) in self._collection.database.connection().execute(sql, params):
+            yield self._project(json.loads(doc))
+
+
+class SQLiteCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    def _select(self, query, conn=None, limit=None):
+        params = []
+        sql = f'SELECT rowid, doc FROM "{self.name}" WHERE {translate_query(query, params)}'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return (conn or self.database.connection()).execute(sql, params)
+
+    def _insert(self, conn, data):
+        if '_id' not in data:
+            data['_id'] = str(uuid.uuid4())
+        try:
+            conn.execute(f'INSERT INTO "{self.name}" (doc) VALUES (?)',
+                         (json.dumps(data, default=str, ensure_ascii=False),))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} ({e})")
+        return data['_id']
+
+    def insert_one(self, data):
+        with self.database.transaction() as conn:
+            inserted_id = self._insert(conn, data)
+        return type('MockResult', (), {'inserted_id': inserted_id})()
+
+    def insert_many(self, data_list):
+        with self.database.transaction() as conn:
+            ids = [self._insert(conn, data) for data in data_list]
+        return type('MockResult', (), {'inserted_ids': ids})()
+
+    def find_one(self, query=None, projection=None):
+        row = self._select(query, limit=1).fetchone()
+        return compile_projection(projection)(json.loads(row[1])) if row else None
+
+    def find(self, query=None, projection=None, sort=None):
+        params = []
+        cursor = SQLiteCursor(self, translate_query(query, params), params, projection)
+        return cursor.sort(sort) if sort else cursor
+
+    def count_documents(self, query=None):
+        params = []
+        sql = f'SELECT COUNT(*) FROM "{self.name}" WHERE {translate_query(query, params)}'
+        return self.database.connection().execute(sql, params).fetchone()[0]
+
+    def _update(self, query, update, many=False):
+        with self.database.transaction() as conn:
+            rows = self._select(query, conn, limit=None if many else 1).fetchall()
+            updated_docs = []
+            for rowid, doc in rows:
+                updated = apply_update(json.loads(doc), update)
+                try:
+                    conn.execute(f'UPDATE "{self.name}" SET doc = ? WHERE rowid = ?',
+                                 (json.dumps(updated, default=str, ensure_ascii=False), rowid))
+                except sqlite3.IntegrityError as e:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} ({e})")
+                updated_docs.append(updated)
+        return updated_docs
+
+    def update_one(self, query, update, expected_version=None):
+        """With expected_version, only update while the document's _version still matches (compare-and-swap)"""
+        if expected_version is not None:
+            query, update = versioned(query, update, expected_version)
+        modified = len(self._update(query, update))
+        return type('MockResult', (), {'modified_count': modified, 'matched_count': modified})()
+
+    def update_many(self, query, update):
+        modified = len(self._update(query, update, many=True))
+        return type('MockResult', (), {'modified_count': modified, 'matched_count': modified})()
+
+    def find_one_and_update(self, query, update, return_document=False):
+        """Atomic conditional update; returns the document after (return_document=True) or before it"""
+        if return_document:
+            docs = self._update(query, update)
+            return docs[0] if docs else None
+        with self.database.transaction():
+            before = self.find_one(query)
+            if before is not None:
+                self._update({'_id': before['_id']}, update)
+        return before
+
+    def _delete(self, query, many):
+        with self.database.transaction() as conn:
+            rows = self._select(query, conn, limit=None if many else 1).fetchall()
+            conn.executemany(f'DELETE FROM "{self.name}" WHERE rowid = ?', [(rowid,) for rowid, _ in rows])
+        return type('MockResult', (), {'deleted_count': len(rows)})()
+
+    def delete_one(self, query):
+        return self._delete(query, many=False)
+
+    def delete_many(self, query):
+        return self._delete(query, many=True)
+
+    def create_index(self, field, unique=False):
+        if not isinstance(field, str):
+            field = field[0][0]
+        prefix = 'ux' if unique else 'ix'
+        index_name = f"{prefix}_{self.name}_{re.sub(r'[^A-Za-z0-9_]', '_', field)}"
+        unique_sql = 'UNIQUE ' if unique else ''
+        try:
+            self.database.connection().execute(
+                f'CREATE {unique_sql}INDEX IF NOT EXISTS "{index_name}" ON "{self.name}" ({_column(field)})'
+            )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} ({e})")
+        return index_name
+
+
+class SQLiteDatabase:
+    """Collections are created on first access, like MongoDB"""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._tables = set()
+        self._tables_lock = threading.Lock()
+        print(f"[INFO] SQLite database at {self.path}")
+
+    def connection(self):
+        """One connection per thread and process (connections must not cross a fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.create_function('regexp', 2, _regexp, deterministic=True)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def transaction(self):
+        return _Transaction(self.connection())
+
+    def table_names(self):
+        rows = self.connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        return [name for (name,) in rows]
+
+    def _ensure_table(self, name):
+        if name in self._tables:
+            return
+        with self._tables_lock:
+            columns = ',\n'.join(
+                # _id is compared as text, like MockCollection does
+                f'"{field}" TEXT GENERATED ALWAYS AS (CAST(json_extract(doc, \'$.{field}\') AS TEXT)) VIRTUAL'
+                if field == '_id' else
+                f'"{field}" GENERATED ALWAYS AS (json_extract(doc, \'$.{field}\')) VIRTUAL'
+                for field in HOT_FIELDS
+            )
+            conn = self.connection()
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (\n'
+                         f'rowid INTEGER PRIMARY KEY,\ndoc TEXT NOT NULL,\n{columns})')
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ix_{name}__id" ON "{name}" ("_id")')
+            for field in HOT_FIELDS[1:]:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{name}_{field}" ON "{name}" ("{field}")')
+            self._tables.add(name)
+
+    def collection(self, name):
+        if not _NAME_RE.match(name):
+            raise ValueError(f"Invalid collection name: {name}")
+        self._ensure_table(name)
+        return SQLiteCollection(self, name)
+
+    def __getitem__(self, name):
+        return self.collection(name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.collection(name)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, so read-check-write sequences are atomic across workers"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.nested = conn.in_transaction
+
+    def __enter__(self):
+        if not self.nested:
+            self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.nested:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def _documents_from_json(file_name, content):
+    """Flatten the shapes used by data/*.json into a list of documents"""
+    if isinstance(content, list):
+        return content
+    docs = []
+    for key, value in content.items():
+        if isinstance(value, list):
+            # crops/fertilizers/growing_activities: {user_id: [records]}
+            for record in value:
+                record.setdefault('user_id', key)
+                docs.append(record)
+        elif isinstance(value, dict):
+            docs.append(value)
+    return docs
+
+
+def migrate_json_files(database, data_dir):
+    """Copy data/*.json into the SQLite database; safe to run more than once"""
+    total = 0
+    for file_name, collection_name in JSON_COLLECTIONS.items():
+        path = os.path.join(data_dir, file_name)
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                docs = _documents_from_json(file_name, json.load(f))
+        except Exception as e:
+            print(f"[WARNING] Skipping {file_name}: {e}")
+            continue
+        database.collection(collection_name)
+        if not docs:
+            continue
+        rows = []
+        for doc in docs:
+            if '_id' not in doc:
+                # Deterministic id so re-running the migration does not duplicate documents
+                fingerprint = json.dumps(doc, sort_keys=True, default=str)
+                doc['_id'] = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{collection_name}:{fingerprint}"))
+            rows.append((json.dumps(doc, default=str, ensure_ascii=False),))
+        with database.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(f'INSERT OR IGNORE INTO "{collection_name}" (doc) VALUES (?)', rows)
+            inserted = conn.total_changes - before
+        total += inserted
+        print(f"[INFO] Migrated {inserted}/{len(rows)} documents from {file_name} into {collection_name}")
+    return total
+
+
+if __name__ == '__main__':
+    data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.getenv('SQLITE_DB_PATH', os.path.join(data_dir, 'smartfarming.db'))
+    started = datetime.now()
+    count = migrate_json_files(SQLiteDatabase(db_path), data_dir)
+    print(f"[SUCCESS] Migrated {count} documents in {(datetime.now() - started).total_seconds():.2f}s")
@@ -0,0 +1,89 @@
+"""
+Warm-up of the models and data that are otherwise loaded on first use.
+
+The crop and fertilizer models load lazily (get_crop_predictor(),
+get_ml_predictor()), so the first request after a deploy used to pay for
+unpickling them and for the first, slow call into scikit-learn. Modules register what they own:
+
+    register('crop_model', get_crop_predictor,
+             probe=lambda predictor: predictor.predict_crop_recommendation(90, 42, 43, 21, 82, 6.5, 203))
+
+and warm_up() (or start_warmup() in a background thread) loads each one and
+runs its probe, a synthetic inference, once. warmup_status() reports the
+state and timings of every registered entry for /healthz and /readyz, and is
+ready only once none is pending or loading; /readyz starts the warm-up itself
+when nothing did at startup:
+
+    pending      registered, not loaded by the warm-up (yet)
+    loading      being loaded or probed
+    ready        loaded and probed
+    unavailable  load() returned None: the feature runs on its fallback
+    failed       load() or the probe raised
+"""
+import threading
+import time
+
+_entries = {}
+_status = {}
+_lock = threading.Lock()
+_started = False
+
+
+def register(name, load, probe=None):
+    """Register load() (returns the model, or None if it is not available) and an optional probe(model)"""
+    with _lock:
+        _entries[name] = (load, probe)
+        _status[name] = {'state': 'pending'}
+
+
+def _set(name, **status):
+    with _lock:
+        _status[name] = status
+
+
+def warm_up():
+    """Load and probe every registered model in this thread"""
+    global _started
+    _started = True
+    start = time.perf_counter()
+    for name, (load, probe) in list(_entries.items()):
+        _set(name, state='loading')
+        began = time.perf_counter()
+        load_ms = None
+        try:
+            model = load()
+            load_ms = round((time.perf_counter() - began) * 1000, 1)
+            if model is None:
+                _set(name, state='unavailable', load_ms=load_ms)
+                continue
+            if probe is None:
+                _set(name, state='ready', load_ms=load_ms)
+                continue
+            probed = time.perf_counter()
+            probe(model)
+            _set(name, state='ready', load_ms=load_ms, probe_ms=round((time.perf_counter() - probed) * 1000, 1))
+        except Exception as e:
+            print(f"[WARNING] Warm-up of {name} failed: {e}")
+            _set(name, state='failed', load_ms=load_ms, error=str(e))
+    print(f"[INFO] Warm-up finished in {time.perf_counter() - start:.1f}s: "
+          + ', '.join(f"{name} {status['state']}" for name, status in warmup_status()[1].items()))
+
+
+def start_warmup():
+    """Run warm_up() in a background thread unless a warm-up already ran or is running; readiness waits for it"""
+    global _started
+    with _lock:
+        if _started:
+            return None
+        _started = True
+    thread = threading.Thread(target=warm_up, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_status():
+    """(ready, {name: status}). Ready once the warm-up has been through every registered entry"""
+    with _lock:
+        models = {name: dict(status) for name, status in _status.items()}
+    ready = all(status['state'] not in ('pending', 'loading') for status in models.values())
+    return ready, models
@@ -1,10 +1,12 @@
 """
 WSGI entry point for production deployment
 """
-from app import app
+from app import create_app, init_worker
 
-# This is the application object that should be used by WSGI servers
-application = app
+# This is the application object that should be used by WSGI servers.
+# The database and scheduler are started per worker by the post_fork hook in gunicorn.conf.py.
+application = create_app(start_worker=False)
 
 if __name__ == "__main__":
-    app.run()
+    init_worker(application)
+    application.run()